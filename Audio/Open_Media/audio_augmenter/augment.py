@@ -1,135 +1,330 @@
+import functools
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.signal import spectrogram
-import soundfile as sf
-from scipy.io import wavfile
-from scipy.signal import butter, lfilter,resample
-import scipy
-from IPython.display import Audio, display
-import torch
+from .modulation import flanger, vibrato
+from .resample import resample
+from .reverb import default_cache, fft_convolve, multitap_ir, reverb_ir
+from .spectral import spectrogram_engine
+from .masking import apply_mask, effect_masks, spec_augment_mask
+from . import preview
+from .profiling import profiled
+from .rng import logger, make_rng, seed_sequence
 
 
+def modifies_waveform(method):
+    """
+    Marks an effect that changes the waveform: the cached spectrogram is
+    dropped, and the call is recorded by the augmentor's profiler if it has one.
+    """
+
+    method = profiled(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._log_spectrogram = None
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+CHANNEL_RANDOMNESS = ('correlated', 'independent')
+
 
 class AudioAugmentor:
-    def __init__(self, waveform, sample_rate):
+    def __init__(self, waveform, sample_rate, resample_quality='balanced', backend='torch', headless=None,
+                 profiler=None, multichannel=False, channel_randomness='correlated', seed=None,
+                 log_spectrogram=None):
         """
             sample_rate: Sampling rate
-            num_channels: Number of channels
+            resample_quality: Resampling preset for pitch and stretch: 'fast', 'balanced' or 'best' (exact, slow FFT)
+            backend: Type of self.waveform: 'torch' (tensor) or 'numpy' (array),
+                both are views of the same preallocated float32 buffer
+            headless: process_audio() shows no preview (default: headless unless running in a notebook)
+            profiler: profiling.Profiler recording every effect call (None: no instrumentation)
+            multichannel: keep the channels of a (num_samples, channels) waveform and
+                process them all at once instead of averaging them to mono
+            channel_randomness: 'correlated' draws the same noise, gain and masks for
+                every channel, 'independent' draws them per channel
+            seed: seed of the augmentor's random generator (int, SeedSequence, see rng.seed_sequence)
+                or a numpy Generator to draw from; None draws a fresh seed
+            log_spectrogram: precomputed log-spectrogram of the waveform (e.g. from a
+                cache.FeatureCache), used until an effect changes the waveform
+            num_channels: Number of channels of the input
             noise_level: white noise level
             pitch_factor: Indicates a change in pitch
             stretch_factor: Duration of the audio signal change
             num_masks: Number of lanes
             time_mask_param: Maximum mask length
+            freq_mask_param: Frequency mask width (in bins)
         """
 
+        # Arrays, tensors and memory-mapped files (utils.MappedAudio)
+        waveform = np.asarray(waveform)
+        if backend not in ('torch', 'numpy'):
+            raise ValueError(f"Unknown backend: {backend}")
+        if channel_randomness not in CHANNEL_RANDOMNESS:
+            raise ValueError(f"Unknown channel randomness: {channel_randomness}")
+        if waveform.ndim > 2:
+            raise ValueError(f"Expected a waveform of shape (num_samples,) or (num_samples, channels), "
+                             f"got {waveform.shape}")
         self.sample_rate = sample_rate
+        self.backend = backend
         self.num_channels = 1 if len(waveform.shape) == 1 else waveform.shape[1]
         self.noise_level = 0.005
         self.pitch_factor = 1.5
         self.stretch_factor = 1.2
         self.num_masks = 8 
         self.time_mask_param = 5 
-
-        if self.num_channels == 2:
-            # Averaging of both channels to obtain a mono signal
+        self.freq_mask_param = 5
+        self.resample_quality = resample_quality
+        self.headless = not preview.in_notebook() if headless is None else headless
+        self.profiler = profiler
+        self.multichannel = multichannel
+        self.channel_randomness = channel_randomness
+        # The SeedSequence regenerates the same augmentation (unknown for a given Generator)
+        self.seed = None if isinstance(seed, np.random.Generator) else seed_sequence(seed)
+        self.rng = make_rng(seed if self.seed is None else self.seed)
+
+        if waveform.ndim == 2 and not multichannel:
+            # Averaging of the channels to obtain a mono signal
             waveform = waveform.mean(axis=1)
 
-        # Convert waveform to float32 and normalize
-        waveform = waveform.astype(np.float32) / np.max(np.abs(waveform))
-        # Convert to the Pwtorch tensor and add dimension
-        self.waveform = torch.tensor(waveform).view(-1, 1)
+        # Room for the longest signal of augment_audio(), so that no effect reallocates
+        waveform = waveform.reshape(len(waveform), -1)
+        capacity = int(len(waveform) * max(self.pitch_factor, 1) * max(self.stretch_factor, 1)) + 1
+        self._buffer = np.empty((capacity, waveform.shape[1]), dtype=np.float32)
+        self._scratch = np.empty_like(self._buffer)
+        self._length = len(waveform)
+
+        # Convert waveform to float32 and normalize, in the buffer
+        samples = self._buffer[:self._length]
+        np.copyto(samples, waveform, casting='unsafe')
+        samples /= np.max(np.abs(samples))
+        self._view = None
+        self._log_spectrogram = log_spectrogram
+        self._log_spectrogram_key = (id(self._buffer), self._length)
+
+    @property
+    def waveform(self):
+        """
+        The waveform, shape (num_samples, channels), one channel unless
+        multichannel: a torch tensor or a numpy array
+        (see backend) sharing memory with the internal buffer, no copy is made.
+        """
+
+        if self._view is None:
+            samples = self._buffer[:self._length]
+            if self.backend == 'torch':
+                # Imported on first use: headless numpy pipelines never load torch
+                import torch
+                samples = torch.from_numpy(samples)
+            self._view = samples
+        return self._view
+
+    @waveform.setter
+    def waveform(self, waveform):
+        if waveform is self._view:
+            return
+        waveform = np.asarray(waveform, dtype=np.float32)
+        waveform = waveform.reshape(len(waveform), -1)
+        if waveform.shape[1] != self._buffer.shape[1]:
+            raise ValueError(f"Expected {self._buffer.shape[1]} channel(s), got {waveform.shape[1]}")
+        self._reserve(len(waveform))
+        self._buffer[:len(waveform)] = waveform
+        self._resize(len(waveform))
+
+    def _reserve(self, num_samples):
+        """
+        Grows the buffers to hold num_samples samples, keeping the waveform.
+        """
+
+        if num_samples > len(self._buffer):
+            buffer = np.empty((num_samples,) + self._buffer.shape[1:], dtype=np.float32)
+            buffer[:self._length] = self._buffer[:self._length]
+            self._buffer = buffer
+            self._scratch = np.empty_like(buffer)
+            self._view = None
+
+    def _resize(self, num_samples):
+        self._length = num_samples
+        self._view = None
+        self._log_spectrogram = None
 
+    def _swap(self, num_samples):
+        """
+        Makes the scratch buffer, where an effect wrote its result, the waveform.
+        """
+
+        self._buffer, self._scratch = self._scratch, self._buffer
+        self._resize(num_samples)
+
+    @property
+    def independent_channels(self):
+        return self.channel_randomness == 'independent' and self._buffer.shape[1] > 1
+
+    def _draw_shape(self):
+        """
+        Shape of a per-channel draw: one value per channel when the channels
+        are independent, one value broadcast to all of them otherwise.
+        """
+
+        return (self._buffer.shape[1],) if self.independent_channels else (1,)
+
+    def _noise(self, noise_level):
+        """
+        White noise of the waveform shape in the scratch buffer.
+        """
+
+        noise = self._scratch[:self._length]
+        if self._draw_shape() == noise.shape[1:]:
+            # Drawn straight into the buffer in float32
+            self.rng.standard_normal(dtype=np.float32, out=noise)
+        else:
+            noise[:] = self.rng.standard_normal((self._length, 1), dtype=np.float32)
+        noise *= noise_level
+        return noise
 
-    def add_white_noise(self):
+    @modifies_waveform
+    def add_white_noise(self, noise_level=None):
         """
         Adding white noise to the audio.
+        noise_level: standard deviation of the noise (default: self.noise_level)
         """
 
-        noise = np.random.randn(*self.waveform.shape) * self.noise_level
-        self.waveform += noise
+        noise_level = self.noise_level if noise_level is None else noise_level
+        self._buffer[:self._length] += self._noise(noise_level)
 
 
+    @modifies_waveform
     def random_gain(self, gain_range=(-10, 10)):
         """
-        Random volume change.
+        Random volume change (one gain per channel with independent channels).
         """
 
-        gain = np.random.uniform(*gain_range)
-        self.waveform *= (10 ** (gain / 20))
+        gain = self.rng.uniform(*gain_range, size=self._draw_shape())
+        logger.debug("random_gain: gain=%s dB", gain.tolist())
+        self._buffer[:self._length] *= (10 ** (gain / 20))
 
+    @modifies_waveform
+    def scale_and_add_noise(self, gain=1.0, noise_level=0.0):
+        """
+        waveform * gain + white noise of standard deviation noise_level,
+        in one pass over the buffer (any sequence of gains and noises reduces to this).
+        """
+
+        samples = self._buffer[:self._length]
+        if gain != 1:
+            samples *= gain
+        if noise_level:
+            samples += self._noise(noise_level)
+
+    @modifies_waveform
     def add_echo(self, delay=0.1, decay=0.2):
         """
         Adds an echo effect to the sound wave.
         """
 
         delay_samples = int(delay * self.sample_rate)
-        echo_waveform = np.zeros_like(self.waveform)
-        echo_waveform[delay_samples:] = self.waveform[:-delay_samples] * decay
-        self.waveform += echo_waveform
+        num_echo = max(self._length - delay_samples, 0)
+        echo = np.multiply(self._buffer[:num_echo], decay, out=self._scratch[:num_echo])
+        self._buffer[delay_samples:self._length] += echo
   
 
-    def apply_flanger(self, depth=1, rate=1.5):
+    def _convolve(self, ir, cache=default_cache):
+        """
+        Convolves the waveform with ir (overlap-add FFT) into the scratch buffer, keeping its length.
+        cache: SpectrumCache of the IR spectrum, None for an IR that is not used again
+        """
+
+        fft_convolve(self._buffer[:self._length], ir, out=self._scratch[:self._length], cache=cache)
+        self._swap(self._length)
+
+    @modifies_waveform
+    def add_multitap_echo(self, delay=0.1, decay=0.4, num_taps=4):
+        """
+        Adds num_taps echoes, every delay seconds, each decay times quieter
+        than the previous one (num_taps=1 is add_echo).
+        """
+
+        self._convolve(multitap_ir(self.sample_rate, delay, decay, num_taps))
+
+    @modifies_waveform
+    def add_reverb(self, rt60=0.5, wet=0.3, ir=None):
+        """
+        Room reverberation: the waveform mixed with its convolution with an IR.
+        rt60: reverberation time of the synthetic room IR drawn when ir is None
+            (one IR per channel with independent channels)
+        wet: share of the reverberated signal
+        ir: impulse response (array of shape (M,) or (M, channels), or the path
+            of an audio file, resampled to the sampling rate) instead of a synthetic one
+        """
+
+        shape = (self._buffer.shape[1],) if self.independent_channels else ()
+        # Only an IR file is likely to come again, a random room never does
+        self._convolve(reverb_ir(self.sample_rate, rt60, wet, ir, self.rng, shape, self._buffer.shape[1]),
+                       cache=default_cache if isinstance(ir, str) else None)
+
+    @modifies_waveform
+    def apply_flanger(self, depth=1, rate=1.5, interpolation='none'):
         """
         Adds flanging - is an audio effect that combines 
         the original signal with a delayed version.
+        interpolation: 'none' for integer delays, 'linear' for fractional delays
+        """
+
+        flanger(self._buffer[:self._length], self.sample_rate, depth=depth, rate=rate,
+                interpolation=interpolation, out=self._scratch[:self._length])
+        self._swap(self._length)
+
+    def _resample(self, num_samples):
+        """
+        Resamples the waveform to num_samples samples into the scratch buffer.
         """
 
-        num_samples = len(self.waveform[0])
-        flanger_waveform = np.zeros(num_samples)
-        for i in range(num_samples):
-            delay = int(depth * self.sample_rate * (1 + np.sin(2 * np.pi * rate * i / self.sample_rate)))
-            if i - delay >= 0:
-                flanger_waveform[i] = self.waveform[0][i - delay]
-        # Normalization of the result to prevent distortion
-        flanger_waveform = np.clip(flanger_waveform, -1, 1)
-        self.waveform[0] += flanger_waveform
-        self.waveform[0] = np.clip(self.waveform[0], -1, 1)  
+        self._reserve(num_samples)
+        resampled = resample(self._buffer[:self._length], num_samples, quality=self.resample_quality)
+        np.copyto(self._scratch[:num_samples], resampled, casting='unsafe')
+        self._swap(num_samples)
 
 
-    def change_pitch(self):
+    @modifies_waveform
+    def change_pitch(self, pitch_factor=None):
         """
         Changing the sampling rate.
+        pitch_factor: ratio of the new to the old length (default: self.pitch_factor)
         """
 
-        new_sample_rate = int(self.sample_rate * self.pitch_factor)
-        new_data = resample(self.waveform, int(len(self.waveform) * self.pitch_factor))
-        self.waveform= new_data
+        pitch_factor = self.pitch_factor if pitch_factor is None else pitch_factor
+        self._resample(int(self._length * pitch_factor))
 
 
-    def time_stretch(self):
+    @modifies_waveform
+    def time_stretch(self, stretch_factor=None):
         """
         Changing the length of the audio signal
+        stretch_factor: ratio of the new to the old length (default: self.stretch_factor)
         """
 
-        stretched_length = int(len(self.waveform) * self.stretch_factor)
-        stretched_audio = resample(self.waveform, stretched_length)
-        self.waveform = torch.from_numpy(stretched_audio)
+        stretch_factor = self.stretch_factor if stretch_factor is None else stretch_factor
+        self._resample(int(self._length * stretch_factor))
 
 
-    def vibrato(self, depth=0.005, frequency=3):
+    @modifies_waveform
+    def vibrato(self, depth=0.005, frequency=3, interpolation='none'):
         """
         Adds a vibrato effect to the audio signal 
         by modulating the pitch with a sinusoidal waveform, 
         creating a periodic variation in pitch over time
+        interpolation: 'none' for integer delays, 'linear' for fractional delays
         """
 
-        num_samples = len(self.waveform)
-        t = np.arange(num_samples) / self.sample_rate
-        modulation = depth * np.sin(2 * np.pi * frequency * t)
-
-        vibrato_signal = np.zeros_like(self.waveform)
-        for i in range(num_samples):
-            delay = int(modulation[i] * self.sample_rate)
-            if i - delay >= 0:
-                vibrato_signal[i] = self.waveform[i - delay]
-            else:
-                vibrato_signal[i] = self.waveform[i]  
-        self.waveform = torch.from_numpy(vibrato_signal)
+        vibrato(self._buffer[:self._length], self.sample_rate, depth=depth,
+                frequency=frequency, interpolation=interpolation, out=self._scratch[:self._length])
+        self._swap(self._length)
         return self.waveform
 
     def augment_audio(self):
         """
-        Applying effects to audio
+        Applying effects to audio.
+        All effects work in the preallocated buffers, the result is a view of them.
         """
 
         self.add_white_noise()
@@ -138,44 +333,59 @@ class AudioAugmentor:
         self.apply_flanger()
         self.change_pitch()
         self.time_stretch()
-        self.waveform = self.vibrato()
+        self.vibrato()
         print("Effects have been applied.")
         return self.waveform
 
 
-    def augment_spectrogram(self, effects):
+    @profiled
+    def log_spectrogram(self):
         """
-        Adding augmentation to the spectrogram
+        Log-spectrogram of the waveform, shape (channels, frequencies, frames).
+        It is computed once and reused until an effect changes the waveform.
         """
 
-        self.waveform = self.waveform.transpose(0, 1)
-        f, t, Sxx = scipy.signal.spectrogram(self.waveform, fs=self.sample_rate)  
-        log_spectrogram = np.log(Sxx + 1e-10)  
-        self.spec_mask = log_spectrogram.copy()
-
-        if 'TimeMasking' in effects:
-            """
-            Time Masking in audio augmentation refers to a technique 
-            used to enhance the robustness of audio models by randomly hiding 
-            segments of the audio signal over time
-            """
+        key = (id(self._buffer), self._length)
+        if self._log_spectrogram is None or self._log_spectrogram_key != key:
+            signal = self._buffer[:self._length].T
+            engine = spectrogram_engine(self.sample_rate, signal.shape[-1])
+            self._log_spectrogram = engine.log_spectrogram(
+                signal, out=np.empty(engine.output_shape(signal.shape), dtype=np.float32))
+            self._log_spectrogram_key = key
+        return self._log_spectrogram
+
+    @profiled
+    def augment_spectrogram(self, effects, out=None, return_mask=False):
+        """
+        Adding augmentation to the spectrogram
 
-            for _ in range(self.num_masks):
-                t_start = np.random.randint(0, self.spec_mask.shape[1] - self.time_mask_param + 1)
-                self.spec_mask[:, t_start:t_start + self.time_mask_param] = 0
+        Time Masking in audio augmentation refers to a technique 
+        used to enhance the robustness of audio models by randomly hiding 
+        segments of the audio signal over time
 
-        elif 'FrequencyMasking' in effects:
-            """
-            Frequency Masking in audio augmentation is a technique 
-            used to improve the robustness of audio models by randomly 
-            occluding or masking specific frequency ranges within an 
-            audio signal.
-            """
+        Frequency Masking in audio augmentation is a technique 
+        used to improve the robustness of audio models by randomly 
+        occluding or masking specific frequency ranges within an 
+        audio signal.
 
-            for _ in range(self.num_masks):
-                mask_start = np.random.randint(0, self.spec_mask.shape[2] - self.time_mask_param)
-                self.spec_mask[:,:, mask_start:mask_start + self.time_mask_param] = 0
+        Both can be combined; all masks of all channels are drawn in one
+        vectorized step, the same for every channel unless the channels are independent.
+        out: optional buffer of the spectrogram shape, reused instead of a new copy
+        return_mask: return (log-spectrogram, boolean mask) without copying the data,
+            the log-spectrogram is the cached one and must not be modified
+        """
 
+        log_spectrogram = self.log_spectrogram()
+        num_time_masks, num_freq_masks = effect_masks(effects, self.num_masks)
+        shape = log_spectrogram.shape
+        mask = spec_augment_mask(shape if self.independent_channels else (1,) + shape[1:],
+                                 num_time_masks, self.time_mask_param, num_freq_masks, self.freq_mask_param,
+                                 rng=self.rng)
+        mask = np.broadcast_to(mask, shape)
+        if return_mask:
+            return log_spectrogram, mask
+
+        self.spec_mask = apply_mask(log_spectrogram, mask, out=out)
         print("The augmentation of the spectrogram is complete.")
         return self.spec_mask
 
@@ -183,16 +393,20 @@ class AudioAugmentor:
     def process_audio(self, method, effects=None):
         """
         Audio processing depending on the selected method.
+        Outside headless mode the result is previewed: an audio player for
+        the audio method, a plot for the spectrogram method.
         """
 
         if method == 'audio':
             self.waveform = self.augment_audio()
-            display(Audio(self.waveform.T, rate=self.sample_rate))
+            if not self.headless:
+                preview.play(np.asarray(self.waveform), self.sample_rate)
             return self.waveform, self.sample_rate
 
         elif method == 'spectrogram' and effects is not None:
             self.spec_mask = self.augment_spectrogram(effects)
-            display(Audio(self.spec_mask.T, rate=self.sample_rate))
+            if not self.headless:
+                preview.plot_spectrogram(self.spec_mask, self.sample_rate)
             return self.spec_mask, self.sample_rate
         else:
             print(f"Unknown method: {method}")
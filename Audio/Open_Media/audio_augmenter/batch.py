@@ -0,0 +1,254 @@
+import numpy as np
+import torch
+from .modulation import flanger, vibrato
+from .spectral import spectrogram_engine
+from .masking import apply_mask, effect_masks, spec_augment_mask
+from .rng import logger, make_rng
+from .reverb import (default_cache, fft_convolve, load_ir, match_ir_channels, mix_ir, multitap_ir, room_ir,
+                     stack_irs)
+
+
+def draw(value, size, rng=None):
+    """
+    Per-clip values of a parameter: a (low, high) pair is sampled
+    uniformly (from the Generator rng) for every clip, a single number is
+    shared by all clips.
+    """
+
+    if isinstance(value, (tuple, list)):
+        return make_rng(rng).uniform(value[0], value[1], size)
+    return np.full(size, value, dtype=np.float64)
+
+
+class BatchAugmentor:
+    def __init__(self, waveforms, sample_rate, lengths=None, seed=None):
+        """
+            waveforms: padded clips, array or tensor of shape (batch, samples)
+            sample_rate: Sampling rate
+            lengths: Number of valid samples of every clip (default: all samples)
+            seed: seed or numpy Generator of the draws (see rng.make_rng)
+            noise_level: white noise level
+            pitch_factor: Indicates a change in pitch
+            stretch_factor: Duration of the audio signal change
+            num_masks: Number of lanes
+            time_mask_param: Maximum mask length
+            freq_mask_param: Frequency mask width (in bins)
+        """
+
+        if isinstance(waveforms, torch.Tensor):
+            waveforms = waveforms.detach().cpu().numpy()
+        waveforms = np.array(waveforms, dtype=np.float32)
+        if waveforms.ndim == 1:
+            waveforms = waveforms[np.newaxis, :]
+        if waveforms.ndim != 2:
+            raise ValueError("Expected a (batch, samples) array of clips")
+
+        self.sample_rate = sample_rate
+        self.batch_size = waveforms.shape[0]
+        self.rng = make_rng(seed)
+        self.noise_level = 0.005
+        self.pitch_factor = 1.5
+        self.stretch_factor = 1.2
+        self.num_masks = 8
+        self.time_mask_param = 5
+        self.freq_mask_param = 5
+
+        if lengths is None:
+            lengths = np.full(self.batch_size, waveforms.shape[1])
+        self.lengths = np.asarray(lengths.cpu() if isinstance(lengths, torch.Tensor) else lengths, dtype=np.int64)
+        if self.lengths.shape != (self.batch_size,):
+            raise ValueError("Expected one length per clip")
+
+        # Normalize every clip by its own peak, ignoring the padding
+        waveforms *= self.valid_mask(waveforms.shape[1])
+        peak = np.max(np.abs(waveforms), axis=1, keepdims=True)
+        waveforms /= np.where(peak > 0, peak, 1)
+        self.waveforms = torch.from_numpy(waveforms)
+
+    def valid_mask(self, num_samples=None):
+        """
+        Boolean (batch, samples) mask of the samples that belong to a clip.
+        """
+
+        num_samples = self.waveforms.shape[1] if num_samples is None else num_samples
+        return np.arange(num_samples) < self.lengths[:, np.newaxis]
+
+    def _zero_padding(self):
+        self.waveforms.numpy()[~self.valid_mask()] = 0
+
+    def add_white_noise(self, noise_level=None):
+        """
+        Adding white noise to every clip, noise_level may be a (low, high) range.
+        """
+
+        noise_level = self.noise_level if noise_level is None else noise_level
+        levels = draw(noise_level, self.batch_size, self.rng)
+        noise = self.rng.standard_normal(self.waveforms.shape, dtype=np.float32)
+        noise *= levels[:, np.newaxis].astype(np.float32)
+        self.waveforms += torch.from_numpy(noise)
+        self._zero_padding()
+
+    def random_gain(self, gain_range=(-10, 10)):
+        """
+        Random volume change, drawn independently for every clip.
+        """
+
+        gains = self.rng.uniform(*gain_range, size=self.batch_size)
+        logger.debug("random_gain: gains=%s dB", gains.tolist())
+        factors = (10 ** (gains / 20)).astype(np.float32)
+        self.waveforms *= torch.from_numpy(factors)[:, None]
+
+    def add_echo(self, delay=0.1, decay=0.2):
+        """
+        Adds an echo to every clip, delay and decay may be (low, high) ranges.
+        """
+
+        delay_samples = (draw(delay, self.batch_size, self.rng) * self.sample_rate).astype(np.int64)
+        decays = draw(decay, self.batch_size, self.rng).astype(np.float32)
+        waveforms = self.waveforms.numpy()
+        source = np.arange(waveforms.shape[1]) - delay_samples[:, np.newaxis]
+        echo = np.take_along_axis(waveforms, np.maximum(source, 0), axis=1)
+        echo[source < 0] = 0
+        echo *= decays[:, np.newaxis]
+        waveforms += echo
+        self._zero_padding()
+
+    def _convolve(self, ir, cache=None):
+        """
+        Convolves every clip with ir (overlap-add FFT), of shape (M,) for all
+        clips or (M, batch) with one IR per clip.
+        cache: SpectrumCache of the IR spectrum (default: none, the IRs of a batch are drawn per clip)
+        """
+
+        waveforms = self.waveforms.numpy()
+        waveforms[:] = fft_convolve(waveforms.T, ir, cache=cache).T
+        self._zero_padding()
+
+    def add_multitap_echo(self, delay=0.1, decay=0.4, num_taps=4):
+        """
+        Adds num_taps echoes to every clip, delay and decay may be (low, high) ranges.
+        """
+
+        delays = draw(delay, self.batch_size, self.rng)
+        decays = draw(decay, self.batch_size, self.rng)
+        self._convolve(stack_irs([multitap_ir(self.sample_rate, d, g, num_taps) for d, g in zip(delays, decays)]))
+
+    def add_reverb(self, rt60=0.5, wet=0.3, ir=None):
+        """
+        Reverberation of every clip: a synthetic room IR per clip (rt60 may be
+        a (low, high) range), or the same ir (array or audio file) for all clips.
+        wet may be a (low, high) range.
+        """
+
+        wets = draw(wet, self.batch_size, self.rng).astype(np.float32)
+        if ir is None:
+            ir = stack_irs([room_ir(self.sample_rate, seconds, self.rng)
+                            for seconds in draw(rt60, self.batch_size, self.rng)])
+            self._convolve(mix_ir(ir, wets))
+            return
+
+        # One mono IR for all clips, mixed with the dry clips afterwards: its
+        # spectrum does not depend on the wet shares and can be cached
+        cache = default_cache if isinstance(ir, str) else None
+        ir = match_ir_channels(load_ir(ir, self.sample_rate) if isinstance(ir, str) else ir, 1)
+        waveforms = self.waveforms.numpy()
+        reverberated = fft_convolve(waveforms.T, ir, cache=cache).T
+        waveforms *= 1 - wets[:, np.newaxis]
+        waveforms += wets[:, np.newaxis] * reverberated
+        self._zero_padding()
+
+    def apply_flanger(self, depth=1, rate=1.5, interpolation='none'):
+        """
+        Adds flanging to every clip.
+        """
+
+        waveforms = self.waveforms.numpy()
+        waveforms[:] = flanger(waveforms.T, self.sample_rate, depth=depth, rate=rate,
+                               interpolation=interpolation).T
+        self._zero_padding()
+
+    def vibrato(self, depth=0.005, frequency=3, interpolation='none'):
+        """
+        Adds a vibrato effect to every clip.
+        """
+
+        waveforms = self.waveforms.numpy()
+        waveforms[:] = vibrato(waveforms.T, self.sample_rate, depth=depth, frequency=frequency,
+                               interpolation=interpolation).T
+        self._zero_padding()
+
+    def _resample(self, factors):
+        """
+        Resamples every clip to int(length * factor) samples by linear interpolation.
+        """
+
+        waveforms = self.waveforms.numpy()
+        new_lengths = (self.lengths * factors).astype(np.int64)
+        positions = np.arange(max(new_lengths.max(), 1))[np.newaxis, :] * \
+            (self.lengths / np.maximum(new_lengths, 1))[:, np.newaxis]
+        last = np.maximum(self.lengths - 1, 0)[:, np.newaxis]
+        base = np.minimum(np.floor(positions).astype(np.int64), last)
+        frac = np.clip(positions - base, 0, 1).astype(np.float32)
+        following = np.minimum(base + 1, last)
+        resampled = np.take_along_axis(waveforms, base, axis=1) * (1 - frac)
+        resampled += np.take_along_axis(waveforms, following, axis=1) * frac
+
+        self.lengths = new_lengths
+        self.waveforms = torch.from_numpy(resampled)
+        self._zero_padding()
+
+    def change_pitch(self, pitch_factor=None):
+        """
+        Changing the sampling rate of every clip, pitch_factor may be a (low, high) range.
+        """
+
+        pitch_factor = self.pitch_factor if pitch_factor is None else pitch_factor
+        self._resample(draw(pitch_factor, self.batch_size, self.rng))
+
+    def time_stretch(self, stretch_factor=None):
+        """
+        Changing the length of every clip, stretch_factor may be a (low, high) range.
+        """
+
+        stretch_factor = self.stretch_factor if stretch_factor is None else stretch_factor
+        self._resample(draw(stretch_factor, self.batch_size, self.rng))
+
+    def augment_audio(self):
+        """
+        Applying effects to all clips, returns the padded waveforms and their lengths
+        """
+
+        self.add_white_noise()
+        self.random_gain()
+        self.add_echo()
+        self.apply_flanger()
+        self.change_pitch()
+        self.time_stretch()
+        self.vibrato()
+        return self.waveforms, self.lengths
+
+    def augment_spectrogram(self, effects, out=None, return_mask=False):
+        """
+        Log-spectrograms of all clips, shape (batch, frequencies, frames),
+        with independent masks for every clip.
+        out: optional buffer of that shape, reused instead of a new array
+        return_mask: return (log-spectrograms, boolean mask) with the mask not applied
+        """
+
+        waveforms = self.waveforms.numpy()
+        engine = spectrogram_engine(self.sample_rate, waveforms.shape[1])
+        if out is None:
+            out = np.empty(engine.output_shape(waveforms.shape), dtype=np.float32)
+        log_spectrogram = engine.log_spectrogram(waveforms, out=out)
+        num_frames = log_spectrogram.shape[2]
+
+        # Frames that only cover padding are not masked
+        valid_frames = np.clip((self.lengths - engine.nperseg) // engine.step + 1, 1, num_frames)
+        num_time_masks, num_freq_masks = effect_masks(effects, self.num_masks)
+        mask = spec_augment_mask(log_spectrogram.shape, num_time_masks, self.time_mask_param,
+                                 num_freq_masks, self.freq_mask_param, valid_frames=valid_frames, rng=self.rng)
+        if return_mask:
+            return log_spectrogram, mask
+
+        self.spec_mask = apply_mask(log_spectrogram, mask, out=log_spectrogram)
+        return self.spec_mask
@@ -0,0 +1,285 @@
+"""
+Content-addressed cache of the features every epoch starts from: the
+decoded, normalized float32 waveform of a file and its log-spectrogram.
+Entries are keyed by a hash of the file contents (plus the channel
+handling and the STFT parameters), so a renamed or copied clip hits the
+cache and a modified one misses it.
+
+Entries live in memory and, with a directory, on disk (shared by the
+worker processes and kept across runs); both are bounded in bytes and
+evict the least recently used entries.
+
+    cache = FeatureCache('/tmp/features', max_memory=1 << 30, max_disk=20 << 30)
+    log_spectrogram, sample_rate = cache.log_spectrogram('clip.wav')
+"""
+
+import collections
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zipfile
+import numpy as np
+from .utils import read_audio
+from .spectral import spectrogram_engine
+
+
+# Bytes of a file hashed at once
+HASH_BLOCK = 1 << 20
+# Share of max_disk written by a process after which it lists the directory
+# again, to account for the entries of the other workers
+RESCAN_FRACTION = 0.1
+# Age in seconds after which a .partial file is left by a killed writer, not being written
+STALE_PARTIAL_SECONDS = 3600
+
+
+class DigestCache:
+    """
+    Content hashes of files, recomputed only when their size or
+    modification time changes.
+    """
+
+    def __init__(self):
+        self._digests = {}
+
+    def digest(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            hasher = hashlib.blake2b(digest_size=20)
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(HASH_BLOCK), b''):
+                    hasher.update(block)
+            digest = self._digests[key] = hasher.hexdigest()
+        return digest
+
+
+# The hashes shared by all caches of the process
+default_digests = DigestCache()
+
+
+def normalized_waveform(audio, multichannel=False):
+    """
+    float32 waveform of shape (num_samples, channels) divided by its peak,
+    as AudioAugmentor stores it: the channels are averaged unless multichannel.
+    """
+
+    audio = np.asarray(audio)
+    if audio.ndim == 2 and not multichannel:
+        audio = audio.mean(axis=1)
+    waveform = audio.reshape(len(audio), -1).astype(np.float32)
+    peak = np.max(np.abs(waveform)) if waveform.size else 0
+    if peak > 0:
+        waveform /= peak
+    return waveform
+
+
+class FeatureCache:
+    """
+    Cache of normalized waveforms and log-spectrograms of audio files.
+
+        directory: where entries are stored on disk (None: in memory only)
+        max_memory: bytes of arrays kept in memory
+        max_disk: bytes of entries kept in directory (None: unbounded)
+        multichannel: keep the channels instead of averaging them to mono
+        nperseg, noverlap: STFT parameters of the log-spectrograms
+
+    hits, disk_hits and misses count the calls of read() and
+    log_spectrogram(): one hit or one miss per call, whatever it reads inside.
+    """
+
+    def __init__(self, directory=None, max_memory=256 << 20, max_disk=None, multichannel=False, nperseg=256,
+                 noverlap=None, digests=default_digests):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.multichannel = multichannel
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.digests = digests
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+        # Entries of the directory, least recently used first, and their total size
+        self._disk_entries = collections.OrderedDict()
+        self._disk_total = 0
+        self._disk_written = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            if max_disk is not None:
+                self._scan_disk()
+
+    def key(self, path, kind):
+        """
+        Name of the entry of a file: its content hash and every parameter the feature depends on.
+        """
+
+        parts = [self.digests.digest(path), kind, 'multichannel' if self.multichannel else 'mono']
+        if kind == 'spectrogram':
+            parts += [str(self.nperseg), str(self.noverlap)]
+        return '-'.join(parts)
+
+    def _get(self, key, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += count
+                self._entries.move_to_end(key)
+                return entry
+        if self.directory is None:
+            return None
+        path = os.path.join(self.directory, key + '.npz')
+        try:
+            with np.load(path) as stored:
+                entry = (stored['array'], int(stored['sample_rate']))
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Missing, or left incomplete by a killed process
+            return None
+        # Recently used entries are the last ones evicted from disk
+        os.utime(path)
+        with self._lock:
+            if path in self._disk_entries:
+                self._disk_entries.move_to_end(path)
+        self.disk_hits += count
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        entry[0].flags.writeable = False
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._memory += entry[0].nbytes
+            while self._memory > self.max_memory and self._entries:
+                _, (array, _) = self._entries.popitem(last=False)
+                self._memory -= array.nbytes
+
+    def _put(self, key, entry):
+        self._remember(key, entry)
+        if self.directory is None:
+            return
+        # Written under a temporary name: readers only ever see complete entries
+        handle, partial = tempfile.mkstemp(dir=self.directory, suffix='.partial')
+        with os.fdopen(handle, 'wb') as file:
+            np.savez(file, array=entry[0], sample_rate=entry[1])
+        path = os.path.join(self.directory, key + '.npz')
+        os.replace(partial, path)
+        if self.max_disk is None:
+            return
+        size = os.path.getsize(path)
+        with self._lock:
+            if self._disk_written + size > RESCAN_FRACTION * self.max_disk:
+                self._scan_disk()
+            else:
+                self._disk_total += size - self._disk_entries.pop(path, 0)
+                self._disk_entries[path] = size
+                self._disk_written += size
+        self.evict_disk()
+
+    def _scan_disk(self):
+        """
+        Lists the entries of the directory by last use, once at startup and
+        then every RESCAN_FRACTION of max_disk written.
+        """
+
+        entries = []
+        stale = time.time() - STALE_PARTIAL_SECONDS
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            elif entry.name.endswith('.partial') and entry.stat().st_mtime < stale:
+                # Left by a killed process: a writer replaces its file within seconds
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        self._disk_entries = collections.OrderedDict((path, size) for _, size, path in sorted(entries))
+        self._disk_total = sum(self._disk_entries.values())
+        self._disk_written = 0
+
+    def evict_disk(self):
+        """
+        Deletes the least recently used entries of the directory above max_disk bytes.
+        """
+
+        with self._lock:
+            while self._disk_total > self.max_disk and self._disk_entries:
+                path, size = self._disk_entries.popitem(last=False)
+                self._disk_total -= size
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def read(self, path, count=True):
+        """
+        (normalized float32 waveform of shape (num_samples, channels), sample rate)
+        of a file, decoded only on a miss. The array is shared: read-only.
+        count: update the counters (not for the reads of log_spectrogram)
+        """
+
+        key = self.key(path, 'waveform')
+        entry = self._get(key, count)
+        if entry is None:
+            self.misses += count
+            audio, sample_rate = read_audio(path, dtype='float32')
+            entry = (normalized_waveform(audio, self.multichannel), sample_rate)
+            self._put(key, entry)
+        return entry
+
+    def log_spectrogram(self, path):
+        """
+        (log-spectrogram of shape (channels, frequencies, frames), sample rate)
+        of the normalized waveform of a file, computed only on a miss.
+        """
+
+        key = self.key(path, 'spectrogram')
+        entry = self._get(key)
+        if entry is None:
+            self.misses += 1
+            waveform, sample_rate = self.read(path, count=False)
+            engine = spectrogram_engine(sample_rate, len(waveform), self.nperseg, self.noverlap)
+            signal = waveform.T
+            spectrogram = engine.log_spectrogram(signal, out=np.empty(engine.output_shape(signal.shape),
+                                                                      dtype=np.float32))
+            entry = (spectrogram, sample_rate)
+            self._put(key, entry)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@functools.lru_cache(maxsize=None)
+def feature_cache(directory, multichannel=False, max_disk=None):
+    """
+    The FeatureCache of a directory in this process (one per worker),
+    keeping at most max_disk bytes of entries in it (None: unbounded).
+    """
+
+    return FeatureCache(directory, max_disk=max_disk, multichannel=multichannel)
+
+
+def read_features(path, cache=None, multichannel=False, spectrogram=False, max_disk=None):
+    """
+    (audio, sample rate, log-spectrogram) of a file: decoded by read_audio
+    without a cache (and no log-spectrogram), else read from cache (a
+    FeatureCache or its directory), with the log-spectrogram when spectrogram.
+    max_disk: bound in bytes of a cache directory (see feature_cache)
+    """
+
+    if cache is None:
+        audio, sample_rate = read_audio(path)
+        return audio, sample_rate, None
+    if not isinstance(cache, FeatureCache):
+        cache = feature_cache(os.fspath(cache), multichannel, max_disk)
+    audio, sample_rate = cache.read(path)
+    return audio, sample_rate, cache.log_spectrogram(path)[0] if spectrogram else None
+
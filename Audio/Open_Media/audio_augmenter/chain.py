@@ -0,0 +1,202 @@
+"""
+Declarative effect chains: an ordered list of effects of AudioAugmentor,
+each applied with a probability and with parameters that are either fixed
+or drawn uniformly from a [low, high] range every time the chain runs.
+
+    chain = EffectChain([
+        Effect('gain', probability=0.5, gain=(-6, 6)),
+        Effect('noise', noise_level=(0.001, 0.01)),
+        Effect('pitch', probability=0.2, pitch_factor=(0.9, 1.1)),
+    ])
+    applied = chain.apply(AudioAugmentor(waveform, sample_rate))
+
+The same chain as JSON (or YAML, with PyYAML installed):
+
+    {"effects": [{"name": "gain", "probability": 0.5, "gain": [-6, 6]},
+                 {"name": "noise", "noise_level": [0.001, 0.01]},
+                 {"name": "pitch", "probability": 0.2, "pitch_factor": [0.9, 1.1]}]}
+"""
+
+import json
+import os
+import numpy as np
+from .rng import logger
+
+
+# name: (AudioAugmentor method, default parameters)
+EFFECTS = {
+    'noise': ('add_white_noise', {'noise_level': 0.005}),
+    'gain': ('random_gain', {'gain': (-10, 10)}),
+    'echo': ('add_echo', {'delay': 0.1, 'decay': 0.2}),
+    'flanger': ('apply_flanger', {'depth': 1, 'rate': 1.5, 'interpolation': 'none'}),
+    'pitch': ('change_pitch', {'pitch_factor': 1.5}),
+    'stretch': ('time_stretch', {'stretch_factor': 1.2}),
+    'vibrato': ('vibrato', {'depth': 0.005, 'frequency': 3, 'interpolation': 'none'}),
+    'multitap_echo': ('add_multitap_echo', {'delay': 0.1, 'decay': 0.4, 'num_taps': 4}),
+    'reverb': ('add_reverb', {'rt60': 0.5, 'wet': 0.3, 'ir': None}),
+}
+
+# The effects of AudioAugmentor.augment_audio(), in its order
+DEFAULT_EFFECTS = ('noise', 'gain', 'echo', 'flanger', 'pitch', 'stretch', 'vibrato')
+
+# Effects that are a gain and/or an added independent noise: a run of them
+# is applied as a single scale_and_add_noise() pass
+LINEAR_EFFECTS = ('noise', 'gain')
+
+
+def draw_value(value, rng=None):
+    """
+    A uniform draw for a (low, high) range, the value itself otherwise.
+    rng: numpy Generator of the draw (default: a freshly seeded one)
+    """
+
+    if isinstance(value, (tuple, list)):
+        low, high = value
+        rng = np.random.default_rng() if rng is None else rng
+        return float(rng.uniform(low, high))
+    return value
+
+
+class Effect:
+    """
+    One step of a chain.
+
+        name: effect name (see EFFECTS)
+        probability: probability that the effect is applied on a run
+        params: fixed values or (low, high) ranges, the defaults of EFFECTS otherwise
+            (gain is in dB)
+    """
+
+    def __init__(self, name, probability=1.0, **params):
+        if name not in EFFECTS:
+            raise ValueError(f"Unknown effect: {name} (expected one of {', '.join(EFFECTS)})")
+        if not 0 <= probability <= 1:
+            raise ValueError(f"Probability of {name} must be in [0, 1], got {probability}")
+        unknown = set(params) - set(EFFECTS[name][1])
+        if unknown:
+            raise ValueError(f"Unknown parameters of {name}: {sorted(unknown)}")
+        self.name = name
+        self.probability = probability
+        self.params = {**EFFECTS[name][1], **params}
+
+    def sample(self, rng=None):
+        """
+        Parameters of one application, with every range drawn from rng.
+        """
+
+        return {key: draw_value(value, rng) for key, value in self.params.items()}
+
+    def to_dict(self):
+        params = {key: list(value) if isinstance(value, tuple) else value
+                  for key, value in self.params.items()}
+        return {'name': self.name, 'probability': self.probability, **params}
+
+    @classmethod
+    def from_dict(cls, spec):
+        spec = dict(spec)
+        return cls(spec.pop('name'), **spec)
+
+    def __repr__(self):
+        params = ', '.join(f"{key}={value!r}" for key, value in self.params.items())
+        return f"Effect({self.name!r}, probability={self.probability}, {params})"
+
+
+class EffectChain:
+    """
+    Ordered effects applied to an AudioAugmentor. A chain is rebuilt from
+    to_dict() with from_dict(), which is how it is sent to worker processes.
+    """
+
+    def __init__(self, effects=()):
+        self.effects = [effect if isinstance(effect, Effect) else Effect.from_dict(effect)
+                        for effect in effects]
+
+    @classmethod
+    def default(cls):
+        """
+        The effects of AudioAugmentor.augment_audio(), always applied.
+        """
+
+        return cls(Effect(name) for name in DEFAULT_EFFECTS)
+
+    def to_dict(self):
+        return {'effects': [effect.to_dict() for effect in self.effects]}
+
+    @classmethod
+    def from_dict(cls, spec):
+        """
+        spec: {'effects': [...]} or the list of effects itself
+        """
+
+        return cls(spec['effects'] if isinstance(spec, dict) else spec)
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    @classmethod
+    def from_yaml(cls, text):
+        try:
+            import yaml
+        except ImportError as error:
+            raise ImportError("Reading YAML chains requires PyYAML: pip install pyyaml") from error
+        return cls.from_dict(yaml.safe_load(text))
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Chain of a .json, .yaml or .yml file.
+        """
+
+        with open(path) as file:
+            text = file.read()
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            return cls.from_yaml(text)
+        return cls.from_json(text)
+
+    def __len__(self):
+        return len(self.effects)
+
+    def __repr__(self):
+        return f"EffectChain({self.effects!r})"
+
+    def sample(self, rng=None):
+        """
+        Effects of one run: (name, parameters) of every effect that fires.
+        rng: numpy Generator of the draws (default: a freshly seeded one)
+        """
+
+        rng = np.random.default_rng() if rng is None else rng
+        return [(effect.name, effect.sample(rng)) for effect in self.effects
+                if effect.probability >= 1 or rng.random() < effect.probability]
+
+    def apply(self, augmentor):
+        """
+        Applies one run of the chain to the augmentor, returns the applied
+        (name, parameters) pairs. Consecutive gains and noises are fused:
+        g * (x + n) is x * g plus a noise of standard deviation g * sigma(n),
+        so the run costs one multiply, one noise draw and one add.
+        The draws come from the augmentor's generator, augmentor.rng.
+        """
+
+        applied = self.sample(augmentor.rng)
+        logger.debug("Effect chain: %s", applied)
+        gain, noise_level = 1.0, 0.0
+        for position, (name, params) in enumerate(applied):
+            if name == 'gain':
+                factor = 10 ** (params['gain'] / 20)
+                gain *= factor
+                noise_level *= factor
+            elif name == 'noise':
+                noise_level = float(np.hypot(noise_level, params['noise_level']))
+            else:
+                getattr(augmentor, EFFECTS[name][0])(**params)
+                continue
+            following = applied[position + 1][0] if position + 1 < len(applied) else None
+            if following not in LINEAR_EFFECTS:
+                augmentor.scale_and_add_noise(gain, noise_level)
+                gain, noise_level = 1.0, 0.0
+        return applied
@@ -1,24 +1,116 @@
+import os
+import glob
 import click
 import numpy as np
-from .utils import read_audio, save_audio
+from .utils import save_audio
 from .augment import AudioAugmentor
+from .chain import EffectChain
+from .parallel import augment_directory
+from .shards import augment_to_shards
+from .streaming import augment_file_streaming
+from .profiling import Profiler, measure
+from .rng import seed_sequence
+from .cache import read_features
+
+# The effects of AudioAugmentor.augment_audio, in the same order
+STREAM_EFFECTS = ('noise', 'gain', 'echo', 'flanger', 'pitch', 'stretch', 'vibrato')
 
 @click.command()
-@click.argument('input_file', type=click.Path(exists=True))
+@click.argument('input_file', type=click.Path())
 @click.argument('output_file', type=click.Path())
 @click.option('--method', type=click.Choice(['audio', 'spectrogram'], case_sensitive=False), default='audio', help='Choose the augmentation method: audio or spectrogram.')
-@click.option('--effects', type=click.Choice(['FrequencyMasking', 'TimeStretching'], case_sensitive=False), default=None, help='Choose one effect to apply when using spectrogram method.')
-def main(input_file, output_file, method,effects):
+@click.option('--effects', type=click.Choice(['TimeMasking', 'FrequencyMasking'], case_sensitive=False), multiple=True, help='Effects to apply when using spectrogram method (repeat the option to combine them).')
+@click.option('--workers', '-w', type=int, default=1, help='Number of worker processes when INPUT_FILE is a directory or glob.')
+@click.option('--variants', '-n', type=int, default=1, help='Number of augmented versions of every input file.')
+@click.option('--resume', is_flag=True, help='Skip outputs that already exist.')
+@click.option('--stream', is_flag=True, help='Process the file block by block (bounded memory); single input file only.')
+@click.option('--blocksize', type=int, default=65536, help='Block size in frames for --stream.')
+@click.option('--resample-quality', type=click.Choice(['fast', 'balanced', 'best']), default='balanced', help='Resampling preset for pitch and stretch (best: exact FFT over the whole signal, slower).')
+@click.option('--chain', 'chain_file', type=click.Path(exists=True, dir_okay=False), default=None, help='JSON or YAML effect chain applied instead of the default audio effects.')
+@click.option('--subtype', type=click.Choice(['PCM_16', 'PCM_24', 'PCM_32', 'FLOAT'], case_sensitive=False), default=None, help='Sample format of the audio outputs (default: the format\'s default, PCM_16 for WAV and FLAC).')
+@click.option('--format', 'audio_format', type=click.Choice(['wav', 'flac', 'ogg'], case_sensitive=False), default=None, help='Format of the audio outputs in directory mode (default: the input\'s).')
+@click.option('--shards', is_flag=True, help='Pack the outputs into tar shards of OUTPUT_FILE (a directory) instead of one file per clip.')
+@click.option('--shard-size', type=int, default=1000, help='Number of augmented clips per shard with --shards.')
+@click.option('--multichannel', is_flag=True, help='Keep and augment every channel instead of averaging them to mono.')
+@click.option('--channel-randomness', type=click.Choice(['correlated', 'independent']), default='correlated', help='With --multichannel: the same random noise, gain and masks for every channel, or drawn per channel.')
+@click.option('--seed', type=int, default=None, help='Seed of the random effects; the run is reproducible with the same seed (default: a fresh seed, printed).')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None, help='Keep the decoded clips and their log-spectrograms in this directory, keyed by content, so that later epochs and runs skip decoding.')
+@click.option('--cache-max-disk', type=click.IntRange(min=1), default=None, help='With --cache-dir, the size of the cache directory in MB; the least recently used entries are deleted above it (default: unbounded).')
+@click.option('--profile', 'profile_file', type=click.Path(dir_okay=False), default=None, help='Record the time of every effect and I/O call and write it to this file: JSON for .json, Prometheus text otherwise.')
+@click.option('--profile-memory', is_flag=True, help='With --profile, also record the bytes allocated by every call (slower).')
+def main(input_file, output_file, method, effects, workers, variants, resume, stream, blocksize, resample_quality, chain_file,
+         subtype, audio_format, shards, shard_size, multichannel, channel_randomness, seed, cache_dir, cache_max_disk,
+         profile_file, profile_memory):
     """
     CLI is an application for augmentation of audio files.
+
+    INPUT_FILE may also be a directory or a glob pattern, OUTPUT_FILE
+    is then the output directory.
     """
 
+    chain = None
+    if chain_file is not None:
+        if method != 'audio' or stream:
+            raise click.UsageError("--chain only supports the audio method without --stream.")
+        try:
+            chain = EffectChain.from_file(chain_file)
+        except (ValueError, KeyError, ImportError) as error:
+            raise click.BadParameter(str(error), param_hint='--chain')
+
+    if not os.path.exists(input_file) and not glob.has_magic(input_file):
+        raise click.BadParameter(f"'{input_file}' does not exist.", param_hint='INPUT_FILE')
+
+    if cache_max_disk is not None and cache_dir is None:
+        raise click.UsageError("--cache-max-disk requires --cache-dir.")
+    cache = {'cache_dir': cache_dir, 'cache_max_disk': cache_max_disk and cache_max_disk << 20}
+    profiler = Profiler(trace_memory=profile_memory) if profile_file else None
+    channels = {'multichannel': multichannel, 'channel_randomness': channel_randomness}
+    # Printed so that a run without --seed can be reproduced
+    seed = seed_sequence(seed)
+    click.echo(f"Seed: {seed.entropy}")
+
+    if shards:
+        if stream or resume or profiler:
+            raise click.UsageError("--shards cannot be combined with --stream, --resume or --profile.")
+        process_shards(input_file, output_file, method, effects, workers, variants,
+                       resample_quality, chain, shard_size, channels, seed, cache)
+        return
+
+    if not os.path.isfile(input_file):
+        if stream:
+            raise click.UsageError("--stream only supports a single input file.")
+        process_directory(input_file, output_file, method, effects, workers, variants, resume,
+                          resample_quality, chain, subtype, audio_format, profiler, channels, seed,
+                          cache)
+        write_profile(profiler, profile_file)
+        return
+
+    if stream:
+        if method != 'audio' or multichannel or cache_dir:
+            raise click.UsageError("--stream only supports the audio method, in mono, without --cache-dir.")
+        click.echo(f"Streaming augmentation of {input_file}...")
+        # The stages of a stream are interleaved, the whole run is one record
+        with measure(profiler, 'augment_file_streaming') as lengths:
+            frames = augment_file_streaming(input_file, output_file, blocksize=blocksize,
+                                            effects=STREAM_EFFECTS, resample_quality=resample_quality,
+                                            subtype=subtype, seed=seed)
+            lengths['output'] = frames
+        click.echo(f"{frames} frames have been successfully saved in: {output_file}!")
+        write_profile(profiler, profile_file)
+        return
+
     click.echo(f"Reading an audio file: {input_file}")
     
-    audio, sr = read_audio(input_file)
+    with measure(profiler, 'read_audio') as lengths:
+        audio, sr, log_spectrogram = read_features(input_file, cache_dir, multichannel,
+                                                   method == 'spectrogram' and chain is None,
+                                                   cache['cache_max_disk'])
+        lengths['output'] = len(audio)
     
     click.echo("Audio augmentation...")
-    augmentor = AudioAugmentor(audio, sr)
+    augmentor = AudioAugmentor(audio, sr, resample_quality=resample_quality,
+                               backend='numpy', headless=True, profiler=profiler, seed=seed,
+                               log_spectrogram=log_spectrogram, **channels)
     """
     The choice of the augmentation method. 
     In this work, two types of augmentation are considered: 
@@ -27,20 +119,91 @@ def main(input_file, output_file, method,effects):
     Below you can select an 'audio' or 'spectrogram' to perform the augmentation
     """
     
-    if method == 'audio':
+    if chain is not None:
+      for name, params in chain.apply(augmentor):
+            click.echo(f"  {name}: {params}")
+      with measure(profiler, 'save_audio', len(augmentor.waveform)):
+            save_audio(output_file, augmentor.waveform, sr, subtype)
+    elif method == 'audio':
       audio, sr = augmentor.process_audio(method=method)
       # Saving an augmented signal
-      save_audio(output_file, audio, sr)
+      with measure(profiler, 'save_audio', len(audio)):
+            save_audio(output_file, audio, sr, subtype)
     elif method == 'spectrogram': 
       if effects:
-            spectr, sr = augmentor.process_audio(method=method, effects=[effects])
+            spectr, sr = augmentor.process_audio(method=method, effects=list(effects))
             # Saving an augmented signal
             save_audio(output_file, spectr, sr)
       else:
             click.echo("No effect provided for spectrogram method. Please specify an effect.")
 
     click.echo(f"The audio has been successfully saved in: {output_file}!")
-    
+    write_profile(profiler, profile_file)
+
+
+def write_profile(profiler, path):
+    """
+    Prints the per-effect totals and writes the records (see Profiler.write).
+    """
+
+    if profiler is None:
+        return
+    click.echo(profiler.format_summary())
+    profiler.write(path)
+    click.echo(f"Profile written to {path}")
+
+
+
+def process_directory(source, output_dir, method, effects, workers, variants, resume, resample_quality, chain=None,
+                      subtype=None, audio_format=None, profiler=None, channels=None, seed=None, cache=None):
+    """
+    Augmentation of every audio file of a directory or glob pattern.
+    """
+
+    if method == 'spectrogram' and not effects:
+        click.echo("No effect provided for spectrogram method. Please specify an effect.")
+        return
+
+    def progress(summary):
+        done = summary.processed + len(summary.failed)
+        click.echo(f"\r[{done}/{summary.total - summary.skipped}] {summary.throughput:,.0f} samples/s", nl=False)
+
+    click.echo(f"Augmenting files of {source} with {workers} worker(s)...")
+    summary = augment_directory(source, output_dir, workers=workers, variants=variants, resume=resume,
+                                method=method, effects=list(effects) or None, progress=progress,
+                                resample_quality=resample_quality, chain=chain, subtype=subtype,
+                                audio_format=audio_format, profiler=profiler, seed=seed, **(cache or {}),
+                                **(channels or {}))
+    click.echo()
+    for path, error in summary.failed:
+        click.echo(f"Failed: {path}: {error}", err=True)
+    click.echo(str(summary))
+
+
+def process_shards(source, output_dir, method, effects, workers, variants, resample_quality, chain, shard_size,
+                   channels=None, seed=None, cache=None):
+    """
+    Augmentation of a file, directory or glob pattern into tar shards.
+    """
+
+    if method == 'spectrogram' and not effects:
+        click.echo("No effect provided for spectrogram method. Please specify an effect.")
+        return
+
+    def progress(summary):
+        done = summary.processed + len(summary.failed)
+        click.echo(f"\r[{done}/{summary.total}] {summary.throughput:,.0f} samples/s", nl=False)
+
+    click.echo(f"Augmenting files of {source} into shards of {output_dir} with {workers} worker(s)...")
+    summary = augment_to_shards(source, output_dir, workers=workers, variants=variants, method=method,
+                                effects=list(effects) or None, resample_quality=resample_quality,
+                                chain=chain, max_count=shard_size, progress=progress, seed=seed,
+                                **(cache or {}), **(channels or {}))
+    click.echo()
+    for path, error in summary.failed:
+        click.echo(f"Failed: {path}: {error}", err=True)
+    click.echo(str(summary))
+
 
 if __name__ == '__main__':
     main()
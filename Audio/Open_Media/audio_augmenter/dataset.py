@@ -0,0 +1,239 @@
+"""
+PyTorch datasets that augment clips on the fly inside DataLoader workers,
+instead of writing augmented copies to disk.
+
+    dataset = AugmentedAudioDataset('dataset/', chain=chain, crop_length=32000, seed=0)
+    loader = DataLoader(dataset, batch_size=16, num_workers=4, worker_init_fn=worker_init_fn)
+    for epoch in range(epochs):
+        dataset.set_epoch(epoch)
+        for waveforms, lengths in loader:
+            ...
+
+Every item is (waveform, length): a float32 tensor of shape (num_samples,)
+and the number of samples that are not padding.
+"""
+
+import collections
+import os
+import numpy as np
+import torch
+from torch.utils.data import Dataset, IterableDataset, get_worker_info
+from .utils import read_audio
+from .augment import AudioAugmentor
+from .chain import EffectChain
+from .masking import apply_mask, effect_masks, spec_augment_mask
+from .parallel import find_inputs
+from .rng import child, make_rng, seed_sequence
+
+
+def list_files(source):
+    """
+    Files of a directory, a glob pattern or an explicit list of paths.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        return find_inputs(os.fspath(source))[1]
+    return list(source)
+
+
+def worker_init_fn(worker_id):
+    """
+    DataLoader worker_init_fn: seeds np.random of every worker from the
+    seed torch gives it (base seed + worker id), so workers do not share
+    the random state forked from the parent. The datasets do not need it
+    (they draw from their own generators), other code of the workers may.
+    """
+
+    np.random.seed(torch.initial_seed() % 2 ** 32)
+
+
+def fix_length(waveform, length, random_crop=True, rng=None):
+    """
+    Crops (at a random offset drawn from rng when random_crop) or zero-pads
+    a 1-D waveform to length samples. Returns (waveform, number of valid samples).
+    """
+
+    num_samples = len(waveform)
+    if num_samples >= length:
+        start = int(make_rng(rng).integers(num_samples - length + 1)) if random_crop else 0
+        return waveform[start:start + length], length
+    padded = np.zeros(length, dtype=waveform.dtype)
+    padded[:num_samples] = waveform
+    return padded, num_samples
+
+
+def collate_padded(batch):
+    """
+    collate_fn for items of different lengths: zero-pads them to the longest one.
+    Returns (waveforms of shape (batch, samples), lengths).
+    """
+
+    lengths = torch.tensor([length for _, length in batch])
+    waveforms = torch.zeros(len(batch), max(len(waveform) for waveform, _ in batch))
+    for row, (waveform, _) in enumerate(batch):
+        waveforms[row, :len(waveform)] = waveform
+    return waveforms, lengths
+
+
+class ClipCache:
+    """
+    Least recently used cache of decoded clips, (waveform, sample_rate) per path.
+    """
+
+    def __init__(self, max_items=32):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._clips = collections.OrderedDict()
+
+    def read(self, path):
+        clip = self._clips.get(path)
+        if clip is not None:
+            self.hits += 1
+            self._clips.move_to_end(path)
+            return clip
+        self.misses += 1
+        clip = read_audio(path)
+        if self.max_items > 0:
+            self._clips[path] = clip
+            if len(self._clips) > self.max_items:
+                self._clips.popitem(last=False)
+        return clip
+
+    def __len__(self):
+        return len(self._clips)
+
+
+class AugmentedAudioDataset(Dataset):
+    """
+    Map-style dataset of augmented clips.
+
+        source: directory, glob pattern or list of audio files
+        chain: EffectChain (or its dict) applied to every item, default: EffectChain.default()
+        crop_length: crop or pad every item to this many samples (None: keep the length)
+        random_crop: crop at a random offset instead of the start
+        cache_size: number of decoded clips kept by every worker
+        cache: cache.FeatureCache of the decoded clips, used instead of a
+            ClipCache of cache_size clips (e.g. on disk, shared by the workers)
+        seed: with a seed the randomness of an item only depends on
+            (seed, epoch, index), whatever the number of workers; without it
+            every item draws a fresh seed
+        resample_quality: resampling preset of pitch and stretch
+    """
+
+    def __init__(self, source, chain=None, crop_length=None, random_crop=True, cache_size=32,
+                 seed=None, resample_quality='balanced', cache=None):
+        self.files = list_files(source)
+        if chain is None:
+            chain = EffectChain.default()
+        self.chain = chain if isinstance(chain, EffectChain) else EffectChain.from_dict(chain)
+        self.crop_length = crop_length
+        self.random_crop = random_crop
+        self.seed = seed
+        self._root = None if seed is None else seed_sequence(seed)
+        self.epoch = 0
+        self.resample_quality = resample_quality
+        self.cache = ClipCache(cache_size) if cache is None else cache
+
+    def set_epoch(self, epoch):
+        """
+        Changes the draws of a seeded dataset between epochs.
+        """
+
+        self.epoch = epoch
+
+    def __len__(self):
+        return len(self.files)
+
+    def item_seed(self, index):
+        """
+        SeedSequence of an item in the current epoch (None without a seed).
+        """
+
+        return None if self._root is None else child(self._root, self.epoch, index)
+
+    def augment(self, path, seed=None):
+        audio, sample_rate = self.cache.read(path)
+        augmentor = AudioAugmentor(audio, sample_rate, resample_quality=self.resample_quality,
+                                   backend='numpy', seed=seed)
+        self.chain.apply(augmentor)
+        waveform = augmentor.waveform[:, 0]
+        length = len(waveform)
+        if self.crop_length is not None:
+            waveform, length = fix_length(waveform, self.crop_length, self.random_crop, augmentor.rng)
+        # No copy: the tensor keeps the augmentor's buffer
+        return torch.from_numpy(np.ascontiguousarray(waveform)), length
+
+    def __getitem__(self, index):
+        return self.augment(self.files[index], self.item_seed(index))
+
+
+class AugmentedAudioStream(IterableDataset):
+    """
+    Iterable dataset of augmented clips: every DataLoader worker reads its
+    own share of the files (in a shuffled order when shuffle), one pass per
+    iteration. Takes the parameters of AugmentedAudioDataset; with a seed an
+    item is the item of the same index of AugmentedAudioDataset.
+    """
+
+    def __init__(self, source, shuffle=True, **kwargs):
+        self.dataset = AugmentedAudioDataset(source, **kwargs)
+        self.shuffle = shuffle
+
+    def set_epoch(self, epoch):
+        self.dataset.set_epoch(epoch)
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (0, 1) if worker is None else (worker.id, worker.num_workers)
+        dataset = self.dataset
+        order = np.arange(len(dataset))
+        if self.shuffle:
+            # The same permutation in every worker, each takes every num_workers-th file
+            order = np.random.default_rng(dataset.epoch if dataset._root is None else
+                                          child(dataset._root, dataset.epoch)).permutation(order)
+        for index in order[worker_id::num_workers]:
+            yield dataset[index]
+
+
+class AugmentedSpectrogramDataset(Dataset):
+    """
+    Map-style dataset of SpecAugment-masked log-spectrograms. The
+    log-spectrograms come from a cache.FeatureCache, so after the first
+    epoch only the random masks are computed.
+
+        source: directory, glob pattern or list of audio files
+        cache: FeatureCache of the log-spectrograms (its STFT parameters apply)
+        effects: 'TimeMasking' and/or 'FrequencyMasking'
+        num_masks, time_mask_param, freq_mask_param: as in AudioAugmentor
+        seed: as in AugmentedAudioDataset
+
+    Every item is a float32 tensor of shape (channels, frequencies, frames).
+    """
+
+    def __init__(self, source, cache, effects=('TimeMasking', 'FrequencyMasking'), num_masks=8,
+                 time_mask_param=5, freq_mask_param=5, seed=None):
+        self.files = list_files(source)
+        self.cache = cache
+        self.num_time_masks, self.num_freq_masks = effect_masks(effects, num_masks)
+        self.time_mask_param = time_mask_param
+        self.freq_mask_param = freq_mask_param
+        self.seed = seed
+        self.epoch = 0
+        self._root = None if seed is None else seed_sequence(seed)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def item_seed(self, index):
+        return None if self._root is None else child(self._root, self.epoch, index)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, index):
+        log_spectrogram, _ = self.cache.log_spectrogram(self.files[index])
+        mask = spec_augment_mask(log_spectrogram.shape, self.num_time_masks, self.time_mask_param,
+                                 self.num_freq_masks, self.freq_mask_param, rng=make_rng(self.item_seed(index)))
+        return torch.from_numpy(apply_mask(log_spectrogram, mask))
+
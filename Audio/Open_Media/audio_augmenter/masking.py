@@ -0,0 +1,68 @@
+import numpy as np
+
+
+def stripe_mask(leading_shape, size, num_masks, mask_param, valid_size=None, rng=None):
+    """
+    Boolean mask of shape leading_shape + (size,) with num_masks random
+    stripes of mask_param positions for every leading index, drawn at once.
+
+    valid_size: per-index number of positions the stripes may start in
+        (array broadcastable to leading_shape, default: size)
+    rng: numpy Generator of the draws (default: a freshly seeded one)
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+    valid_size = size if valid_size is None else np.asarray(valid_size)
+    high = np.maximum(valid_size - mask_param + 1, 1)
+    draws = rng.random(tuple(leading_shape) + (num_masks,))
+    starts = (draws * np.expand_dims(high, -1)).astype(np.int64)
+    # Distance of every position from every stripe start: (..., num_masks, size)
+    offset = np.arange(size) - starts[..., np.newaxis]
+    return ((offset >= 0) & (offset < mask_param)).any(axis=-2)
+
+
+def spec_augment_mask(shape, num_time_masks=0, time_mask_param=5, num_freq_masks=0,
+                      freq_mask_param=5, valid_frames=None, rng=None):
+    """
+    SpecAugment mask of a spectrogram (or a stack of them) of shape
+    (..., frequencies, frames): True where the value is masked.
+    Every leading index (channel, clip) gets its own masks.
+
+    valid_frames: number of frames of every clip that time masks may cover
+        (to keep them out of the padding of a batch)
+    rng: numpy Generator of the draws (default: a freshly seeded one)
+    """
+
+    *leading, num_bins, num_frames = shape
+    mask = np.zeros(shape, dtype=bool)
+    if num_time_masks:
+        mask |= stripe_mask(leading, num_frames, num_time_masks, time_mask_param,
+                            valid_frames, rng)[..., np.newaxis, :]
+    if num_freq_masks:
+        mask |= stripe_mask(leading, num_bins, num_freq_masks, freq_mask_param, rng=rng)[..., :, np.newaxis]
+    return mask
+
+
+def apply_mask(spectrogram, mask, value=0, out=None):
+    """
+    Sets the masked values, in place when out is the spectrogram itself.
+    """
+
+    if out is None:
+        out = spectrogram.copy()
+    elif out is not spectrogram:
+        np.copyto(out, spectrogram)
+    np.copyto(out, value, where=mask)
+    return out
+
+
+def effect_masks(effects, num_masks):
+    """
+    Number of time and frequency masks for the effect names of the CLI.
+    """
+
+    unknown = set(effects) - {'TimeMasking', 'FrequencyMasking'}
+    if unknown:
+        raise ValueError(f"Unknown spectrogram effects: {sorted(unknown)}")
+    return (num_masks if 'TimeMasking' in effects else 0,
+            num_masks if 'FrequencyMasking' in effects else 0)
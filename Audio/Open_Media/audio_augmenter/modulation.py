@@ -0,0 +1,190 @@
+import numpy as np
+from collections import OrderedDict
+from fractions import Fraction
+
+
+# Longest sine table that is kept in memory (samples)
+MAX_TABLE_SIZE = 1 << 22
+
+
+class SineTable:
+    """
+    Cache of precomputed sine LFO curves.
+
+    The LFO sin(2*pi*frequency*n / sample_rate) is periodic with an integer
+    number of samples whenever frequency / sample_rate is rational, so one
+    table covering that period is computed once and then indexed
+    with n modulo the period.
+    """
+
+    def __init__(self, max_tables=16):
+        self.max_tables = max_tables
+        self._tables = OrderedDict()
+
+    @staticmethod
+    def period(frequency, sample_rate):
+        """
+        Length of the shortest table that contains a whole number of LFO periods
+        (None if it is too long to be worth storing).
+        """
+
+        ratio = Fraction(sample_rate) / Fraction(frequency)
+        if ratio.numerator > MAX_TABLE_SIZE:
+            return None
+        return ratio.numerator
+
+    def lfo(self, frequency, sample_rate, num_samples, start=0):
+        """
+        Returns sin(2*pi*frequency*n / sample_rate) for n in [start, start + num_samples).
+        """
+
+        key = (float(frequency), float(sample_rate))
+        table = self._tables.get(key)
+        if table is None:
+            period = self.period(frequency, sample_rate)
+            if period is None:
+                n = np.arange(start, start + num_samples, dtype=np.float64)
+                return np.sin(2 * np.pi * frequency * n / sample_rate)
+            n = np.arange(period, dtype=np.float64)
+            table = np.sin(2 * np.pi * frequency * n / sample_rate)
+            self._tables[key] = table
+            if len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        else:
+            self._tables.move_to_end(key)
+
+        period = len(table)
+        first = start % period
+        if first + num_samples <= period:
+            return table[first:first + num_samples]
+        return table[(np.arange(num_samples) + first) % period]
+
+
+# The table shared by all augmentors of the process
+default_table = SineTable()
+
+
+# Number of output samples processed at once: bounds the index and LFO temporaries
+CHUNK = 1 << 16
+
+
+def modulated_delay(signal, delays, interpolation='none', fill=0.0, offset=0, out=None):
+    """
+    Reads signal[n - delays[n]] for every sample n along the first axis.
+
+    signal: array of shape (num_samples, ...)
+    delays: delay of every output sample, in samples
+    interpolation: 'none' truncates the delay to an integer (as int() does),
+        'linear' interpolates between the two neighbouring samples
+    fill: value for samples whose source lies outside the signal,
+        'dry' takes the undelayed sample instead
+    offset: index of the first output sample in signal, the samples before
+        it are history (used for block processing)
+    out: optional output array of shape (len(delays), ...), must not overlap signal
+    """
+
+    signal = np.asarray(signal)
+    num_samples = signal.shape[0]
+    n = np.arange(offset, offset + len(delays))
+    # Broadcast the per-sample values over the channel axes
+    trailing = (1,) * (signal.ndim - 1)
+    if out is None:
+        out = np.empty((len(delays),) + signal.shape[1:], dtype=signal.dtype)
+
+    if interpolation == 'none':
+        position = n - np.trunc(delays).astype(np.int64)
+        valid = (position >= 0) & (position < num_samples)
+        np.take(signal, np.where(valid, position, 0), axis=0, out=out)
+    elif interpolation == 'linear':
+        position = n - np.asarray(delays, dtype=np.float64)
+        valid = (position >= 0) & (position <= num_samples - 1)
+        position = np.where(valid, position, 0)
+        base = np.floor(position).astype(np.int64)
+        frac = (position - base).astype(signal.dtype).reshape(-1, *trailing)
+        following = np.minimum(base + 1, num_samples - 1)
+        np.take(signal, base, axis=0, out=out)
+        out *= 1 - frac
+        out += signal[following] * frac
+    else:
+        raise ValueError(f"Unknown interpolation: {interpolation}")
+
+    invalid = ~valid
+    if invalid.any():
+        out[invalid] = signal[n[invalid]] if fill == 'dry' else fill
+    return out
+
+
+def flanger(signal, sample_rate, depth=1, rate=1.5, interpolation='none', table=default_table, out=None):
+    """
+    Mixes the signal with a copy delayed by depth * sample_rate * (1 + sin(2*pi*rate*t))
+    samples and clips the result to [-1, 1].
+
+    out: optional output array of the signal shape, must not overlap signal
+    """
+
+    signal = np.asarray(signal)
+    out = np.empty_like(signal) if out is None else out
+    for start in range(0, signal.shape[0], CHUNK):
+        stop = min(start + CHUNK, signal.shape[0])
+        lfo = table.lfo(rate, sample_rate, stop - start, start=start)
+        delays = depth * sample_rate * (1 + lfo)
+        chunk = modulated_delay(signal, delays, interpolation=interpolation, fill=0.0,
+                                offset=start, out=out[start:stop])
+        # Normalization of the result to prevent distortion
+        np.clip(chunk, -1, 1, out=chunk)
+        chunk += signal[start:stop]
+        np.clip(chunk, -1, 1, out=chunk)
+    return out
+
+
+def vibrato(signal, sample_rate, depth=0.005, frequency=3, interpolation='none', table=default_table,
+            out=None):
+    """
+    Modulates the pitch by reading the signal with a delay of
+    depth * sin(2*pi*frequency*t) seconds.
+
+    out: optional output array of the signal shape, must not overlap signal
+    """
+
+    signal = np.asarray(signal)
+    out = np.empty_like(signal) if out is None else out
+    for start in range(0, signal.shape[0], CHUNK):
+        stop = min(start + CHUNK, signal.shape[0])
+        lfo = table.lfo(frequency, sample_rate, stop - start, start=start)
+        delays = depth * lfo * sample_rate
+        modulated_delay(signal, delays, interpolation=interpolation, fill='dry',
+                        offset=start, out=out[start:stop])
+    return out
+
+
+def flanger_reference(signal, sample_rate, depth=1, rate=1.5):
+    """
+    Per-sample implementation of flanger(), kept for validation and benchmarks.
+    """
+
+    signal = np.asarray(signal)
+    num_samples = signal.shape[0]
+    flanger_waveform = np.zeros(signal.shape)
+    for i in range(num_samples):
+        delay = int(depth * sample_rate * (1 + np.sin(2 * np.pi * rate * i / sample_rate)))
+        if i - delay >= 0:
+            flanger_waveform[i] = signal[i - delay]
+    flanger_waveform = np.clip(flanger_waveform, -1, 1)
+    return np.clip(signal + flanger_waveform, -1, 1).astype(signal.dtype)
+
+
+def vibrato_reference(signal, sample_rate, depth=0.005, frequency=3):
+    """
+    Per-sample implementation of vibrato(), kept for validation and benchmarks.
+    """
+
+    signal = np.asarray(signal)
+    num_samples = signal.shape[0]
+    vibrato_signal = np.zeros_like(signal)
+    for i in range(num_samples):
+        delay = int(depth * np.sin(2 * np.pi * frequency * i / sample_rate) * sample_rate)
+        if 0 <= i - delay < num_samples:
+            vibrato_signal[i] = signal[i - delay]
+        else:
+            vibrato_signal[i] = signal[i]
+    return vibrato_signal
@@ -0,0 +1,221 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .utils import save_audio
+from .cache import read_features
+from .augment import AudioAugmentor
+from .chain import EffectChain
+from .profiling import Profiler, measure
+from .rng import child, describe, logger, seed_sequence
+
+
+# Extensions picked up when the input is a directory
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.aiff', '.aif')
+
+
+class AugmentationSummary:
+    """
+    Counters of a directory run.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.skipped = 0
+        self.written = 0
+        self.samples = 0
+        self.failed = []
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """
+        Input samples augmented per second
+        """
+
+        return self.samples / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.processed} processed, {self.skipped} skipped, {len(self.failed)} failed "
+                f"of {self.total} files; {self.written} outputs written in {self.elapsed:.1f} s "
+                f"({self.throughput:,.0f} samples/s)")
+
+
+def find_inputs(source):
+    """
+    Input files of a directory (searched recursively) or a glob pattern,
+    together with the root directory their output paths are relative to.
+    """
+
+    if os.path.isdir(source):
+        files = []
+        for directory, _, names in os.walk(source):
+            files.extend(os.path.join(directory, name) for name in names
+                         if name.lower().endswith(AUDIO_EXTENSIONS))
+        return source, sorted(files)
+
+    files = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    # The part of the pattern before the first wildcard
+    prefix = []
+    for part in source.split(os.sep):
+        if glob.has_magic(part):
+            break
+        prefix.append(part)
+    root = os.sep.join(prefix) or '.'
+    if not os.path.isdir(root):
+        root = os.path.dirname(root) or '.'
+    return root, files
+
+
+def output_paths(input_path, root, output_dir, variants=1, extension=None):
+    """
+    Output files of one input: the same relative path, with an _aug<k>
+    suffix when several variants are produced.
+    """
+
+    relative = os.path.relpath(input_path, root)
+    stem, ext = os.path.splitext(relative)
+    ext = extension or ext
+    if variants == 1:
+        return [os.path.join(output_dir, stem + ext)]
+    return [os.path.join(output_dir, f"{stem}_aug{k}{ext}") for k in range(variants)]
+
+
+def augment_file(input_path, outputs, method='audio', effects=None, resample_quality='balanced', chain=None,
+                 subtype=None, multichannel=False, channel_randomness='correlated', seeds=None, cache=None,
+                 cache_max_disk=None, profiler=None):
+    """
+    Augments one file into every path of outputs, returns the number of input samples processed.
+    chain: EffectChain (or its to_dict()) applied instead of augment_audio()
+    subtype: sample format of the audio outputs (see save_audio)
+    multichannel, channel_randomness: channel handling of AudioAugmentor
+    seeds: seed of every output (see rng.seed_sequence), default: fresh seeds
+    cache: cache.FeatureCache (or its directory) of the decoded clip and its log-spectrogram
+    cache_max_disk: bound in bytes of a cache directory (None: unbounded)
+    profiler: profiling.Profiler recording the effects, read_audio and save_audio
+    """
+
+    with measure(profiler, 'read_audio') as lengths:
+        audio, sr, log_spectrogram = read_features(input_path, cache, multichannel, method == 'spectrogram',
+                                                   cache_max_disk)
+        lengths['output'] = len(audio)
+    if chain is not None and not isinstance(chain, EffectChain):
+        chain = EffectChain.from_dict(chain)
+    for output, seed in zip(outputs, seeds or [None] * len(outputs)):
+        augmentor = AudioAugmentor(audio, sr, resample_quality=resample_quality, backend='numpy', headless=True,
+                                   profiler=profiler, multichannel=multichannel,
+                                   channel_randomness=channel_randomness, seed=seed,
+                                   log_spectrogram=log_spectrogram)
+        logger.debug("%s: seed %s", output, describe(augmentor.seed))
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        root, ext = os.path.splitext(output)
+        # Written under a temporary name so an interrupted run is not mistaken for a finished output
+        partial = f"{root}.partial{ext}"
+        if method == 'audio' and chain is not None:
+            chain.apply(augmentor)
+        elif method == 'audio':
+            augmentor.augment_audio()
+        else:
+            spectrogram = augmentor.augment_spectrogram(effects or [])
+        with measure(profiler, 'save_audio', len(augmentor.waveform)):
+            if method == 'audio':
+                save_audio(partial, augmentor.waveform, sr, subtype)
+            else:
+                np.save(partial, spectrogram)
+        os.replace(partial, output)
+    return len(audio) * len(outputs)
+
+
+def _augment_task(task):
+    """
+    Runs augment_file in a worker; the last item of the task holds the
+    Profiler arguments (None: no profiling). Returns (samples, records).
+    """
+
+    *arguments, profile = task
+    profiler = None if profile is None else Profiler(**profile)
+    samples = augment_file(*arguments, profiler=profiler)
+    return samples, [] if profiler is None else profiler.records
+
+
+def augment_directory(source, output_dir, workers=1, variants=1, resume=False,
+                      method='audio', effects=None, progress=None, resample_quality='balanced', chain=None,
+                      subtype=None, audio_format=None, multichannel=False, channel_randomness='correlated',
+                      seed=None, cache_dir=None, cache_max_disk=None, profiler=None):
+    """
+    Augments every audio file of a directory or glob pattern into output_dir.
+
+    source: input directory or glob pattern
+    workers: number of worker processes
+    variants: number of augmented versions of every input
+    resume: skip outputs that already exist
+    method: 'audio' writes audio files, 'spectrogram' writes .npy spectrograms
+    progress: callable receiving the summary after every file
+    resample_quality: resampling preset of pitch and stretch
+    chain: EffectChain of the audio method, sent to the workers as a plain dict
+    subtype: sample format of the audio outputs, e.g. 'PCM_16' (see save_audio)
+    audio_format: extension of the audio outputs, e.g. 'flac' (default: the input's)
+    multichannel: keep the channels of the inputs instead of averaging them to mono
+    channel_randomness: 'correlated' or 'independent' draws of the channels (see AudioAugmentor)
+    seed: root seed of the run; variant k of the i-th input (in sorted order) is
+        augmented with rng.child(seed, i, k), whatever the workers and resumed outputs
+    cache_dir: directory of a cache.FeatureCache shared by the workers and kept across runs
+    cache_max_disk: bytes of entries kept in cache_dir, the least recently used are deleted (None: unbounded)
+    profiler: profiling.Profiler receiving the records of every file, from every worker
+    """
+
+    root, files = find_inputs(source)
+    extension = '.npy' if method == 'spectrogram' else audio_format and '.' + audio_format.lstrip('.')
+    summary = AugmentationSummary(len(files))
+    chain = chain.to_dict() if isinstance(chain, EffectChain) else chain
+    profile = None if profiler is None else {'trace_memory': profiler.trace_memory}
+    root_seed = seed_sequence(seed)
+
+    tasks = []
+    for index, path in enumerate(files):
+        outputs = output_paths(path, root, output_dir, variants, extension)
+        seeds = [child(root_seed, index, k) for k in range(len(outputs))]
+        if resume:
+            kept = [k for k, output in enumerate(outputs) if not os.path.exists(output)]
+            outputs, seeds = [outputs[k] for k in kept], [seeds[k] for k in kept]
+        if outputs:
+            tasks.append((path, outputs, method, effects, resample_quality, chain, subtype, multichannel,
+                          channel_randomness, seeds, cache_dir, cache_max_disk, profile))
+        else:
+            summary.skipped += 1
+
+    def collect(task, result=None, error=None):
+        if error is None:
+            samples, records = result
+            summary.processed += 1
+            summary.written += len(task[1])
+            summary.samples += samples
+            if profiler is not None:
+                profiler.extend(records)
+        else:
+            summary.failed.append((task[0], error))
+        summary.elapsed = time.perf_counter() - summary.start
+        if progress is not None:
+            progress(summary)
+
+    if workers <= 1:
+        for task in tasks:
+            try:
+                collect(task, _augment_task(task))
+            except Exception as error:
+                collect(task, error=error)
+    else:
+        # Every output has its own seed: nothing depends on the worker that runs it
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_augment_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    collect(futures[future], future.result())
+                except Exception as error:
+                    collect(futures[future], error=error)
+
+    summary.elapsed = time.perf_counter() - summary.start
+    return summary
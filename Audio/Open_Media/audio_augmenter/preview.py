@@ -0,0 +1,47 @@
+"""
+Notebook previews of augmented audio. IPython and matplotlib are only
+imported when a preview is actually shown, so scripts, the CLI and worker
+processes never load them.
+"""
+
+import sys
+
+
+def in_notebook():
+    """
+    True when running inside a Jupyter/IPython kernel (not a terminal IPython shell).
+    """
+
+    # Only look at IPython when something else already imported it
+    if 'IPython' not in sys.modules:
+        return False
+    from IPython import get_ipython
+    shell = get_ipython()
+    return shell is not None and hasattr(shell, 'kernel')
+
+
+def play(waveform, sample_rate):
+    """
+    Audio player widget of a (samples, channels) waveform.
+    """
+
+    from IPython.display import Audio, display
+    display(Audio(waveform.T, rate=sample_rate))
+
+
+def plot_spectrogram(log_spectrogram, sample_rate, ax=None):
+    """
+    Image of a (..., frequencies, frames) log-spectrogram, the first channel
+    of a multichannel one.
+    """
+
+    import matplotlib.pyplot as plt
+    while log_spectrogram.ndim > 2:
+        log_spectrogram = log_spectrogram[0]
+    if ax is None:
+        _, ax = plt.subplots()
+    ax.imshow(log_spectrogram, origin='lower', aspect='auto',
+              extent=(0, log_spectrogram.shape[-1], 0, sample_rate / 2))
+    ax.set_xlabel('Frame')
+    ax.set_ylabel('Frequency [Hz]')
+    return ax
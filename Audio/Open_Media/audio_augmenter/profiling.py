@@ -0,0 +1,186 @@
+"""
+Opt-in instrumentation of the effects: wall time, CPU time, bytes allocated
+and input/output lengths of every call, exported as JSON or in the
+Prometheus text format.
+
+    with profile(augmentor, trace_memory=True) as profiler:
+        augmentor.augment_audio()
+    print(profiler.to_prometheus())
+
+Without a profiler an instrumented method costs one attribute check.
+"""
+
+import collections
+import contextlib
+import functools
+import json
+import time
+import tracemalloc
+
+
+EffectRecord = collections.namedtuple(
+    'EffectRecord', ['effect', 'wall_time', 'cpu_time', 'bytes_allocated', 'input_length', 'output_length'])
+
+# Prometheus metric: (record field, type, help)
+METRICS = {
+    'calls_total': (None, 'counter', 'Number of calls.'),
+    'wall_seconds_total': ('wall_time', 'counter', 'Wall time spent in the calls.'),
+    'cpu_seconds_total': ('cpu_time', 'counter', 'CPU time of the process during the calls.'),
+    'allocated_bytes_total': ('bytes_allocated', 'counter', 'Peak bytes allocated by the calls (tracemalloc).'),
+    'input_samples_total': ('input_length', 'counter', 'Samples given to the calls.'),
+    'output_samples_total': ('output_length', 'counter', 'Samples returned by the calls.'),
+}
+
+
+class Profiler:
+    """
+    Collects an EffectRecord per instrumented call.
+
+        trace_memory: also measure the bytes allocated (starts tracemalloc,
+            which slows numpy allocations down); nested calls share the peak
+        callbacks: functions called with every new record
+    """
+
+    def __init__(self, trace_memory=False, callbacks=()):
+        self.trace_memory = trace_memory
+        self.callbacks = list(callbacks)
+        self.records = []
+
+    def reset(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+        for callback in self.callbacks:
+            callback(record)
+
+    def extend(self, records):
+        """
+        Adds records of another profiler (e.g. of a worker process).
+        """
+
+        for record in records:
+            self.add(EffectRecord(*record))
+
+    @contextlib.contextmanager
+    def measure(self, effect, input_length=None):
+        """
+        Records the block as one call of effect. The block can set the
+        output length through the yielded dict: lengths['output'] = n.
+        """
+
+        lengths = {'output': None}
+        tracing = self.trace_memory
+        if tracing:
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        cpu, wall = time.process_time(), time.perf_counter()
+        try:
+            yield lengths
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            allocated = None
+            if tracing:
+                allocated = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                if started:
+                    tracemalloc.stop()
+            self.add(EffectRecord(effect, wall, cpu, allocated, input_length, lengths['output']))
+
+    def summary(self):
+        """
+        Totals per effect, in the order the effects were first called.
+        """
+
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record.effect, {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0,
+                                                      'bytes_allocated': 0, 'input_length': 0,
+                                                      'output_length': 0})
+            total['calls'] += 1
+            for field in ('wall_time', 'cpu_time', 'bytes_allocated', 'input_length', 'output_length'):
+                total[field] += getattr(record, field) or 0
+        return totals
+
+    def to_json(self, **kwargs):
+        return json.dumps({'records': [record._asdict() for record in self.records],
+                           'summary': self.summary()}, **kwargs)
+
+    def to_prometheus(self, prefix='audio_augmenter_effect'):
+        lines = []
+        summary = self.summary()
+        for metric, (field, kind, description) in METRICS.items():
+            if field == 'bytes_allocated' and not self.trace_memory:
+                continue
+            name = f"{prefix}_{metric}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for effect, total in summary.items():
+                value = total['calls'] if field is None else total[field]
+                lines.append(f'{name}{{effect="{effect}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Writes the records as JSON (.json) or Prometheus text (any other extension).
+        """
+
+        with open(path, 'w') as file:
+            file.write(self.to_json(indent=1) if path.endswith('.json') else self.to_prometheus())
+
+    def format_summary(self):
+        """
+        Human-readable table of summary().
+        """
+
+        lines = [f"{'effect':>20s} {'calls':>6s} {'wall s':>9s} {'cpu s':>9s} {'MB alloc':>9s} {'samples in':>11s}"]
+        for effect, total in self.summary().items():
+            lines.append(f"{effect:>20s} {total['calls']:6d} {total['wall_time']:9.4f} {total['cpu_time']:9.4f} "
+                         f"{total['bytes_allocated'] / (1 << 20):9.1f} {total['input_length']:11d}")
+        return '\n'.join(lines)
+
+
+def measure(profiler, effect, input_length=None):
+    """
+    profiler.measure(...), or a no-op context without a profiler.
+    """
+
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.measure(effect, input_length)
+
+
+def profiled(method):
+    """
+    Records the calls of an AudioAugmentor method in its profiler, if it has one.
+    """
+
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.profiler
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        with profiler.measure(name, self._length) as lengths:
+            result = method(self, *args, **kwargs)
+            lengths['output'] = self._length
+        return result
+    return wrapper
+
+
+@contextlib.contextmanager
+def profile(augmentor, profiler=None, **kwargs):
+    """
+    Attaches a profiler (a new Profiler(**kwargs) by default) to the
+    augmentor for the duration of the block.
+    """
+
+    profiler = Profiler(**kwargs) if profiler is None else profiler
+    previous, augmentor.profiler = augmentor.profiler, profiler
+    try:
+        yield profiler
+    finally:
+        augmentor.profiler = previous
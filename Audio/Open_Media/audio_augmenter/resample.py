@@ -0,0 +1,190 @@
+"""
+Resampling backends used by change_pitch and time_stretch.
+
+'fft' is scipy.signal.resample over the whole signal (exact length, slow
+for lengths with large prime factors), 'poly' approximates the ratio by a
+fraction up/down and filters with a polyphase FIR (scipy.signal.resample_poly),
+'stream' computes the same polyphase filter block by block.
+"""
+
+import math
+from fractions import Fraction
+import numpy as np
+import scipy.signal
+
+
+# Quality/speed presets: rational ratio precision and FIR length (in output periods)
+QUALITY_PRESETS = {
+    'fast': dict(backend='poly', max_denominator=64, half_width=4, beta=5.0),
+    'balanced': dict(backend='poly', max_denominator=1000, half_width=10, beta=5.0),
+    'best': dict(backend='fft'),
+}
+
+
+def rational_ratio(num_in, num_out, max_denominator=1000):
+    """
+    up/down approximation of num_out / num_in.
+    """
+
+    ratio = Fraction(num_out, max(num_in, 1)).limit_denominator(max_denominator)
+    return max(ratio.numerator, 1), ratio.denominator
+
+
+def polyphase_filter(up, down, half_width=10, beta=5.0):
+    """
+    Kaiser-windowed low-pass FIR of 2 * half_width * max(up, down) + 1 taps,
+    the same design as scipy.signal.resample_poly.
+    """
+
+    max_rate = max(up, down)
+    if max_rate == 1:
+        # 1:1 ratio, the cutoff would be at Nyquist
+        return np.ones(1)
+    half_len = half_width * max_rate
+    return scipy.signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', beta))
+
+
+def _fit_length(y, num, axis):
+    """
+    Trims or zero-pads y to num samples along axis.
+    """
+
+    length = y.shape[axis]
+    if length >= num:
+        return np.take(y, np.arange(num), axis=axis)
+    pad = [(0, 0)] * y.ndim
+    pad[axis] = (0, num - length)
+    return np.pad(y, pad)
+
+
+def resample_fft(x, num, axis=0, **options):
+    return scipy.signal.resample(x, num, axis=axis)
+
+
+def resample_polyphase(x, num, axis=0, max_denominator=1000, half_width=10, beta=5.0, **options):
+    x = np.asarray(x)
+    up, down = rational_ratio(x.shape[axis], num, max_denominator)
+    if up == down:
+        return _fit_length(x.copy(), num, axis)
+    h = polyphase_filter(up, down, half_width, beta)
+    return _fit_length(scipy.signal.resample_poly(x, up, down, axis=axis, window=h), num, axis)
+
+
+def resample_streaming(x, num, axis=0, max_denominator=1000, half_width=10, beta=5.0, blocksize=65536, **options):
+    x = np.moveaxis(np.asarray(x), axis, 0)
+    up, down = rational_ratio(x.shape[0], num, max_denominator)
+    resampler = StreamingResampler(up, down, half_width, beta)
+    blocks = [resampler.process(x[i:i + blocksize]) for i in range(0, x.shape[0], blocksize)]
+    blocks.append(resampler.flush())
+    return np.moveaxis(_fit_length(np.concatenate(blocks), num, 0), 0, axis)
+
+
+# Registered backends: name -> function(x, num, axis=0, **options)
+BACKENDS = {
+    'fft': resample_fft,
+    'poly': resample_polyphase,
+    'stream': resample_streaming,
+}
+
+
+def register_backend(name, function):
+    """
+    Adds a resampling backend, function(x, num, axis=0, **options) -> array of num samples.
+    """
+
+    BACKENDS[name] = function
+
+
+def resample(x, num, quality='best', backend=None, axis=0, **options):
+    """
+    Resamples x to num samples along axis.
+
+    quality: 'fast', 'balanced' or 'best' preset
+    backend: overrides the backend of the preset ('fft', 'poly', 'stream' or a registered one)
+    options: override the preset parameters (max_denominator, half_width, beta, blocksize)
+    """
+
+    if quality not in QUALITY_PRESETS:
+        raise ValueError(f"Unknown resampling quality: {quality}")
+    settings = dict(QUALITY_PRESETS[quality])
+    settings.update(options)
+    name = backend or settings.pop('backend')
+    settings.pop('backend', None)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown resampling backend: {name}")
+    return BACKENDS[name](x, num, axis=axis, **settings)
+
+
+class StreamingResampler:
+    """
+    Polyphase resampling by up/down, block by block.
+
+    Produces the same samples as scipy.signal.resample_poly with the
+    polyphase_filter() design, keeping only the input samples that the
+    next outputs still need.
+    """
+
+    def __init__(self, up, down, half_width=10, beta=5.0, chunk=4096):
+        divisor = math.gcd(up, down)
+        self.up = up // divisor
+        self.down = down // divisor
+        self.chunk = chunk
+        h = polyphase_filter(self.up, self.down, half_width, beta) * self.up
+        self.half_len = (len(h) - 1) // 2
+        # Filter split in up phases of num_taps coefficients: phases[p, k] = h[p + up * k]
+        self.num_taps = -(-len(h) // self.up)
+        padded = np.zeros(self.up * self.num_taps)
+        padded[:len(h)] = h
+        self.phases = padded.reshape(self.num_taps, self.up).T
+        self.buffer = None
+        self.buffer_start = 0
+        self.received = 0
+        self.position = 0
+
+    def _last_input(self, m):
+        # Newest input sample read by output m
+        return (m * self.down + self.half_len) // self.up
+
+    def _render(self, stop):
+        outputs = []
+        taps = np.arange(self.num_taps)
+        trailing = (1,) * (self.buffer.ndim - 1)
+        for first in range(self.position, stop, self.chunk):
+            m = np.arange(first, min(first + self.chunk, stop))
+            u = m * self.down + self.half_len
+            index = (u // self.up)[:, np.newaxis] - taps[np.newaxis, :]
+            valid = (index >= 0) & (index < self.received)
+            samples = self.buffer[np.clip(index - self.buffer_start, 0, len(self.buffer) - 1)]
+            weights = np.where(valid, self.phases[u % self.up], 0.0).reshape(*valid.shape, *trailing)
+            outputs.append((samples * weights).sum(axis=1).astype(self.buffer.dtype))
+        self.position = stop
+
+        # Oldest input sample the next output reads
+        keep_from = max(min(self._last_input(self.position) - self.num_taps + 1, self.received), self.buffer_start)
+        self.buffer = self.buffer[keep_from - self.buffer_start:]
+        self.buffer_start = keep_from
+        if not outputs:
+            return self.buffer[:0]
+        return np.concatenate(outputs)
+
+    def process(self, block):
+        """
+        Resamples the next block, returns the outputs whose inputs have all arrived.
+        """
+
+        block = np.asarray(block)
+        self.buffer = block if self.buffer is None else np.concatenate([self.buffer, block])
+        self.received += len(block)
+        # Outputs m with _last_input(m) <= received - 1
+        stop = (self.up * self.received - 1 - self.half_len) // self.down + 1
+        return self._render(max(stop, self.position))
+
+    def flush(self):
+        """
+        The remaining outputs, up to ceil(num_inputs * up / down).
+        """
+
+        if self.buffer is None:
+            return np.zeros(0)
+        total = -(-self.received * self.up // self.down)
+        return self._render(max(total, self.position))
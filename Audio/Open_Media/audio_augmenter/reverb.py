@@ -0,0 +1,249 @@
+"""
+Convolution effects: multi-tap echo and reverb with an impulse response
+(IR), computed by overlap-add FFT convolution instead of O(N * M) direct
+convolution.
+
+The spectrum of an IR only depends on the IR and the FFT size, so it is
+computed once and kept in a shared cache: a dataset augmented with a set
+of recorded room IRs transforms each of them once per process. Synthetic
+IRs drawn at random are never used twice and bypass the cache. The
+convolution runs block by block with the tail of every block carried over,
+so the same code serves whole signals, streams and batches (the trailing
+axes of the signal are channels or clips).
+"""
+
+import collections
+import functools
+import hashlib
+import threading
+import numpy as np
+import scipy.fft
+
+
+# Smallest FFT of the overlap-add, and its size relative to the IR length
+MIN_FFT_SIZE = 1 << 12
+FFT_SIZE_FACTOR = 4
+
+
+def fft_size(ir_length):
+    """
+    FFT size for an IR of ir_length samples: blocks of about 3/4 of the
+    FFT size are transformed at once, fast sizes only.
+    """
+
+    return scipy.fft.next_fast_len(max(FFT_SIZE_FACTOR * ir_length, MIN_FFT_SIZE), real=True)
+
+
+class SpectrumCache:
+    """
+    Least recently used cache of IR spectra, keyed by a hash of the IR
+    samples and the FFT size (an IR built again from the same parameters
+    hits the cache).
+    """
+
+    def __init__(self, max_spectra=32):
+        self.max_spectra = max_spectra
+        self.hits = 0
+        self.misses = 0
+        self._spectra = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def spectrum(self, ir, nfft):
+        """
+        rfft of ir (shape (M,) or (M, ...)) zero-padded to nfft samples, along the first axis.
+        """
+
+        key = (hashlib.blake2b(ir.tobytes(), digest_size=16).digest(), ir.shape, ir.dtype.str, nfft)
+        with self._lock:
+            spectrum = self._spectra.get(key)
+            if spectrum is not None:
+                self.hits += 1
+                self._spectra.move_to_end(key)
+                return spectrum
+        spectrum = scipy.fft.rfft(ir, nfft, axis=0)
+        with self._lock:
+            self.misses += 1
+            self._spectra[key] = spectrum
+            if len(self._spectra) > self.max_spectra:
+                self._spectra.popitem(last=False)
+        return spectrum
+
+    def __len__(self):
+        return len(self._spectra)
+
+
+# The cache shared by all convolutions of the process
+default_cache = SpectrumCache()
+
+
+class OverlapAdd:
+    """
+    Convolution of a stream with an IR by overlap-add: every call of
+    process() returns as many samples as it is given, the part of the
+    convolution that reaches past them is added to the next block.
+
+        ir: impulse response, shape (M,) for all channels or (M, channels)
+    """
+
+    def __init__(self, ir, cache=default_cache):
+        self.ir = np.ascontiguousarray(ir, dtype=np.float32)
+        if self.ir.ndim == 0 or len(self.ir) == 0:
+            raise ValueError("The impulse response must have at least one sample")
+        self.nfft = fft_size(len(self.ir))
+        # Input samples per FFT, so that the linear convolution fits in it
+        self.hop = self.nfft - len(self.ir) + 1
+        self.spectrum = cache.spectrum(self.ir, self.nfft) if cache is not None else \
+            scipy.fft.rfft(self.ir, self.nfft, axis=0)
+        self.tail = None
+
+    def process(self, block, out=None):
+        """
+        Convolves the next block (shape (num_samples, ...)) of the stream.
+        out: optional output array of the block shape, must not overlap block
+        """
+
+        block = np.asarray(block, dtype=np.float32)
+        out = np.empty_like(block) if out is None else out
+        if self.tail is None:
+            self.tail = np.zeros((len(self.ir) - 1,) + np.broadcast_shapes(block.shape[1:], self.ir.shape[1:]),
+                                 dtype=np.float32)
+        # Broadcast the spectrum of a single-channel IR over the trailing axes
+        spectrum = self.spectrum.reshape(self.spectrum.shape + (1,) * (block.ndim - self.ir.ndim))
+        overlap = len(self.tail)
+        for start in range(0, len(block), self.hop):
+            segment = block[start:start + self.hop]
+            count = len(segment)
+            result = scipy.fft.irfft(scipy.fft.rfft(segment, self.nfft, axis=0) * spectrum, self.nfft, axis=0)
+            result = result[:count + overlap]
+            result[:overlap] += self.tail
+            out[start:start + count] = result[:count]
+            self.tail = result[count:].astype(np.float32)
+        return out
+
+
+def fft_convolve(signal, ir, out=None, cache=default_cache):
+    """
+    The first len(signal) samples of the convolution of signal (shape
+    (num_samples, ...)) with ir along the first axis: the length is kept,
+    the tail past the end is dropped.
+    """
+
+    return OverlapAdd(ir, cache).process(signal, out=out)
+
+
+def multitap_ir(sample_rate, delay=0.1, decay=0.4, num_taps=4):
+    """
+    IR of an echo repeated num_taps times: the direct sound, then taps
+    every delay seconds, each decay times quieter than the previous one.
+    """
+
+    if delay < 0:
+        raise ValueError(f"The echo delay must be positive, got {delay}")
+    delay_samples = int(delay * sample_rate)
+    num_taps = int(round(num_taps))
+    ir = np.zeros(num_taps * delay_samples + 1, dtype=np.float32)
+    ir[0] = 1
+    for tap in range(1, num_taps + 1):
+        ir[tap * delay_samples] += decay ** tap
+    return ir
+
+
+def room_ir(sample_rate, rt60=0.5, rng=None, shape=()):
+    """
+    Synthetic room IR: Gaussian noise decaying by 60 dB over rt60 seconds,
+    of unit energy. shape adds trailing axes (e.g. one IR per channel).
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+    length = max(int(rt60 * sample_rate), 1)
+    envelope = 10 ** (-3 * np.arange(length) / length)
+    ir = rng.standard_normal((length,) + tuple(shape)) * envelope.reshape((-1,) + (1,) * len(shape))
+    ir /= np.sqrt(np.sum(ir ** 2, axis=0))
+    return ir.astype(np.float32)
+
+
+def mix_ir(ir, wet=0.3):
+    """
+    IR of the dry signal mixed with the signal convolved with ir:
+    (1 - wet) * x + wet * (x * ir).
+    """
+
+    mixed = np.array(ir, dtype=np.float32) * wet
+    mixed[0] += 1 - wet
+    return mixed
+
+
+def stack_irs(irs):
+    """
+    IRs of different lengths as the columns of one (M, len(irs)) IR, zero-padded.
+    """
+
+    stacked = np.zeros((max(len(ir) for ir in irs), len(irs)), dtype=np.float32)
+    for column, ir in enumerate(irs):
+        stacked[:len(ir), column] = ir
+    return stacked
+
+
+def downmix_ir(ir):
+    """
+    Single-channel IR of an IR of shape (M, channels): the mean of the
+    channels, scaled to their mean energy. A (M,) IR is returned as is.
+    """
+
+    ir = np.asarray(ir, dtype=np.float32)
+    if ir.ndim == 1:
+        return ir
+    ir = ir.reshape(len(ir), -1)
+    mono = ir.mean(axis=1)
+    energy = np.sum(mono.astype(np.float64) ** 2)
+    if energy > 0:
+        mono *= np.sqrt(np.mean(np.sum(ir.astype(np.float64) ** 2, axis=0)) / energy)
+    return mono.astype(np.float32)
+
+
+def match_ir_channels(ir, channels):
+    """
+    ir (shape (M,) or (M, c)) for a signal of channels channels: kept when
+    it has one IR per channel, else downmixed to a single (M,) IR.
+    """
+
+    ir = np.asarray(ir, dtype=np.float32)
+    if ir.ndim > 1 and (channels == 1 or ir.reshape(len(ir), -1).shape[1] != channels):
+        return downmix_ir(ir)
+    return ir
+
+
+def reverb_ir(sample_rate, rt60=0.5, wet=0.3, ir=None, rng=None, shape=(), channels=None):
+    """
+    IR of a reverb: ir (an array, or the path of an audio file, see load_ir)
+    or else a synthetic room_ir() drawn from rng, mixed with the dry signal.
+    channels: channels of the signal, a given ir is matched to them (see match_ir_channels)
+    """
+
+    if ir is None:
+        ir = room_ir(sample_rate, rt60, rng, shape)
+    else:
+        ir = load_ir(ir, sample_rate) if isinstance(ir, str) else ir
+        if channels is not None:
+            ir = match_ir_channels(ir, channels)
+    return mix_ir(ir, wet)
+
+
+@functools.lru_cache(maxsize=32)
+def load_ir(path, sample_rate):
+    """
+    IR of an audio file, resampled to sample_rate, with unit energy per
+    channel; shape (M,) or (M, channels).
+    """
+
+    from .utils import read_audio
+    from .resample import resample
+    ir, ir_rate = read_audio(path, dtype='float32')
+    if ir_rate != sample_rate:
+        ir = resample(ir, max(int(round(len(ir) * sample_rate / ir_rate)), 1))
+    ir = np.asarray(ir, dtype=np.float32)
+    energy = np.sqrt(np.sum(ir ** 2, axis=0))
+    ir /= np.where(energy > 0, energy, 1)
+    # Shared by every caller: read-only so nobody changes the cached IR
+    ir.flags.writeable = False
+    return ir
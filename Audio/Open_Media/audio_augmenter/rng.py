@@ -0,0 +1,70 @@
+"""
+Random number generators of the augmenters. Every augmenter draws from
+its own numpy Generator instead of the global np.random state, so workers
+of a process or thread pool never share (or fork copies of) a state.
+
+Seeds are numpy SeedSequences: one root seed spawns an independent child
+for every file, variant or worker, and the child of any output can be
+rebuilt from its description to regenerate that output exactly.
+
+    seeds = spawn(1234, len(files))           # one per file, for a pool
+    augmentor = AudioAugmentor(audio, sr, seed=seeds[0])
+    describe(seeds[0])                        # {'entropy': 1234, 'spawn_key': [0]}
+
+The drawn parameters are logged at DEBUG level on the 'audio_augmenter' logger.
+"""
+
+import logging
+import numpy as np
+
+
+logger = logging.getLogger('audio_augmenter')
+
+
+def seed_sequence(seed=None):
+    """
+    SeedSequence of a seed: None (fresh OS entropy), an int or a sequence of
+    ints, a SeedSequence or its describe() dict.
+    """
+
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, dict):
+        return np.random.SeedSequence(seed['entropy'], spawn_key=tuple(seed.get('spawn_key', ())))
+    return np.random.SeedSequence(seed)
+
+
+def make_rng(seed=None):
+    """
+    Generator of a seed (see seed_sequence); a Generator is returned as is.
+    """
+
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed_sequence(seed))
+
+
+def spawn(seed, count):
+    """
+    count independent child SeedSequences of a seed, e.g. one per task of a pool.
+    """
+
+    return seed_sequence(seed).spawn(count)
+
+
+def child(seed, *key):
+    """
+    The child of a seed at a fixed spawn key: unlike spawn(), it does not
+    depend on how many children were spawned before (e.g. skipped outputs).
+    """
+
+    parent = seed_sequence(seed)
+    return np.random.SeedSequence(parent.entropy, spawn_key=parent.spawn_key + tuple(key))
+
+
+def describe(seed):
+    """
+    JSON-serializable description of a SeedSequence, accepted by seed_sequence().
+    """
+
+    return {'entropy': seed.entropy, 'spawn_key': list(seed.spawn_key)}
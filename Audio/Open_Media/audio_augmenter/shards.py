@@ -0,0 +1,289 @@
+"""
+Sharded output of augmented datasets: instead of one file per augmented
+clip, samples are packed into tar shards of bounded size (the WebDataset
+layout: <key>.npy holds the waveform or spectrogram, <key>.json the
+metadata with the applied effects and parameters), next to an index.jsonl
+with the offset of every array in its shard.
+
+    augment_to_shards('dataset/', 'shards/', workers=8, variants=3)
+    for key, array, metadata in ShardReader('shards/'):
+        ...
+"""
+
+import io
+import json
+import os
+import tarfile
+import time
+import collections
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .cache import read_features
+from .augment import AudioAugmentor
+from .chain import EffectChain
+from .masking import apply_mask, effect_masks
+from .parallel import AugmentationSummary, find_inputs
+from .rng import child, describe, seed_sequence
+
+
+TAR_BLOCK = 512
+INDEX_NAME = 'index.jsonl'
+# In-flight tasks per worker: enough to keep the workers busy, while the
+# results waiting behind a slow clip stay bounded
+TASKS_PER_WORKER = 2
+
+
+class ShardWriter:
+    """
+    Writes (key, array, metadata) samples into directory/<prefix>-000000.tar,
+    ... starting a new shard after max_count samples or max_size bytes.
+    Every shard is written under a .partial name and renamed when complete.
+    """
+
+    def __init__(self, directory, prefix='shard', max_count=1000, max_size=1 << 30):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_count = max_count
+        self.max_size = max_size
+        self.shards = []
+        self._tar = None
+        self._count = 0
+        os.makedirs(directory, exist_ok=True)
+        self._index = open(os.path.join(directory, INDEX_NAME + '.partial'), 'w')
+
+    def _open_shard(self):
+        name = f"{self.prefix}-{len(self.shards):06d}.tar"
+        self.shards.append(name)
+        self._tar = tarfile.open(os.path.join(self.directory, name + '.partial'), 'w', format=tarfile.PAX_FORMAT)
+        self._count = 0
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            path = os.path.join(self.directory, self.shards[-1])
+            os.replace(path + '.partial', path)
+            self._tar = None
+
+    def _add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self._tar.addfile(info, io.BytesIO(data))
+        # The data ends the member, padded to whole blocks
+        return self._tar.offset - -(-len(data) // TAR_BLOCK) * TAR_BLOCK
+
+    def write(self, key, array, metadata=None):
+        """
+        Adds one sample. key must not contain dots (they separate the
+        extension in the WebDataset layout).
+        """
+
+        if '.' in key:
+            raise ValueError(f"Sample keys cannot contain dots: {key}")
+        if self._tar is None or self._count >= self.max_count or self._tar.offset >= self.max_size:
+            self._close_shard()
+            self._open_shard()
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+        data = buffer.getvalue()
+        offset = self._add(f"{key}.npy", data)
+        metadata = metadata or {}
+        self._add(f"{key}.json", json.dumps(metadata).encode())
+        self._count += 1
+        self._index.write(json.dumps({'key': key, 'shard': self.shards[-1], 'offset': offset,
+                                      'size': len(data), 'metadata': metadata}) + '\n')
+
+    def close(self):
+        self._close_shard()
+        if not self._index.closed:
+            self._index.close()
+            path = os.path.join(self.directory, INDEX_NAME)
+            os.replace(path + '.partial', path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_shard(path):
+    """
+    (key, array, metadata) of every sample of a tar shard, read sequentially.
+    """
+
+    arrays, metadata = {}, {}
+    with tarfile.open(path, 'r|') as tar:
+        for member in tar:
+            key, _, extension = member.name.partition('.')
+            data = tar.extractfile(member).read()
+            if extension == 'npy':
+                arrays[key] = np.load(io.BytesIO(data), allow_pickle=False)
+            elif extension == 'json':
+                metadata[key] = json.loads(data)
+            if key in arrays and key in metadata:
+                yield key, arrays.pop(key), metadata.pop(key)
+
+
+class ShardReader:
+    """
+    Reader of a directory written by ShardWriter: iterating reads the shards
+    sequentially, indexing maps one array straight from its shard (via the
+    index) without reading anything else.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_NAME)) as index:
+            self.entries = [json.loads(line) for line in index if line.strip()]
+        self.shards = list(dict.fromkeys(entry['shard'] for entry in self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        """
+        (key, array, metadata) of a sample, the array memory-mapped from the shard.
+        """
+
+        entry = self.entries[index]
+        path = os.path.join(self.directory, entry['shard'])
+        with open(path, 'rb') as file:
+            file.seek(entry['offset'])
+            if np.lib.format.read_magic(file) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            data_offset = file.tell()
+        array = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=shape,
+                          order='F' if fortran_order else 'C')
+        return entry['key'], array, entry['metadata']
+
+    def __iter__(self):
+        for shard in self.shards:
+            yield from iter_shard(os.path.join(self.directory, shard))
+
+
+def augment_clip(input_path, keys, method='audio', effects=None, resample_quality='balanced', chain=None,
+                 multichannel=False, channel_randomness='correlated', seeds=None, cache=None, cache_max_disk=None):
+    """
+    Augmented versions of one file: returns the (key, array, metadata) of
+    every key and the number of input samples processed. seeds holds the
+    seed of every key (default: fresh seeds), recorded in its metadata.
+    cache: cache.FeatureCache (or its directory) of the decoded clip and its log-spectrogram
+    cache_max_disk: bound in bytes of a cache directory (None: unbounded)
+    """
+
+    audio, sr, log_spectrogram = read_features(input_path, cache, multichannel, method != 'audio', cache_max_disk)
+    chain = EffectChain.default() if chain is None else EffectChain.from_dict(chain)
+    samples = []
+    for variant, (key, seed) in enumerate(zip(keys, seeds or [None] * len(keys))):
+        augmentor = AudioAugmentor(audio, sr, resample_quality=resample_quality, backend='numpy', headless=True,
+                                   multichannel=multichannel, channel_randomness=channel_randomness, seed=seed,
+                                   log_spectrogram=log_spectrogram)
+        metadata = {'source': input_path, 'variant': variant, 'sample_rate': sr, 'method': method,
+                    'seed': describe(augmentor.seed)}
+        if method == 'audio':
+            metadata['effects'] = [[name, params] for name, params in chain.apply(augmentor)]
+            array = augmentor.waveform
+        else:
+            num_time_masks, num_freq_masks = effect_masks(effects or [], augmentor.num_masks)
+            metadata['effects'] = [
+                [name, {'num_masks': num_masks, 'mask_param': mask_param}]
+                for name, num_masks, mask_param in (
+                    ('TimeMasking', num_time_masks, augmentor.time_mask_param),
+                    ('FrequencyMasking', num_freq_masks, augmentor.freq_mask_param))
+                if num_masks]
+            spectrogram, mask = augmentor.augment_spectrogram(effects or [], return_mask=True)
+            array = apply_mask(spectrogram, mask)
+        samples.append((key, np.asarray(array), metadata))
+    return samples, len(audio) * len(keys)
+
+
+def _augment_clip_task(task):
+    try:
+        return augment_clip(*task), None
+    except Exception as error:
+        return (None, 0), error
+
+
+def bounded_map(executor, fn, items, window):
+    """
+    executor.map(fn, items) with at most window tasks submitted and not
+    yet yielded, results in input order.
+    """
+
+    pending = collections.deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def sample_key(input_path, root, variant):
+    """
+    Key of a variant of an input: its relative path without extension,
+    with the dots and separators WebDataset keys cannot contain replaced.
+    """
+
+    stem = os.path.splitext(os.path.relpath(input_path, root))[0]
+    return stem.replace(os.sep, '/').replace('.', '_') + f"_aug{variant}"
+
+
+def augment_to_shards(source, output_dir, workers=1, variants=1, method='audio', effects=None,
+                      resample_quality='balanced', chain=None, max_count=1000, max_size=1 << 30,
+                      progress=None, multichannel=False, channel_randomness='correlated', seed=None,
+                      cache_dir=None, cache_max_disk=None):
+    """
+    Augments every audio file of a directory or glob pattern into tar
+    shards of output_dir (see ShardWriter). The workers augment, the parent
+    process writes the shards in input order.
+
+    chain: EffectChain of the audio method (default: EffectChain.default())
+    max_count, max_size: bounds of one shard, in samples and bytes
+    seed: root seed, variant k of the i-th input gets rng.child(seed, i, k);
+        the metadata of every sample holds its seed, so it can be regenerated
+    cache_dir: directory of a cache.FeatureCache shared by the workers and kept across runs
+    cache_max_disk: bytes of entries kept in cache_dir (None: unbounded)
+    The other parameters are those of parallel.augment_directory.
+    """
+
+    root, files = find_inputs(source)
+    summary = AugmentationSummary(len(files))
+    chain = chain.to_dict() if isinstance(chain, EffectChain) else chain
+    root_seed = seed_sequence(seed)
+    tasks = [(path, [sample_key(path, root, k) for k in range(variants)], method, effects,
+              resample_quality, chain, multichannel, channel_randomness,
+              [child(root_seed, index, k) for k in range(variants)], cache_dir, cache_max_disk)
+             for index, path in enumerate(files)]
+
+    with ShardWriter(output_dir, max_count=max_count, max_size=max_size) as writer:
+        def collect(task, result, error):
+            samples, num_samples = result
+            if error is None:
+                for key, array, metadata in samples:
+                    metadata['source'] = os.path.relpath(task[0], root)
+                    writer.write(key, array, metadata)
+                summary.processed += 1
+                summary.written += len(samples)
+                summary.samples += num_samples
+            else:
+                summary.failed.append((task[0], error))
+            summary.elapsed = time.perf_counter() - summary.start
+            if progress is not None:
+                progress(summary)
+
+        if workers <= 1:
+            for task in tasks:
+                collect(task, *_augment_clip_task(task))
+        else:
+            # Every sample has its own seed: nothing depends on the worker that runs it
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = bounded_map(executor, _augment_clip_task, tasks, TASKS_PER_WORKER * workers)
+                for task, result in zip(tasks, results):
+                    collect(task, *result)
+
+    summary.elapsed = time.perf_counter() - summary.start
+    return summary
@@ -0,0 +1,143 @@
+import collections
+import threading
+import numpy as np
+import scipy.fft
+import scipy.signal
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class SpectrogramEngine:
+    """
+    Power spectral density spectrogram, the same as scipy.signal.spectrogram
+    with its defaults (Tukey window, constant detrend, one-sided density),
+    with everything that only depends on the parameters computed once:
+    the window, the density scale, the frequency axis, the time axes per
+    signal length and the output buffers. The FFT size never changes, so
+    scipy.fft keeps reusing the same plan. Only the time axes and buffers of
+    the max_shapes most recently used lengths are kept, so clips of
+    variable length do not grow the shared engines without bound.
+    """
+
+    max_shapes = 8
+    _engines = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, sample_rate, nperseg=256, noverlap=None):
+        """
+        Shared engine for (sample_rate, nperseg, noverlap).
+        """
+
+        key = (sample_rate, nperseg, noverlap)
+        engine = cls._engines.get(key)
+        if engine is None:
+            with cls._lock:
+                engine = cls._engines.setdefault(key, cls(sample_rate, nperseg, noverlap))
+        return engine
+
+    def __init__(self, sample_rate, nperseg=256, noverlap=None):
+        """
+            sample_rate: Sampling rate
+            nperseg: Length of each segment
+            noverlap: Number of overlapping samples (default: nperseg // 8)
+        """
+
+        self.sample_rate = sample_rate
+        self.nperseg = nperseg
+        self.noverlap = nperseg // 8 if noverlap is None else noverlap
+        self.step = nperseg - self.noverlap
+        self.window = scipy.signal.get_window(('tukey', .25), nperseg).astype(np.float32)
+        self.scale = np.float32(1.0 / (sample_rate * np.sum(self.window.astype(np.float64) ** 2)))
+        self.frequencies = scipy.fft.rfftfreq(nperseg, 1 / sample_rate)
+        self._times = collections.OrderedDict()
+        self._buffers = collections.OrderedDict()
+
+    def num_frames(self, num_samples):
+        return max((num_samples - self.nperseg) // self.step + 1, 0)
+
+    def times(self, num_samples):
+        """
+        Centers of the segments of a signal of num_samples samples, in seconds.
+        """
+
+        num_frames = self.num_frames(num_samples)
+        times = self._times.get(num_frames)
+        if times is None:
+            times = (self.nperseg / 2 + np.arange(num_frames) * self.step) / self.sample_rate
+        self._remember(self._times, num_frames, times)
+        return times
+
+    def output_shape(self, shape):
+        return tuple(shape[:-1]) + (len(self.frequencies), self.num_frames(shape[-1]))
+
+    def buffer(self, shape):
+        """
+        Reusable float32 output buffer of a spectrogram of the given shape.
+        """
+
+        buffer = self._buffers.get(shape)
+        if buffer is None:
+            buffer = np.empty(shape, dtype=np.float32)
+        self._remember(self._buffers, shape, buffer)
+        return buffer
+
+    def _remember(self, entries, key, value):
+        """
+        Stores value as the most recently used entry, dropping the oldest beyond max_shapes.
+        """
+
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_shapes:
+                entries.popitem(last=False)
+
+    def spectrogram(self, x, out=None):
+        """
+        Spectrogram of x along the last axis, shape (..., frequencies, frames).
+        Any leading axes (channels, clips of a batch) are processed together.
+        """
+
+        x = np.asarray(x, dtype=np.float32)
+        if x.shape[-1] < self.nperseg:
+            raise ValueError(f"Signal of {x.shape[-1]} samples is shorter than nperseg={self.nperseg}")
+        out = np.empty(self.output_shape(x.shape), dtype=np.float32) if out is None else out
+
+        segments = sliding_window_view(x, self.nperseg, axis=-1)[..., ::self.step, :]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        segments *= self.window
+        spectrum = scipy.fft.rfft(segments, axis=-1)
+
+        # |X|^2 written straight into the (frequencies, frames) layout of out
+        power = np.swapaxes(out, -1, -2)
+        np.square(spectrum.real, out=power)
+        power += np.square(spectrum.imag)
+        power *= self.scale
+        # One-sided density: every bin except DC (and Nyquist for even lengths) counts twice
+        last = -1 if self.nperseg % 2 == 0 else None
+        out[..., 1:last, :] *= 2
+        return out
+
+    def log_spectrogram(self, x, out=None):
+        """
+        log(spectrogram + 1e-10), computed in place. Without out the
+        engine's buffer for this shape is used and overwritten by the next call.
+        """
+
+        x = np.asarray(x)
+        if out is None:
+            out = self.buffer(self.output_shape(x.shape))
+        self.spectrogram(x, out=out)
+        out += 1e-10
+        return np.log(out, out=out)
+
+
+def spectrogram_engine(sample_rate, num_samples, nperseg=256, noverlap=None):
+    """
+    Shared engine for a signal of num_samples samples (segments are
+    shortened to the signal length, as scipy.signal.spectrogram does).
+    """
+
+    if num_samples < nperseg:
+        nperseg, noverlap = num_samples, None
+    return SpectrogramEngine.get(sample_rate, nperseg, noverlap)
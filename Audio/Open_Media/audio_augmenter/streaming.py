@@ -0,0 +1,320 @@
+"""
+Block-by-block augmentation of files that do not fit in memory.
+
+Every stage transforms one block of samples and keeps the state the
+next block needs (echo tail, modulation phase, delay lines), so the
+output does not depend on the block size and memory is bounded by the
+block size plus the longest delay.
+"""
+
+import math
+from fractions import Fraction
+import numpy as np
+import soundfile as sf
+from .modulation import default_table, modulated_delay
+from .resample import QUALITY_PRESETS, StreamingResampler
+from .utils import output_subtype
+from .rng import logger, make_rng
+from .reverb import OverlapAdd, default_cache, multitap_ir, reverb_ir as reverb_impulse
+
+
+class NormalizeStage:
+    """
+    Scales by a factor found in a first pass over the file.
+    """
+
+    def __init__(self, scale):
+        self.scale = np.float32(scale)
+
+    def process(self, block):
+        return block * self.scale
+
+    def flush(self):
+        return None
+
+
+class NoiseStage:
+    """
+    Adds white noise drawn from the Generator rng.
+    """
+
+    def __init__(self, noise_level=0.005, rng=None):
+        self.noise_level = noise_level
+        self.rng = make_rng(rng)
+
+    def process(self, block):
+        noise = self.rng.standard_normal(block.shape, dtype=np.float32)
+        noise *= self.noise_level
+        return block + noise
+
+    def flush(self):
+        return None
+
+
+class GainStage:
+    """
+    Random volume change, drawn once for the whole stream.
+    """
+
+    def __init__(self, gain_range=(-10, 10), rng=None):
+        gain = make_rng(rng).uniform(*gain_range)
+        logger.debug("GainStage: gain=%s dB", gain)
+        self.factor = np.float32(10 ** (gain / 20))
+
+    def process(self, block):
+        return block * self.factor
+
+    def flush(self):
+        return None
+
+
+class EchoStage:
+    """
+    Adds an echo, keeping the last delay samples of the input as the tail.
+    """
+
+    def __init__(self, sample_rate, delay=0.1, decay=0.2):
+        self.delay_samples = int(delay * sample_rate)
+        self.decay = np.float32(decay)
+        self.tail = None
+
+    def process(self, block):
+        if self.tail is None:
+            self.tail = np.zeros((self.delay_samples,) + block.shape[1:], dtype=block.dtype)
+        buffer = np.concatenate([self.tail, block])
+        output = block + buffer[:len(block)] * self.decay
+        self.tail = buffer[len(buffer) - self.delay_samples:]
+        return output
+
+    def flush(self):
+        return None
+
+
+class ConvolutionStage:
+    """
+    Convolution with an impulse response (multi-tap echo, reverb) by
+    overlap-add, the IR tail of every block carried into the next ones.
+    """
+
+    def __init__(self, ir, cache=default_cache):
+        self.convolution = OverlapAdd(ir, cache)
+
+    def process(self, block):
+        return self.convolution.process(block)
+
+    def flush(self):
+        return None
+
+
+class FlangerStage:
+    """
+    Flanger over a delay line long enough for the deepest modulation.
+    """
+
+    def __init__(self, sample_rate, depth=1, rate=1.5, interpolation='none', table=default_table):
+        self.sample_rate = sample_rate
+        self.depth = depth
+        self.rate = rate
+        self.interpolation = interpolation
+        self.table = table
+        self.history_size = int(math.ceil(2 * depth * sample_rate)) + 2
+        self.history = None
+        # Index of the next input sample in the whole stream (modulation phase)
+        self.position = 0
+
+    def process(self, block):
+        if self.history is None:
+            self.history = block[:0]
+        buffer = np.concatenate([self.history, block])
+        lfo = self.table.lfo(self.rate, self.sample_rate, len(block), start=self.position)
+        delays = self.depth * self.sample_rate * (1 + lfo)
+        # Reads before the beginning of the stream are only possible while the history is short
+        delayed = modulated_delay(buffer, delays, interpolation=self.interpolation,
+                                  fill=0.0, offset=len(self.history))
+        np.clip(delayed, -1, 1, out=delayed)
+        delayed += block
+        np.clip(delayed, -1, 1, out=delayed)
+
+        self.position += len(block)
+        self.history = buffer[max(len(buffer) - self.history_size, 0):]
+        return delayed
+
+    def flush(self):
+        return None
+
+
+class VibratoStage:
+    """
+    Vibrato, reading up to depth seconds into the past and the future,
+    so the output lags the input by that many samples until flush().
+    """
+
+    def __init__(self, sample_rate, depth=0.005, frequency=3, interpolation='none', table=default_table):
+        self.sample_rate = sample_rate
+        self.depth = depth
+        self.frequency = frequency
+        self.interpolation = interpolation
+        self.table = table
+        self.reach = int(math.ceil(abs(depth) * sample_rate)) + 2
+        self.buffer = None
+        # Stream index of buffer[0] and of the next output sample
+        self.buffer_start = 0
+        self.position = 0
+
+    def _render(self, stop):
+        count = stop - self.position
+        lfo = self.table.lfo(self.frequency, self.sample_rate, count, start=self.position)
+        delays = self.depth * lfo * self.sample_rate
+        output = modulated_delay(self.buffer, delays, interpolation=self.interpolation,
+                                 fill='dry', offset=self.position - self.buffer_start)
+        self.position = stop
+        # Keep the samples the next outputs may still read
+        keep_from = max(self.position - self.reach, self.buffer_start)
+        self.buffer = self.buffer[keep_from - self.buffer_start:]
+        self.buffer_start = keep_from
+        return output
+
+    def process(self, block):
+        self.buffer = block if self.buffer is None else np.concatenate([self.buffer, block])
+        ready = self.buffer_start + len(self.buffer) - self.reach
+        if ready <= self.position:
+            return block[:0]
+        return self._render(ready)
+
+    def flush(self):
+        if self.buffer is None:
+            return None
+        end = self.buffer_start + len(self.buffer)
+        if end <= self.position:
+            return None
+        return self._render(end)
+
+
+class ResampleStage:
+    """
+    Pitch change or time stretch by a factor approximated as up/down,
+    with the polyphase resampler of the 'poly' backend.
+    """
+
+    def __init__(self, factor, quality='balanced'):
+        # The FFT backend needs the whole signal, 'best' streams with the 'balanced' filter
+        preset = QUALITY_PRESETS[quality] if quality != 'best' else QUALITY_PRESETS['balanced']
+        ratio = Fraction(factor).limit_denominator(preset['max_denominator'])
+        self.resampler = StreamingResampler(ratio.numerator, ratio.denominator,
+                                            preset['half_width'], preset['beta'])
+
+    def process(self, block):
+        return self.resampler.process(block).astype(np.float32)
+
+    def flush(self):
+        return self.resampler.flush().astype(np.float32)
+
+
+class StreamingAugmentor:
+    def __init__(self, sample_rate, scale=1.0, effects=('noise', 'gain', 'echo', 'flanger', 'vibrato'),
+                 noise_level=0.005, gain_range=(-10, 10), echo_delay=0.1, echo_decay=0.2,
+                 flanger_depth=1, flanger_rate=1.5, vibrato_depth=0.005, vibrato_frequency=3, echo_taps=4,
+                 reverb_rt60=0.5, reverb_wet=0.3, reverb_ir=None,
+                 interpolation='none', pitch_factor=1.5, stretch_factor=1.2, resample_quality='balanced',
+                 seed=None):
+        """
+            sample_rate: Sampling rate
+            scale: Normalization factor (1 / peak of the input)
+            effects: Effects to apply, in order: noise, gain, echo, multitap_echo, reverb,
+                flanger, vibrato, pitch and stretch (the last two change the length)
+            echo_taps: Number of echoes of multitap_echo (every echo_delay, times echo_decay)
+            reverb_rt60, reverb_wet, reverb_ir: Parameters of AudioAugmentor.add_reverb
+            interpolation: 'none' for integer delays, 'linear' for fractional delays
+            resample_quality: Preset of the polyphase resampler: 'fast' or 'balanced'
+            seed: seed or numpy Generator of the noise and gain (see rng.make_rng)
+        """
+
+        self.sample_rate = sample_rate
+        self.rng = make_rng(seed)
+        builders = {
+            'noise': lambda: NoiseStage(noise_level, self.rng),
+            'gain': lambda: GainStage(gain_range, self.rng),
+            'echo': lambda: EchoStage(sample_rate, echo_delay, echo_decay),
+            'multitap_echo': lambda: ConvolutionStage(multitap_ir(sample_rate, echo_delay, echo_decay, echo_taps)),
+            'reverb': lambda: ConvolutionStage(reverb_impulse(sample_rate, reverb_rt60, reverb_wet, reverb_ir,
+                                                              self.rng, channels=1),
+                                               cache=default_cache if isinstance(reverb_ir, str) else None),
+            'flanger': lambda: FlangerStage(sample_rate, flanger_depth, flanger_rate, interpolation),
+            'vibrato': lambda: VibratoStage(sample_rate, vibrato_depth, vibrato_frequency, interpolation),
+            'pitch': lambda: ResampleStage(pitch_factor, resample_quality),
+            'stretch': lambda: ResampleStage(stretch_factor, resample_quality),
+        }
+        unknown = set(effects) - set(builders)
+        if unknown:
+            raise ValueError(f"Unknown streaming effects: {sorted(unknown)}")
+        self.stages = [NormalizeStage(scale)] + [builders[name]() for name in effects]
+
+    def process(self, block):
+        """
+        Augments the next block of the stream (the output may be shorter while delays fill up).
+        """
+
+        block = np.asarray(block, dtype=np.float32)
+        for stage in self.stages:
+            block = stage.process(block)
+        return block
+
+    def flush(self):
+        """
+        Returns the samples still held by the stages at the end of the stream.
+        """
+
+        block = np.zeros(0, dtype=np.float32)
+        for stage in self.stages:
+            if len(block):
+                block = stage.process(block)
+            tail = stage.flush()
+            if tail is not None and len(tail):
+                block = np.concatenate([block, tail])
+        return block
+
+
+def to_mono(block):
+    """
+    Averaging of the channels of a (frames, channels) block.
+    """
+
+    return block.mean(axis=1) if block.ndim == 2 else block
+
+
+def peak_level(file_path, blocksize=65536):
+    """
+    First pass: peak absolute value of the (mono) signal.
+    """
+
+    peak = 0.0
+    for block in sf.blocks(file_path, blocksize=blocksize, dtype='float32'):
+        if len(block):
+            peak = max(peak, float(np.max(np.abs(to_mono(block)))))
+    return peak
+
+
+def augment_file_streaming(input_path, output_path, blocksize=65536, subtype=None, **kwargs):
+    """
+    Augments a file of any length block by block, returns the number of frames written.
+
+    subtype: sample format of the output (see save_audio)
+    kwargs are passed to StreamingAugmentor.
+    """
+
+    peak = peak_level(input_path, blocksize)
+    info = sf.info(input_path)
+    augmentor = StreamingAugmentor(info.samplerate, scale=1.0 / peak if peak > 0 else 1.0, **kwargs)
+
+    # Integer formats would wrap samples outside [-1, 1] around
+    clip = output_subtype(output_path, subtype).startswith('PCM')
+    written = 0
+    with sf.SoundFile(output_path, 'w', samplerate=info.samplerate, channels=1, subtype=subtype) as output:
+        for block in sf.blocks(input_path, blocksize=blocksize, dtype='float32'):
+            augmented = augmentor.process(to_mono(block))
+            output.write(np.clip(augmented, -1, 1) if clip else augmented)
+            written += len(augmented)
+        augmented = augmentor.flush()
+        output.write(np.clip(augmented, -1, 1) if clip else augmented)
+        written += len(augmented)
+    return written
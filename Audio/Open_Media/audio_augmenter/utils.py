@@ -1,21 +1,163 @@
+import os
+import struct
+import sys
 import numpy as np
-import torch
 import soundfile as sf
 
-def read_audio(file_path: str) -> np.ndarray:
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class MappedAudio:
+    """
+    Zero-copy view of the PCM data of a WAV file, shape (frames,) or
+    (frames, channels). The samples stay in their file type (raw) and are
+    converted to floats in [-1, 1) only for the part that is indexed;
+    np.asarray() converts the whole view.
+    """
+
+    def __init__(self, raw, scale=1.0, offset=0):
+        self.raw = raw
+        self.scale = scale
+        self.offset = offset
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def ndim(self):
+        return self.raw.ndim
+
+    def __len__(self):
+        return len(self.raw)
+
+    def convert(self, raw, dtype=np.float32):
+        samples = np.asarray(raw, dtype=dtype)
+        if self.offset:
+            samples -= self.offset
+        if self.scale != 1:
+            samples *= self.scale
+        return samples
+
+    def __getitem__(self, key):
+        return self.convert(self.raw[key])
+
+    def __array__(self, dtype=None, copy=None):
+        return self.convert(self.raw, np.float32 if dtype is None else dtype)
+
+    def window(self, start=0, stop=None):
+        """
+        View of the frames [start, stop), still unconverted.
+        """
+
+        return MappedAudio(self.raw[start:stop], self.scale, self.offset)
+
+
+def wav_layout(file_path):
+    """
+    (data offset, number of frames, channels, numpy dtype, scale, offset)
+    of the PCM data of a WAV file. Raises ValueError for other files and for
+    sample formats numpy cannot map (24-bit PCM).
+    """
+
+    with open(file_path, 'rb') as file:
+        riff, _, wave = struct.unpack('<4sI4s', file.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f"{file_path} is not a RIFF/WAVE file")
+        layout = None
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{file_path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = file.read(chunk_size)
+                tag, channels, _, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    tag = struct.unpack('<H', fmt[24:26])[0]
+                layout = (tag, channels, block_align, bits)
+            elif chunk_id == b'data':
+                if layout is None:
+                    raise ValueError(f"{file_path} has no fmt chunk before its data")
+                data_offset = file.tell()
+                break
+            else:
+                file.seek(chunk_size, 1)
+            # Chunks are padded to an even size
+            if chunk_size % 2:
+                file.seek(1, 1)
+
+    tag, channels, block_align, bits = layout
+    if tag == WAVE_FORMAT_PCM and bits in (8, 16, 32):
+        # 8-bit PCM is unsigned with its zero at 128
+        dtype = {8: '<u1', 16: '<i2', 32: '<i4'}[bits]
+        scale, offset = 1.0 / (1 << (bits - 1)), 128 if bits == 8 else 0
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        dtype, scale, offset = f'<f{bits // 8}', 1.0, 0
+    else:
+        raise ValueError(f"{file_path}: {bits}-bit samples of format {tag} cannot be memory-mapped")
+    # A truncated file has fewer frames than the data chunk announces
+    available = min(chunk_size, max(_file_size(file_path) - data_offset, 0))
+    return data_offset, available // block_align, channels, np.dtype(dtype), scale, offset
+
+
+def _file_size(file_path):
+    with open(file_path, 'rb') as file:
+        return file.seek(0, 2)
+
+
+def read_audio(file_path: str, start: int = 0, stop: int = None, mmap: bool = False, dtype: str = 'float64'):
     """
     Reading audio signal
+
+    start, stop: read only the frames [start, stop), the rest of the file is not decoded
+    mmap: return a MappedAudio view of the PCM data of a WAV file instead of
+        decoding it (converted to floats lazily, only where it is read)
+    dtype: sample type of the decoded signal when mmap is False
     """
 
-    waveform, sample_rate = sf.read(file_path)
+    if mmap:
+        data_offset, frames, channels, raw_dtype, scale, offset = wav_layout(file_path)
+        raw = np.memmap(file_path, dtype=raw_dtype, mode='r', offset=data_offset,
+                        shape=(frames, channels) if channels > 1 else (frames,))
+        sample_rate = sf.info(file_path).samplerate
+        return MappedAudio(raw, scale, offset).window(start, stop), sample_rate
+
+    waveform, sample_rate = sf.read(file_path, start=start, stop=stop, dtype=dtype)
     return waveform, sample_rate
 
 
-def save_audio(file_path: str, audio: np.ndarray, sr: int):
+def output_subtype(file_path, subtype=None):
+    """
+    Sample format a file is written with: subtype, or the default of the
+    format of its extension ('' when unknown).
+    """
+
+    if subtype is not None:
+        return subtype
+    try:
+        return sf.default_subtype(os.path.splitext(file_path)[1][1:]) or ''
+    except ValueError:
+        return ''
+
+
+def save_audio(file_path: str, audio: np.ndarray, sr: int, subtype: str = None):
     """
     Saving the augmented audio.
 
+    subtype: sample format of the file, e.g. 'PCM_16', 'PCM_24' or 'FLOAT'
+        (default: the default of the format). The format follows the
+        extension (.wav, .flac, .ogg, ...). Samples are clipped to [-1, 1]
+        for integer formats instead of wrapping around.
     """
-    waveform_np = audio.numpy() if isinstance(audio, torch.Tensor) else audio
+    # A tensor can only come from an already imported torch
+    torch = sys.modules.get('torch')
+    waveform_np = audio.numpy() if torch is not None and isinstance(audio, torch.Tensor) else audio
     waveform_np = waveform_np.astype(np.float32)
-    sf.write(file_path, waveform_np, sr) 
+    if output_subtype(file_path, subtype).startswith('PCM'):
+        np.clip(waveform_np, -1, 1, out=waveform_np)
+    sf.write(file_path, waveform_np, sr, subtype=subtype)
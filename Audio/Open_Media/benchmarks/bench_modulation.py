@@ -0,0 +1,50 @@
+"""
+Throughput of the flanger and vibrato engines (samples per second),
+per-sample loop against the vectorized implementation.
+
+    python -m benchmarks.bench_modulation --seconds 10 --sample-rate 48000
+"""
+
+import time
+import click
+import numpy as np
+from audio_augmenter.modulation import flanger, flanger_reference, vibrato, vibrato_reference
+
+
+def measure(function, waveform, sample_rate, repeat):
+    """
+    Best time of several runs, in seconds
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(waveform, sample_rate)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@click.command()
+@click.option('--seconds', type=float, default=10.0, help='Length of the test signal.')
+@click.option('--sample-rate', type=int, default=48000, help='Sampling rate of the test signal.')
+@click.option('--repeat', type=int, default=3, help='Number of runs of the vectorized engines.')
+@click.option('--skip-reference', is_flag=True, help='Do not run the per-sample loops.')
+def main(seconds, sample_rate, repeat, skip_reference):
+    num_samples = int(seconds * sample_rate)
+    waveform = np.random.default_rng(0).uniform(-1, 1, (num_samples, 1)).astype(np.float32)
+
+    engines = [
+        ('flanger', flanger, flanger_reference),
+        ('vibrato', vibrato, vibrato_reference),
+    ]
+    click.echo(f"{num_samples} samples at {sample_rate} Hz")
+    for name, vectorized, reference in engines:
+        rows = [('vectorized', measure(vectorized, waveform, sample_rate, repeat))]
+        if not skip_reference:
+            rows.append(('loop', measure(reference, waveform, sample_rate, 1)))
+        for path, elapsed in rows:
+            click.echo(f"{name:8s} {path:10s} {elapsed:10.4f} s {num_samples / elapsed:16,.0f} samples/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Memory of the augment_audio() chain: bytes allocated by numpy during the
+chain (tracemalloc peak) and the peak resident set size of a process that
+only loads one clip and augments it. Every measurement runs in its own
+process, so the RSS peaks do not mix.
+
+    python -m benchmarks.bench_pipeline_memory --seconds 60
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import click
+import numpy as np
+
+
+def measure(seconds, sample_rate, backend):
+    """
+    Allocation and RSS figures of one augment_audio() call, in bytes.
+    """
+
+    from contextlib import redirect_stdout
+    import io
+    from audio_augmenter.augment import AudioAugmentor
+
+    waveform = np.random.default_rng(0).uniform(-1, 1, int(seconds * sample_rate)).astype(np.float32)
+    processor = AudioAugmentor(waveform, sample_rate, backend=backend)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    tracemalloc.start()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        processor.augment_audio()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {
+        'backend': backend,
+        'seconds': seconds,
+        'signal_bytes': waveform.nbytes,
+        'buffer_bytes': processor._buffer.nbytes + processor._scratch.nbytes,
+        'peak_allocated': peak,
+        'peak_rss': rss_after,
+        'rss_growth': rss_after - rss_before,
+        'elapsed': elapsed,
+    }
+
+
+@click.command()
+@click.option('--seconds', type=float, multiple=True, default=(10.0, 60.0), help='Clip lengths (repeatable).')
+@click.option('--sample-rate', type=int, default=16000, help='Sampling rate.')
+@click.option('--backend', type=click.Choice(['torch', 'numpy']), multiple=True, default=('torch', 'numpy'))
+@click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+@click.option('--child', is_flag=True, hidden=True)
+def main(seconds, sample_rate, backend, as_json, child):
+    if child:
+        click.echo(json.dumps(measure(seconds[0], sample_rate, backend[0])))
+        return
+
+    results = []
+    for length in seconds:
+        for name in backend:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_pipeline_memory', '--child',
+                 '--seconds', str(length), '--sample-rate', str(sample_rate), '--backend', name],
+                check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output))
+
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+    click.echo(f"{'backend':>8s} {'seconds':>8s} {'signal MB':>10s} {'buffers MB':>11s} "
+               f"{'allocated MB':>13s} {'x signal':>9s} {'RSS MB':>8s} {'RSS +MB':>8s} {'time':>8s}")
+    for result in results:
+        mb = 1 << 20
+        click.echo(f"{result['backend']:>8s} {result['seconds']:8.0f} {result['signal_bytes'] / mb:10.1f} "
+                   f"{result['buffer_bytes'] / mb:11.1f} {result['peak_allocated'] / mb:13.1f} "
+                   f"{result['peak_allocated'] / result['signal_bytes']:9.2f} {result['peak_rss'] / mb:8.0f} "
+                   f"{result['rss_growth'] / mb:8.0f} {result['elapsed']:7.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Latency of the resampling backends against the signal length, for
+lengths with large prime factors as well as powers of two.
+
+    python -m benchmarks.bench_resample --factor 1.5 --max-seconds 60
+"""
+
+import time
+import click
+import numpy as np
+from audio_augmenter.resample import resample
+
+
+# (label, backend, quality)
+PATHS = [
+    ('fft', None, 'best'),
+    ('poly/balanced', None, 'balanced'),
+    ('poly/fast', None, 'fast'),
+    ('stream/balanced', 'stream', 'balanced'),
+]
+
+
+def lengths(sample_rate, max_seconds):
+    """
+    Powers of two next to prime lengths of about the same size
+    """
+
+    seconds = 1
+    while seconds <= max_seconds:
+        power = 1 << int(np.log2(seconds * sample_rate))
+        yield f"2^{power.bit_length() - 1}", power
+        yield 'prime', next_prime(seconds * sample_rate + 1)
+        seconds *= 4
+
+
+def next_prime(n):
+    while any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
+
+
+@click.command()
+@click.option('--sample-rate', type=int, default=16000, help='Sampling rate used to pick the lengths.')
+@click.option('--factor', type=float, default=1.5, help='Ratio of the output to the input length.')
+@click.option('--max-seconds', type=float, default=60.0, help='Longest signal.')
+@click.option('--fft-limit', type=int, default=2_000_000, help='Skip the FFT backend for prime lengths above this.')
+def main(sample_rate, factor, max_seconds, fft_limit):
+    rng = np.random.default_rng(0)
+    click.echo(f"{'length':>18s} " + ' '.join(f"{label:>16s}" for label, _, _ in PATHS))
+    for kind, num_samples in lengths(sample_rate, max_seconds):
+        signal = rng.standard_normal((num_samples, 1)).astype(np.float32)
+        target = int(num_samples * factor)
+        cells = []
+        for label, backend, quality in PATHS:
+            if label == 'fft' and kind == 'prime' and num_samples > fft_limit:
+                cells.append(f"{'skipped':>16s}")
+                continue
+            start = time.perf_counter()
+            resample(signal, target, quality=quality, backend=backend)
+            cells.append(f"{time.perf_counter() - start:15.4f}s")
+        click.echo(f"{kind:>8s} {num_samples:>9d} " + ' '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Throughput of the convolution reverb (samples per second): direct
+convolution (np.convolve, O(N * M)) against overlap-add FFT convolution
+with a cold and a cached IR spectrum, over IR lengths.
+
+    python -m benchmarks.bench_reverb --seconds 10 --sample-rate 48000 --ir-seconds 0.1 --ir-seconds 1
+"""
+
+import time
+import click
+import numpy as np
+from audio_augmenter.reverb import SpectrumCache, fft_convolve, room_ir
+
+
+def measure(function, repeat):
+    """
+    Best time of several runs, in seconds
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@click.command()
+@click.option('--seconds', type=float, default=10.0, help='Length of the test signal.')
+@click.option('--sample-rate', type=int, default=48000, help='Sampling rate of the test signal.')
+@click.option('--ir-seconds', type=float, multiple=True, default=(0.1, 0.5, 1.0), help='IR lengths (repeatable).')
+@click.option('--repeat', type=int, default=3, help='Number of runs of the FFT convolution.')
+@click.option('--skip-direct', is_flag=True, help='Do not run the direct convolution.')
+def main(seconds, sample_rate, ir_seconds, repeat, skip_direct):
+    rng = np.random.default_rng(0)
+    num_samples = int(seconds * sample_rate)
+    waveform = rng.uniform(-1, 1, (num_samples, 1)).astype(np.float32)
+
+    click.echo(f"{num_samples} samples at {sample_rate} Hz")
+    for length in ir_seconds:
+        ir = room_ir(sample_rate, length, rng)
+        cache = SpectrumCache()
+        rows = [('fft cold', measure(lambda: fft_convolve(waveform, ir, cache=None), repeat)),
+                ('fft cached', measure(lambda: fft_convolve(waveform, ir, cache=cache), repeat))]
+        if not skip_direct:
+            rows.append(('direct', measure(lambda: np.convolve(waveform[:, 0], ir)[:num_samples], 1)))
+        for path, elapsed in rows:
+            click.echo(f"IR {length:5.2f} s {path:10s} {elapsed:10.4f} s {num_samples / elapsed:16,.0f} samples/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup and per-clip cost of the augmenter outside notebooks: the import
+time of the CLI and augment modules in a fresh interpreter (with the heavy
+modules they pull in), and the latency of process_audio() in headless mode
+against the notebook preview.
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+
+import io
+import json
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+import click
+import numpy as np
+
+
+MODULES = ('audio_augmenter.cli', 'audio_augmenter.augment')
+HEAVY = ('IPython', 'matplotlib', 'torch', 'scipy.signal')
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def import_time(module, repeat):
+    """
+    Median import time of module in fresh interpreters, and the heavy modules it loads.
+    """
+
+    runs = [json.loads(subprocess.run([sys.executable, '-c', IMPORT_SCRIPT.format(module=module, heavy=HEAVY)],
+                                      check=True, capture_output=True, text=True).stdout)
+            for _ in range(repeat)]
+    return {'module': module, 'seconds': statistics.median(run['seconds'] for run in runs),
+            'loaded': runs[-1]['loaded']}
+
+
+def call_time(seconds, sample_rate, headless, repeat):
+    """
+    Latency of process_audio('audio') on a clip: the first call (which
+    imports the preview modules when previewing) and the median.
+    """
+
+    from audio_augmenter.augment import AudioAugmentor
+
+    waveform = np.random.default_rng(0).uniform(-1, 1, int(seconds * sample_rate))
+    times = []
+    for _ in range(repeat):
+        processor = AudioAugmentor(waveform, sample_rate, backend='numpy', headless=headless)
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            processor.process_audio('audio')
+        times.append(time.perf_counter() - start)
+    return {'headless': headless, 'first': times[0], 'seconds': statistics.median(times)}
+
+
+@click.command()
+@click.option('--repeat', type=int, default=5, help='Runs per measurement (the median is reported).')
+@click.option('--seconds', type=float, default=10.0, help='Clip length of the per-call measurement.')
+@click.option('--sample-rate', type=int, default=16000, help='Sampling rate.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+def main(repeat, seconds, sample_rate, as_json):
+    imports = [import_time(module, repeat) for module in MODULES]
+    calls = [call_time(seconds, sample_rate, headless, repeat) for headless in (True, False)]
+    if as_json:
+        click.echo(json.dumps({'imports': imports, 'calls': calls}, indent=2))
+        return
+    for result in imports:
+        click.echo(f"import {result['module']:<26s} {result['seconds']:7.3f}s  loads: {', '.join(result['loaded']) or '-'}")
+    for result in calls:
+        mode = 'headless' if result['headless'] else 'preview'
+        click.echo(f"process_audio {seconds:.0f} s clip, {mode:<8s} first {result['first']:7.3f}s"
+                   f"  median {result['seconds']:7.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Throughput suite of the augmenter: every AudioAugmentor effect,
+augment_audio() (with its per-effect breakdown), augment_spectrogram() and
+the CLI end to end, over clip lengths, sample rates and channel counts.
+Every (length, sample rate, channels) configuration runs in its own
+process, so its peak RSS is its own.
+
+    python -m benchmarks.bench_suite run --output results.json
+    python -m benchmarks.bench_suite run --full --output results.json    # up to 1 h clips
+    python -m benchmarks.bench_suite compare before.json after.json --threshold 0.1
+
+The JSON results hold, per configuration and target: the best time of
+--repeat runs, the input samples per second, the numpy allocation peak
+(tracemalloc) and, for augment_audio, the time of every effect.
+"""
+
+import functools
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+import click
+import numpy as np
+
+
+QUICK_LENGTHS = (1, 10, 60)
+FULL_LENGTHS = (1, 10, 60, 600, 3600)
+
+# AudioAugmentor methods run on their own, in the order of augment_audio()
+EFFECTS = ('add_white_noise', 'random_gain', 'add_echo', 'apply_flanger', 'change_pitch', 'time_stretch',
+           'vibrato')
+# Effects that augment_audio() does not apply, benchmarked on their own
+EXTRA_EFFECTS = ('add_multitap_echo', 'add_reverb')
+
+
+def timed_run(function, repeat):
+    """
+    Best wall time of repeat calls of function() (a fresh setup each time,
+    see measure) and the allocation peak of the last one.
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        call = function()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            call()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        best = min(best, elapsed)
+    return best, peak
+
+
+def augment_audio_breakdown(processor):
+    """
+    Runs augment_audio() with every effect timed, returns {effect: seconds}.
+    """
+
+    breakdown = {}
+
+    def timed(name, method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            breakdown[name] = breakdown.get(name, 0.0) + time.perf_counter() - start
+            return result
+        return wrapper
+
+    for name in EFFECTS:
+        # Instance attributes shadow the methods augment_audio() calls
+        setattr(processor, name, timed(name, getattr(processor, name)))
+    with redirect_stdout(io.StringIO()):
+        processor.augment_audio()
+    return breakdown
+
+
+def run_cli(path, repeat, resample_quality):
+    """
+    Best wall time of the CLI on a file, interpreter startup included.
+    """
+
+    best = float('inf')
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'out.wav')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-m', 'audio_augmenter.cli', path, output,
+                            '--resample-quality', resample_quality],
+                           check=True, capture_output=True)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(seconds, sample_rate, channels, repeat, resample_quality, cli):
+    """
+    Results of every target for one configuration.
+    """
+
+    from audio_augmenter.augment import AudioAugmentor
+
+    num_samples = int(seconds * sample_rate)
+    shape = (num_samples, channels) if channels > 1 else (num_samples,)
+    waveform = np.random.default_rng(0).uniform(-1, 1, shape).astype(np.float32)
+
+    def augmentor():
+        return AudioAugmentor(waveform, sample_rate, resample_quality=resample_quality, backend='numpy',
+                              headless=True)
+
+    targets = {name: (lambda name=name: getattr(augmentor(), name)) for name in EFFECTS + EXTRA_EFFECTS}
+    targets['augment_audio'] = lambda: augmentor().augment_audio
+    targets['augment_spectrogram'] = lambda: functools.partial(augmentor().augment_spectrogram,
+                                                               ['TimeMasking', 'FrequencyMasking'])
+
+    results = []
+    for target, setup in targets.items():
+        elapsed, peak = timed_run(setup, repeat)
+        results.append({'target': target, 'seconds': elapsed, 'samples_per_s': num_samples / elapsed,
+                        'peak_allocated': peak})
+        if target == 'augment_audio':
+            results[-1]['breakdown'] = augment_audio_breakdown(augmentor())
+
+    if cli:
+        import soundfile as sf
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'input.wav')
+            sf.write(path, waveform, sample_rate, subtype='FLOAT')
+            elapsed = run_cli(path, repeat, resample_quality)
+        results.append({'target': 'cli', 'seconds': elapsed, 'samples_per_s': num_samples / elapsed,
+                        'peak_allocated': None})
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    for result in results:
+        result.update(length_s=seconds, sample_rate=sample_rate, channels=channels, peak_rss=peak_rss)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def key(result):
+    return (result['target'], result['length_s'], result['sample_rate'], result['channels'])
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option('--lengths', type=float, multiple=True, help='Clip lengths in seconds (repeatable).')
+@click.option('--full', is_flag=True, help=f"Sweep {', '.join(map(str, FULL_LENGTHS))} s instead of "
+                                           f"{', '.join(map(str, QUICK_LENGTHS))} s.")
+@click.option('--sample-rates', type=int, multiple=True, default=(16000, 44100, 48000), help='Sampling rates (repeatable).')
+@click.option('--channels', type=int, multiple=True, default=(1, 2), help='Channel counts (repeatable).')
+@click.option('--repeat', type=int, default=3, help='Runs per target, the best is kept.')
+@click.option('--resample-quality', type=click.Choice(['fast', 'balanced', 'best']), default='best')
+@click.option('--cli-max-seconds', type=float, default=60.0, help='Run the CLI only for clips up to this length.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write the JSON results to this file.')
+@click.option('--child', type=str, hidden=True)
+def run(lengths, full, sample_rates, channels, repeat, resample_quality, cli_max_seconds, output, child):
+    """
+    Runs the sweep and prints (or writes) the results.
+    """
+
+    if child:
+        seconds, sample_rate, num_channels = json.loads(child)
+        click.echo(json.dumps(measure(seconds, sample_rate, num_channels, repeat, resample_quality,
+                                      cli=seconds <= cli_max_seconds)))
+        return
+
+    lengths = lengths or (FULL_LENGTHS if full else QUICK_LENGTHS)
+    results = []
+    for seconds in lengths:
+        for sample_rate in sample_rates:
+            for num_channels in channels:
+                config = json.dumps([seconds, sample_rate, num_channels])
+                stdout = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_suite', 'run', '--child', config,
+                     '--repeat', str(repeat), '--resample-quality', resample_quality,
+                     '--cli-max-seconds', str(cli_max_seconds)],
+                    check=True, capture_output=True, text=True).stdout
+                for result in json.loads(stdout):
+                    results.append(result)
+                    click.echo(f"{result['target']:>20s} {seconds:7.0f} s {sample_rate:6d} Hz {num_channels} ch "
+                               f"{result['seconds']:9.4f} s {result['samples_per_s'] / 1e6:9.2f} Msamples/s", err=True)
+
+    report = {'environment': environment(), 'resample_quality': resample_quality, 'results': results}
+    if output:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=1)
+    else:
+        click.echo(json.dumps(report, indent=1))
+
+
+@main.command()
+@click.argument('before', type=click.Path(exists=True, dir_okay=False))
+@click.argument('after', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', type=float, default=0.1, help='Relative slowdown reported as a regression.')
+def compare(before, after, threshold):
+    """
+    Compares two result files; exits with status 1 when a target got slower than the threshold.
+    """
+
+    with open(before) as file:
+        old = {key(result): result for result in json.load(file)['results']}
+    with open(after) as file:
+        new = {key(result): result for result in json.load(file)['results']}
+
+    regressions = 0
+    click.echo(f"{'target':>20s} {'length':>8s} {'rate':>6s} {'ch':>2s} {'before':>10s} {'after':>10s} {'change':>8s}")
+    for name in sorted(old.keys() & new.keys(), key=lambda k: (k[1], k[2], k[3], k[0])):
+        change = new[name]['seconds'] / old[name]['seconds'] - 1
+        flag = ''
+        if change > threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        target, seconds, sample_rate, channels = name
+        click.echo(f"{target:>20s} {seconds:7.0f}s {sample_rate:6d} {channels:2d} {old[name]['seconds']:9.4f}s "
+                   f"{new[name]['seconds']:9.4f}s {change:+8.1%}{flag}")
+    click.echo(f"{regressions} regression(s) above {threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,11 +15,13 @@ setup(
         'scipy',
         'torch',
         'soundfile',
-        'matplotlib',
-        'IPython',
         'click',
 
     ],
+    extras_require={
+        'yaml': ['pyyaml'],
+        'notebook': ['matplotlib', 'IPython'],
+    },
     entry_points={
         'console_scripts': [
             'audio-augmenter=audio_augmenter.cli:main',
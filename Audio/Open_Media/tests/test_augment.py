@@ -1,7 +1,7 @@
 import unittest
 import numpy as np
 import torch
-from .augment import AudioAugmentor
+from audio_augmenter.augment import AudioAugmentor
 
 class TestAudioProcessor(unittest.TestCase):
     
@@ -107,5 +107,121 @@ class TestAudioProcessor(unittest.TestCase):
         self.assertEqual(processor.waveform.shape, (self.sample_rate * 2, 1))  # Must be converted to mono
 
 
+class TestZeroCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_rate = 16000
+        self.waveform = np.random.rand(self.sample_rate, 1)
+
+    def test_backends(self):
+        """
+        The waveform is a tensor or an array, a view of the same buffer either way
+        """
+
+        for backend, kind in (('torch', torch.Tensor), ('numpy', np.ndarray)):
+            processor = AudioAugmentor(self.waveform, self.sample_rate, backend=backend)
+            processor.augment_audio()
+            self.assertIsInstance(processor.waveform, kind)
+            self.assertEqual(processor.waveform.dtype, torch.float32 if backend == 'torch' else np.float32)
+            self.assertTrue(np.shares_memory(np.asarray(processor.waveform), processor._buffer))
+        with self.assertRaises(ValueError):
+            AudioAugmentor(self.waveform, self.sample_rate, backend='jax')
+
+    def test_chain_does_not_reallocate(self):
+        """
+        The buffers are sized for the whole chain, pitch and stretch included
+        """
+
+        processor = AudioAugmentor(self.waveform, self.sample_rate)
+        buffers = {id(processor._buffer), id(processor._scratch)}
+        processor.augment_audio()
+        self.assertEqual({id(processor._buffer), id(processor._scratch)}, buffers)
+        self.assertEqual(len(processor.waveform), int(int(self.sample_rate * 1.5) * 1.2))
+
+    def test_same_result_as_copies(self):
+        """
+        In-place effects give the same result as computing on copies
+        """
+
+        processor = AudioAugmentor(self.waveform, self.sample_rate, backend='numpy', seed=0)
+        expected = processor.waveform.copy()
+        processor.add_white_noise()
+        processor.add_echo()
+        noise = np.random.default_rng(np.random.SeedSequence(0)).standard_normal(expected.shape, dtype=np.float32)
+        expected = expected + noise * processor.noise_level
+        delay = int(0.1 * self.sample_rate)
+        expected[delay:] += expected[:-delay] * 0.2
+        np.testing.assert_allclose(processor.waveform, expected, rtol=1e-5, atol=1e-6)
+
+    def test_assignment_copies_into_buffer(self):
+        """
+        Assigning a waveform keeps the backend and invalidates the spectrogram
+        """
+
+        processor = AudioAugmentor(self.waveform, self.sample_rate)
+        spectrogram = processor.log_spectrogram().copy()
+        processor.waveform = np.zeros(3 * self.sample_rate, dtype=np.float32)
+        self.assertIsInstance(processor.waveform, torch.Tensor)
+        self.assertEqual(processor.waveform.shape, (3 * self.sample_rate, 1))
+        self.assertNotEqual(processor.log_spectrogram().shape, spectrogram.shape)
+
+
+class TestMultichannel(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_rate = 8000
+        waveform = np.random.uniform(-0.5, 0.5, (self.sample_rate, 4))
+        # The same peak in every channel, so that normalizing them together or alone agrees
+        waveform[0] = 1
+        self.waveform = waveform
+
+    def augmentor(self, waveform, **kwargs):
+        return AudioAugmentor(waveform, self.sample_rate, backend='numpy', headless=True, **kwargs)
+
+    def test_shapes(self):
+        """
+        Channels are kept with multichannel, averaged to mono otherwise (whatever their number)
+        """
+
+        self.assertEqual(self.augmentor(self.waveform).waveform.shape, (self.sample_rate, 1))
+        processor = self.augmentor(self.waveform, multichannel=True)
+        self.assertEqual(processor.num_channels, 4)
+        self.assertEqual(processor.augment_audio().shape[1], 4)
+        self.assertEqual(processor.augment_spectrogram(['TimeMasking']).shape[0], 4)
+        with self.assertRaises(ValueError):
+            self.augmentor(self.waveform, channel_randomness='shared')
+
+    def test_channels_match_mono(self):
+        """
+        Every channel is augmented as it would be alone
+        """
+
+        processor = self.augmentor(self.waveform, multichannel=True)
+        processor.add_echo()
+        processor.apply_flanger()
+        processor.change_pitch()
+        for channel in range(4):
+            mono = self.augmentor(self.waveform[:, channel])
+            mono.add_echo()
+            mono.apply_flanger()
+            mono.change_pitch()
+            np.testing.assert_allclose(processor.waveform[:, channel], mono.waveform[:, 0], atol=1e-5)
+
+    def test_channel_randomness(self):
+        """
+        Correlated channels get the same noise, gain and masks, independent ones their own
+        """
+
+        identical = np.repeat(self.waveform[:, :1], 3, axis=1)
+        for randomness, same in (('correlated', True), ('independent', False)):
+            processor = self.augmentor(identical, multichannel=True, channel_randomness=randomness)
+            processor.add_white_noise()
+            processor.random_gain()
+            waveform = processor.waveform
+            self.assertEqual(np.array_equal(waveform[:, 0], waveform[:, 1]), same, randomness)
+            _, mask = processor.augment_spectrogram(['TimeMasking', 'FrequencyMasking'], return_mask=True)
+            self.assertEqual(np.array_equal(mask[0], mask[2]), same, randomness)
+
+
 if __name__ == '__main__':
     unittest.main()
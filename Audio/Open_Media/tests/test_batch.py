@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+import torch
+from audio_augmenter.batch import BatchAugmentor
+
+
+class TestBatchAugmentor(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A padded batch of 4 clips of different lengths
+        """
+
+        self.sample_rate = 8000
+        self.lengths = np.array([8000, 6000, 4000, 2000])
+        self.waveforms = np.random.rand(4, 8000) * 2 - 1
+        self.waveforms[np.arange(8000) >= self.lengths[:, None]] = 0
+        self.processor = BatchAugmentor(self.waveforms, self.sample_rate, self.lengths)
+
+    def test_initialization(self):
+        """
+        Every clip is normalized and the padding stays zero
+        """
+
+        waveforms = self.processor.waveforms
+        self.assertIsInstance(waveforms, torch.Tensor)
+        self.assertEqual(tuple(waveforms.shape), (4, 8000))
+        np.testing.assert_allclose(waveforms.abs().max(dim=1).values.numpy(), 1, rtol=1e-6)
+        self.assertTrue(torch.all(waveforms[3, 2000:] == 0))
+
+    def test_accepts_tensor(self):
+        """
+        A tensor batch gives the same clips as an array
+        """
+
+        processor = BatchAugmentor(torch.from_numpy(self.waveforms), self.sample_rate, torch.from_numpy(self.lengths))
+        self.assertTrue(torch.equal(processor.waveforms, self.processor.waveforms))
+
+    def test_random_gain_per_clip(self):
+        """
+        Every clip gets its own gain
+        """
+
+        self.processor.random_gain()
+        peaks = self.processor.waveforms.abs().max(dim=1).values.numpy()
+        self.assertEqual(len(np.unique(np.round(peaks, 6))), 4)
+
+    def test_add_echo(self):
+        """
+        The echo only starts after the delay
+        """
+
+        before = self.processor.waveforms.clone()
+        self.processor.add_echo(delay=0.1, decay=0.5)
+        after = self.processor.waveforms
+        self.assertTrue(torch.equal(after[:, :800], before[:, :800]))
+        self.assertFalse(torch.equal(after[:, 800:], before[:, 800:]))
+
+    def test_resampling_updates_lengths(self):
+        """
+        Pitch and stretch factors change the length of every clip
+        """
+
+        self.processor.change_pitch(1.5)
+        np.testing.assert_array_equal(self.processor.lengths, (self.lengths * 1.5).astype(int))
+        self.processor.time_stretch((0.8, 1.2))
+        lengths = self.processor.lengths
+        self.assertEqual(self.processor.waveforms.shape[1], lengths.max())
+        self.assertTrue(torch.all(self.processor.waveforms[0, lengths[0]:] == 0))
+
+    def test_augment_audio(self):
+        """
+        The whole effect chain runs on the batch
+        """
+
+        waveforms, lengths = self.processor.augment_audio()
+        self.assertEqual(waveforms.shape[0], 4)
+        self.assertEqual(waveforms.shape[1], lengths.max())
+        self.assertFalse(torch.isnan(waveforms).any())
+
+    def test_augment_spectrogram(self):
+        """
+        Spectrograms are masked independently for every clip
+        """
+
+        spec = self.processor.augment_spectrogram(['TimeMasking', 'FrequencyMasking'])
+        self.assertEqual(spec.ndim, 3)
+        self.assertEqual(spec.shape[0], 4)
+        masked = (spec == 0)
+        self.assertTrue(masked.any(axis=(1, 2)).all())
+        self.assertFalse(np.array_equal(masked[0], masked[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
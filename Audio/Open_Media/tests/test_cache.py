@@ -0,0 +1,205 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import soundfile as sf
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.cache import DigestCache, FeatureCache, read_features
+from audio_augmenter.dataset import AugmentedAudioDataset, AugmentedSpectrogramDataset
+
+
+class TestFeatureCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sample_rate = 8000
+        self.paths = []
+        for k in range(3):
+            path = os.path.join(self.tmp.name, f"{k}.wav")
+            sf.write(path, np.random.default_rng(k).uniform(-0.5, 0.5, (8000, 2)), self.sample_rate,
+                     subtype='FLOAT')
+            self.paths.append(path)
+        self.directory = os.path.join(self.tmp.name, 'cache')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hits_after_first_read(self):
+        """
+        A file is decoded once, then read from memory as a read-only normalized array
+        """
+
+        cache = FeatureCache()
+        waveform, sample_rate = cache.read(self.paths[0])
+        again, _ = cache.read(self.paths[0])
+        self.assertIs(again, waveform)
+        self.assertEqual((cache.misses, cache.hits), (1, 1))
+        self.assertEqual(sample_rate, self.sample_rate)
+        self.assertEqual(waveform.shape, (8000, 1))
+        self.assertAlmostEqual(float(np.max(np.abs(waveform))), 1.0, places=5)
+        self.assertFalse(waveform.flags.writeable)
+
+    def test_disk_entries_shared_across_instances(self):
+        """
+        A new cache on the same directory (another worker or run) reads the stored entries
+        """
+
+        expected, _ = FeatureCache(self.directory).log_spectrogram(self.paths[0])
+        cache = FeatureCache(self.directory)
+        spectrogram, _ = cache.log_spectrogram(self.paths[0])
+        np.testing.assert_array_equal(spectrogram, expected)
+        self.assertEqual((cache.misses, cache.disk_hits), (0, 1))
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith('.partial')])
+
+    def test_keyed_by_content(self):
+        """
+        A renamed copy hits the cache, a modified file misses it
+        """
+
+        cache = FeatureCache(digests=DigestCache())
+        cache.read(self.paths[0])
+        copy = os.path.join(self.tmp.name, 'copy.wav')
+        shutil.copy(self.paths[0], copy)
+        cache.read(copy)
+        self.assertEqual((cache.misses, cache.hits), (1, 1))
+
+        sf.write(copy, np.zeros((100, 2)), self.sample_rate)
+        waveform, _ = cache.read(copy)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(len(waveform), 100)
+
+    def test_parameters_in_key(self):
+        """
+        Mono and multichannel entries of a file are distinct
+        """
+
+        mono = FeatureCache(self.directory)
+        stereo = FeatureCache(self.directory, multichannel=True)
+        self.assertEqual(mono.read(self.paths[0])[0].shape, (8000, 1))
+        self.assertEqual(stereo.read(self.paths[0])[0].shape, (8000, 2))
+        self.assertEqual(stereo.misses, 1)
+
+    def test_memory_and_disk_bounds(self):
+        """
+        The least recently used entries are evicted above max_memory and max_disk
+        """
+
+        entry_size = 8000 * 4
+        cache = FeatureCache(self.directory, max_memory=2 * entry_size, max_disk=2 * entry_size + 4000)
+        for path in self.paths:
+            cache.read(path)
+        self.assertEqual(len(cache), 2)
+        stored = [name for name in os.listdir(self.directory) if name.endswith('.npz')]
+        self.assertEqual(len(stored), 2)
+        # The first file was evicted everywhere
+        cache.read(self.paths[0])
+        self.assertEqual(cache.misses, 4)
+
+    def test_disk_listed_once(self):
+        """
+        The directory is listed at startup, not on every stored entry
+        """
+
+        with mock.patch('audio_augmenter.cache.os.scandir', side_effect=os.scandir) as scandir:
+            cache = FeatureCache(self.directory, max_disk=10 << 20)
+            for path in self.paths:
+                cache.read(path)
+        self.assertEqual(scandir.call_count, 1)
+        sizes = sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+        self.assertEqual(cache._disk_total, sizes)
+
+    def test_stale_partial_files_removed(self):
+        """
+        A .partial file left by a killed writer is deleted at startup, a fresh one is kept
+        """
+
+        os.makedirs(self.directory)
+        stale, fresh = (os.path.join(self.directory, name) for name in ('stale.partial', 'fresh.partial'))
+        for path in (stale, fresh):
+            with open(path, 'wb') as file:
+                file.write(b'0' * 100)
+        os.utime(stale, (0, 0))
+        FeatureCache(self.directory, max_disk=1 << 20)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['fresh.partial'])
+
+    def test_one_count_per_call(self):
+        """
+        A log-spectrogram is one miss, then one hit, whatever waveform reads it needs
+        """
+
+        cache = FeatureCache()
+        cache.log_spectrogram(self.paths[0])
+        self.assertEqual((cache.misses, cache.hits), (1, 0))
+        cache.log_spectrogram(self.paths[0])
+        cache.read(self.paths[0])
+        self.assertEqual((cache.misses, cache.hits), (1, 2))
+
+    def test_spectrogram_matches_augmentor(self):
+        """
+        The cached log-spectrogram is the one AudioAugmentor computes, and it uses it as is
+        """
+
+        spectrogram, sample_rate = FeatureCache().log_spectrogram(self.paths[1])
+        audio, _ = sf.read(self.paths[1])
+        augmentor = AudioAugmentor(audio, sample_rate, backend='numpy', headless=True)
+        np.testing.assert_allclose(spectrogram, augmentor.log_spectrogram(), atol=1e-4)
+
+        cached = AudioAugmentor(audio, sample_rate, backend='numpy', headless=True, log_spectrogram=spectrogram)
+        self.assertIs(cached.log_spectrogram(), spectrogram)
+        cached.random_gain()
+        self.assertIsNot(cached.log_spectrogram(), spectrogram)
+
+    def test_read_features(self):
+        """
+        A cache directory gives the same waveform as a FeatureCache of it
+        """
+
+        audio, sample_rate, spectrogram = read_features(self.paths[2], self.directory, spectrogram=True)
+        expected, _ = FeatureCache(self.directory).read(self.paths[2])
+        np.testing.assert_array_equal(audio, expected)
+        self.assertEqual(spectrogram.ndim, 3)
+        self.assertIsNone(read_features(self.paths[2])[2])
+
+
+class TestCachedDatasets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for k in range(4):
+            sf.write(os.path.join(self.tmp.name, f"{k}.wav"),
+                     np.random.default_rng(k).uniform(-0.5, 0.5, 4000 + 1000 * k), 8000)
+        self.cache = FeatureCache()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_audio_dataset_reads_through_cache(self):
+        """
+        Every epoch after the first one skips decoding
+        """
+
+        dataset = AugmentedAudioDataset(self.tmp.name, cache=self.cache, seed=0)
+        for epoch in range(3):
+            dataset.set_epoch(epoch)
+            for index in range(len(dataset)):
+                dataset[index]
+        self.assertEqual(self.cache.misses, len(dataset))
+
+    def test_spectrogram_dataset(self):
+        """
+        Masked log-spectrograms are reproducible per (seed, epoch, index) and differ across epochs
+        """
+
+        dataset = AugmentedSpectrogramDataset(self.tmp.name, self.cache, seed=0)
+        first = dataset[1]
+        self.assertEqual(first.shape, self.cache.log_spectrogram(dataset.files[1])[0].shape)
+        np.testing.assert_array_equal(first.numpy(), dataset[1].numpy())
+        dataset.set_epoch(1)
+        self.assertFalse(np.array_equal(first.numpy(), dataset[1].numpy()))
+        self.assertTrue(np.any(first.numpy() == 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
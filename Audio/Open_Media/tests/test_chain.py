@@ -0,0 +1,95 @@
+import pickle
+import unittest
+from unittest import mock
+import numpy as np
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.chain import Effect, EffectChain
+
+
+class TestEffectChain(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_rate = 8000
+        self.waveform = np.random.rand(self.sample_rate) - 0.5
+
+    def test_round_trip(self):
+        """
+        A chain survives to_dict/from_dict, JSON and pickling unchanged
+        """
+
+        chain = EffectChain([Effect('gain', probability=0.5, gain=(-6, 6)),
+                             Effect('pitch', pitch_factor=(0.9, 1.1))])
+        for rebuilt in (EffectChain.from_dict(chain.to_dict()),
+                        EffectChain.from_json(chain.to_json()),
+                        pickle.loads(pickle.dumps(chain))):
+            self.assertEqual(rebuilt.to_dict(), chain.to_dict())
+        self.assertEqual(chain.to_dict()['effects'][0],
+                         {'name': 'gain', 'probability': 0.5, 'gain': [-6, 6]})
+
+    def test_validation(self):
+        """
+        Unknown effects, parameters and probabilities outside [0, 1] are rejected
+        """
+
+        with self.assertRaises(ValueError):
+            Effect('reverse')
+        with self.assertRaises(ValueError):
+            Effect('gain', level=3)
+        with self.assertRaises(ValueError):
+            Effect('noise', probability=1.5)
+
+    def test_probability_and_ranges(self):
+        """
+        Effects fire with their probability, parameters stay in their range
+        """
+
+        chain = EffectChain([Effect('pitch', probability=0.0), Effect('stretch', stretch_factor=(1.0, 2.0))])
+        for _ in range(20):
+            (name, params), = chain.sample()
+            self.assertEqual(name, 'stretch')
+            self.assertTrue(1.0 <= params['stretch_factor'] <= 2.0)
+
+    def test_linear_effects_are_fused(self):
+        """
+        gain, noise, gain is one scale_and_add_noise pass with the combined gain and noise level
+        """
+
+        chain = EffectChain([Effect('gain', gain=20), Effect('noise', noise_level=0.01),
+                             Effect('gain', gain=-20), Effect('echo')])
+        processor = AudioAugmentor(self.waveform, self.sample_rate)
+        with mock.patch.object(AudioAugmentor, 'scale_and_add_noise') as fused, \
+                mock.patch.object(AudioAugmentor, 'add_echo') as echo:
+            chain.apply(processor)
+        fused.assert_called_once()
+        gain, noise_level = fused.call_args[0]
+        self.assertAlmostEqual(gain, 1.0)
+        self.assertAlmostEqual(noise_level, 0.001)
+        echo.assert_called_once_with(delay=0.1, decay=0.2)
+
+    def test_fused_gain_matches_separate_effects(self):
+        """
+        Without noise the fused pass gives the same waveform as the separate gains
+        """
+
+        chain = EffectChain([Effect('gain', gain=6), Effect('noise', noise_level=0), Effect('gain', gain=-3)])
+        fused = AudioAugmentor(self.waveform, self.sample_rate, backend='numpy')
+        separate = AudioAugmentor(self.waveform, self.sample_rate, backend='numpy')
+        chain.apply(fused)
+        separate.random_gain((6, 6))
+        separate.random_gain((-3, -3))
+        np.testing.assert_allclose(fused.waveform, separate.waveform, rtol=1e-6)
+
+    def test_default_chain(self):
+        """
+        The default chain has the effects of augment_audio and the same output length
+        """
+
+        processor = AudioAugmentor(self.waveform, self.sample_rate)
+        applied = EffectChain.default().apply(processor)
+        self.assertEqual([name for name, _ in applied],
+                         ['noise', 'gain', 'echo', 'flanger', 'pitch', 'stretch', 'vibrato'])
+        self.assertEqual(len(processor.waveform), int(int(self.sample_rate * 1.5) * 1.2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from click.testing import CliRunner
+from audio_augmenter.cli import main
+
+
+class TestDirectoryMode(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A directory with three short clips, one of them in a subdirectory
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, 'input')
+        self.output_dir = os.path.join(self.tmp.name, 'output')
+        os.makedirs(os.path.join(self.input_dir, 'sub'))
+        self.sample_rate = 8000
+        for name in ('a.wav', 'b.wav', os.path.join('sub', 'c.wav')):
+            sf.write(os.path.join(self.input_dir, name), np.random.rand(self.sample_rate) - 0.5, self.sample_rate)
+        self.runner = CliRunner()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def outputs(self):
+        return sorted(os.path.relpath(os.path.join(directory, name), self.output_dir)
+                      for directory, _, names in os.walk(self.output_dir) for name in names)
+
+    def test_directory_with_workers_and_variants(self):
+        """
+        Every input gets N variants, mirroring the input tree
+        """
+
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--workers', '2', '--variants', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.outputs(), ['a_aug0.wav', 'a_aug1.wav', 'b_aug0.wav', 'b_aug1.wav',
+                                          os.path.join('sub', 'c_aug0.wav'), os.path.join('sub', 'c_aug1.wav')])
+        self.assertIn('3 processed', result.output)
+
+    def test_glob_and_resume(self):
+        """
+        A glob selects inputs and --resume skips existing outputs
+        """
+
+        pattern = os.path.join(self.input_dir, '*.wav')
+        result = self.runner.invoke(main, [pattern, self.output_dir])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.outputs(), ['a.wav', 'b.wav'])
+
+        os.remove(os.path.join(self.output_dir, 'b.wav'))
+        result = self.runner.invoke(main, [pattern, self.output_dir, '--resume'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('1 processed, 1 skipped', result.output)
+        self.assertEqual(self.outputs(), ['a.wav', 'b.wav'])
+
+    def test_missing_input(self):
+        """
+        A path that is neither a file, a directory nor a pattern is rejected
+        """
+
+        result = self.runner.invoke(main, [os.path.join(self.tmp.name, 'missing.wav'), self.output_dir])
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_stream_directory(self):
+        """
+        --stream is rejected for a directory instead of being ignored
+        """
+
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--stream'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('--stream', result.output)
+        self.assertEqual(self.outputs(), [])
+
+    def test_output_format(self):
+        """
+        --format and --subtype select the container and sample format of directory outputs
+        """
+
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--format', 'flac', '--subtype', 'PCM_24'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.outputs(), ['a.flac', 'b.flac', os.path.join('sub', 'c.flac')])
+        self.assertEqual(sf.info(os.path.join(self.output_dir, 'a.flac')).subtype, 'PCM_24')
+
+    def test_shards(self):
+        """
+        --shards packs all variants into tar shards with an index
+        """
+
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--shards', '--shard-size', '4',
+                                           '--variants', '2', '--workers', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.outputs(), ['index.jsonl', 'shard-000000.tar', 'shard-000001.tar'])
+
+    def test_chain(self):
+        """
+        A JSON chain replaces the default effects, in directory and single-file mode
+        """
+
+        chain = os.path.join(self.tmp.name, 'chain.json')
+        with open(chain, 'w') as file:
+            file.write('{"effects": [{"name": "gain", "gain": [-3, 3]}, {"name": "stretch", "stretch_factor": 2}]}')
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--chain', chain, '--workers', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(sf.read(os.path.join(self.output_dir, 'a.wav'))[0]), 2 * self.sample_rate)
+
+        output = os.path.join(self.tmp.name, 'single.wav')
+        result = self.runner.invoke(main, [os.path.join(self.input_dir, 'a.wav'), output, '--chain', chain])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('stretch', result.output)
+        self.assertEqual(len(sf.read(output)[0]), 2 * self.sample_rate)
+
+    def test_profile(self):
+        """
+        --profile writes the per-effect metrics of all workers
+        """
+
+        path = os.path.join(self.tmp.name, 'profile.json')
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--workers', '2', '--profile', path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('add_echo', result.output)
+        with open(path) as file:
+            summary = json.load(file)['summary']
+        self.assertEqual(summary['read_audio']['calls'], len(os.listdir(self.input_dir)))
+
+    def test_multichannel(self):
+        """
+        --multichannel keeps the channels of the inputs, in single-file and directory mode
+        """
+
+        stereo = os.path.join(self.input_dir, 'stereo.wav')
+        sf.write(stereo, np.random.rand(self.sample_rate, 2) - 0.5, self.sample_rate)
+        output = os.path.join(self.tmp.name, 'single.wav')
+        result = self.runner.invoke(main, [stereo, output, '--multichannel', '--channel-randomness', 'independent'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(sf.info(output).channels, 2)
+
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--multichannel', '--workers', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(sf.info(os.path.join(self.output_dir, 'stereo.wav')).channels, 2)
+        self.assertEqual(sf.info(os.path.join(self.output_dir, 'a.wav')).channels, 1)
+
+    def test_cache_dir(self):
+        """
+        --cache-dir stores the decoded clips and gives the same outputs as decoding
+        """
+
+        cache_dir = os.path.join(self.tmp.name, 'cache')
+        cached = os.path.join(self.tmp.name, 'cached')
+        for output, options in ((self.output_dir, []), (cached, ['--cache-dir', cache_dir])):
+            result = self.runner.invoke(main, [self.input_dir, output, '--seed', '3', '--workers', '2'] + options)
+            self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len([name for name in os.listdir(cache_dir) if name.endswith('.npz')]), 3)
+        for name in self.outputs():
+            np.testing.assert_allclose(sf.read(os.path.join(cached, name))[0],
+                                       sf.read(os.path.join(self.output_dir, name))[0], atol=1e-3)
+
+    def test_cache_max_disk(self):
+        """
+        --cache-max-disk bounds the cache directory
+        """
+
+        cache_dir = os.path.join(self.tmp.name, 'cache')
+        # Clips of 600 kB: 1 MB keeps one of them
+        for name in ('a.wav', 'b.wav', os.path.join('sub', 'c.wav')):
+            sf.write(os.path.join(self.input_dir, name), np.random.rand(150000) - 0.5, self.sample_rate)
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--cache-dir', cache_dir,
+                                           '--cache-max-disk', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        sizes = [os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir)]
+        self.assertEqual(len(sizes), 1)
+        self.assertLessEqual(sum(sizes), 1 << 20)
+
+        result = self.runner.invoke(main, [self.input_dir, self.output_dir, '--cache-max-disk', '1'])
+        self.assertNotEqual(result.exit_code, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
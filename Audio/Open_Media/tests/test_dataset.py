@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+import torch
+from torch.utils.data import DataLoader
+from audio_augmenter.chain import Effect, EffectChain
+from audio_augmenter.dataset import (AugmentedAudioDataset, AugmentedAudioStream, ClipCache,
+                                     collate_padded, fix_length, worker_init_fn)
+
+
+class TestAugmentedAudioDataset(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Four clips of different lengths
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sample_rate = 8000
+        for k, seconds in enumerate((0.5, 1.0, 1.5, 2.0)):
+            sf.write(os.path.join(self.tmp.name, f"{k}.wav"),
+                     np.random.rand(int(seconds * self.sample_rate)) - 0.5, self.sample_rate)
+        self.chain = EffectChain([Effect('gain', gain=(-6, 6)), Effect('noise', noise_level=0.01)])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_crop_and_pad_for_collation(self):
+        """
+        With crop_length every item has the same size and the default collate works
+        """
+
+        dataset = AugmentedAudioDataset(self.tmp.name, chain=self.chain, crop_length=self.sample_rate)
+        loader = DataLoader(dataset, batch_size=4, num_workers=2, worker_init_fn=worker_init_fn)
+        waveforms, lengths = next(iter(loader))
+        self.assertEqual(waveforms.shape, (4, self.sample_rate))
+        self.assertEqual(waveforms.dtype, torch.float32)
+        self.assertEqual(sorted(lengths.tolist()), [4000, 8000, 8000, 8000])
+
+    def test_seeded_items_do_not_depend_on_workers(self):
+        """
+        A seeded dataset gives the same items with 0 or 2 workers, other ones in the next epoch
+        """
+
+        dataset = AugmentedAudioDataset(self.tmp.name, chain=self.chain, seed=3)
+        batches = [torch.cat([waveform for waveform, _ in DataLoader(dataset, batch_size=None, num_workers=workers)])
+                   for workers in (0, 2)]
+        torch.testing.assert_close(batches[0], batches[1])
+        first = dataset[0][0]
+        torch.testing.assert_close(dataset[0][0], first)
+        dataset.set_epoch(1)
+        self.assertFalse(torch.equal(dataset[0][0], first))
+
+    def test_stream_splits_files_between_workers(self):
+        """
+        Every file is yielded once per epoch across the workers
+        """
+
+        stream = AugmentedAudioStream(self.tmp.name, chain=self.chain, seed=0)
+        loader = DataLoader(stream, batch_size=None, num_workers=2)
+        lengths = sorted(length for _, length in loader)
+        self.assertEqual(lengths, [4000, 8000, 12000, 16000])
+
+    def test_collate_padded(self):
+        waveforms, lengths = collate_padded([(torch.ones(3), 3), (torch.ones(5), 5)])
+        self.assertEqual(waveforms.shape, (2, 5))
+        self.assertEqual(lengths.tolist(), [3, 5])
+        self.assertEqual(waveforms[0, 3:].abs().sum(), 0)
+
+    def test_fix_length(self):
+        waveform = np.arange(10, dtype=np.float32)
+        cropped, length = fix_length(waveform, 4, random_crop=False)
+        np.testing.assert_array_equal(cropped, [0, 1, 2, 3])
+        padded, length = fix_length(waveform, 12)
+        self.assertEqual((len(padded), length), (12, 10))
+
+    def test_clip_cache(self):
+        """
+        Clips are decoded once and the least recently used one is evicted
+        """
+
+        cache = ClipCache(max_items=2)
+        paths = [os.path.join(self.tmp.name, f"{k}.wav") for k in range(3)]
+        for path in (paths[0], paths[1], paths[0], paths[2], paths[0]):
+            cache.read(path)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 3, 2))
+        cache.read(paths[1])
+        self.assertEqual(cache.misses, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.masking import apply_mask, spec_augment_mask
+
+
+class TestMasking(unittest.TestCase):
+
+    def test_time_and_frequency_masks(self):
+        """
+        Time masks cover whole frames, frequency masks whole bins, both at once
+        """
+
+        mask = spec_augment_mask((129, 100), num_time_masks=3, time_mask_param=4,
+                                 num_freq_masks=2, freq_mask_param=6)
+        masked_frames = mask.all(axis=0)
+        masked_bins = mask.all(axis=1)
+        self.assertTrue(4 <= masked_frames.sum() <= 12)
+        self.assertTrue(6 <= masked_bins.sum() <= 12)
+        np.testing.assert_array_equal(mask, masked_frames[np.newaxis, :] | masked_bins[:, np.newaxis])
+
+    def test_batched_masks_are_independent(self):
+        """
+        Every spectrogram of a stack gets its own masks
+        """
+
+        mask = spec_augment_mask((16, 129, 100), num_time_masks=2, time_mask_param=5)
+        frames = mask.all(axis=1)
+        self.assertGreater(len({tuple(np.flatnonzero(row)) for row in frames}), 1)
+
+    def test_valid_frames(self):
+        """
+        Time masks stay inside the valid frames of every clip
+        """
+
+        mask = spec_augment_mask((4, 10, 100), num_time_masks=5, time_mask_param=3,
+                                 valid_frames=np.array([100, 50, 20, 10]))
+        self.assertFalse(mask[1, :, 50:].any())
+        self.assertFalse(mask[3, :, 10:].any())
+
+    def test_apply_mask_in_place(self):
+        """
+        The mask is applied without a copy when out is the spectrogram
+        """
+
+        spectrogram = np.ones((5, 8), dtype=np.float32)
+        mask = np.zeros((5, 8), dtype=bool)
+        mask[:, 2] = True
+        result = apply_mask(spectrogram, mask, out=spectrogram)
+        self.assertIs(result, spectrogram)
+        self.assertEqual(spectrogram.sum(), 35)
+
+    def test_augmentor_return_mask(self):
+        """
+        The augmentor can return the mask and the cached spectrogram instead of a masked copy
+        """
+
+        processor = AudioAugmentor(np.random.rand(16000), 16000)
+        spectrogram, mask = processor.augment_spectrogram(['TimeMasking', 'FrequencyMasking'], return_mask=True)
+        self.assertIs(spectrogram, processor.log_spectrogram())
+        self.assertEqual(mask.shape, spectrogram.shape)
+        self.assertTrue(mask.any())
+        masked = processor.augment_spectrogram(['TimeMasking', 'FrequencyMasking'])
+        self.assertTrue((masked == 0).any())
+        with self.assertRaises(ValueError):
+            processor.augment_spectrogram(['TimeStretching'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from audio_augmenter.modulation import (SineTable, flanger, flanger_reference,
+                                        modulated_delay, vibrato, vibrato_reference)
+
+
+class TestModulation(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A 1 second test tone with a little noise (one channel)
+        """
+
+        self.sample_rate = 8000
+        t = np.arange(self.sample_rate) / self.sample_rate
+        noise = np.random.default_rng(0).standard_normal(t.shape) * 0.01
+        self.waveform = (0.5 * np.sin(2 * np.pi * 220 * t) + noise).astype(np.float32).reshape(-1, 1)
+        # Stated tolerance: one sample step of the signal
+        self.tolerance = np.max(np.abs(np.diff(self.waveform, axis=0))) + 1e-6
+
+    def test_sine_table_matches_np_sin(self):
+        """
+        The periodic table gives the same LFO as computing np.sin directly
+        """
+
+        table = SineTable()
+        n = np.arange(5000, 25000)
+        expected = np.sin(2 * np.pi * 1.5 * n / self.sample_rate)
+        np.testing.assert_allclose(table.lfo(1.5, self.sample_rate, len(n), start=5000), expected, atol=1e-9)
+
+    def test_flanger_matches_reference(self):
+        """
+        The vectorized flanger reproduces the per-sample loop
+        """
+
+        expected = flanger_reference(self.waveform, self.sample_rate, depth=0.01)
+        for interpolation in ('none', 'linear'):
+            result = flanger(self.waveform, self.sample_rate, depth=0.01, interpolation=interpolation)
+            self.assertEqual(result.shape, self.waveform.shape)
+            self.assertLessEqual(np.max(np.abs(result - expected)), self.tolerance)
+        exact = flanger(self.waveform, self.sample_rate, depth=0.01)
+        self.assertLess(np.mean(exact != expected), 1e-3)
+
+    def test_vibrato_matches_reference(self):
+        """
+        The vectorized vibrato reproduces the per-sample loop
+        """
+
+        expected = vibrato_reference(self.waveform, self.sample_rate)
+        np.testing.assert_array_equal(vibrato(self.waveform, self.sample_rate), expected)
+        result = vibrato(self.waveform, self.sample_rate, interpolation='linear')
+        self.assertLessEqual(np.max(np.abs(result - expected)), self.tolerance)
+
+    def test_modulated_delay_out_of_range(self):
+        """
+        Samples read from outside the signal are filled
+        """
+
+        signal = np.arange(1, 6, dtype=np.float32)
+        delays = np.array([2, 2, 2, -3, -3])
+        np.testing.assert_array_equal(modulated_delay(signal, delays), [0, 0, 1, 0, 0])
+        np.testing.assert_array_equal(modulated_delay(signal, delays, fill='dry'), [1, 2, 1, 4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+import unittest
+from unittest import mock
+import numpy as np
+from audio_augmenter import preview
+from audio_augmenter.augment import AudioAugmentor
+
+
+class TestHeadless(unittest.TestCase):
+
+    def test_cli_import_is_light(self):
+        """
+        Importing the CLI loads neither IPython, matplotlib nor torch
+        """
+
+        script = ("import sys, audio_augmenter.cli; "
+                  "print(sorted(m for m in ('IPython', 'matplotlib', 'torch') if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_headless_outside_notebooks(self):
+        """
+        Outside a kernel process_audio shows nothing, a non-headless augmentor previews
+        """
+
+        waveform = np.random.rand(8000) - 0.5
+        processor = AudioAugmentor(waveform, 8000)
+        self.assertTrue(processor.headless)
+        with mock.patch.object(preview, 'play') as play:
+            processor.process_audio('audio')
+            play.assert_not_called()
+            AudioAugmentor(waveform, 8000, headless=False).process_audio('audio')
+            play.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
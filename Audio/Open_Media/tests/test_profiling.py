@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.parallel import augment_directory
+from audio_augmenter.profiling import Profiler, profile
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_rate = 8000
+        self.processor = AudioAugmentor(np.random.rand(self.sample_rate) - 0.5, self.sample_rate)
+
+    def test_records_every_effect(self):
+        """
+        Every effect call is recorded with its input and output lengths
+        """
+
+        received = []
+        with profile(self.processor, trace_memory=True, callbacks=[received.append]) as profiler:
+            self.processor.augment_audio()
+            self.processor.augment_spectrogram(['TimeMasking'])
+        self.assertIsNone(self.processor.profiler)
+        effects = [record.effect for record in profiler.records]
+        self.assertEqual(effects[:7], ['add_white_noise', 'random_gain', 'add_echo', 'apply_flanger',
+                                       'change_pitch', 'time_stretch', 'vibrato'])
+        self.assertIn('augment_spectrogram', effects)
+        self.assertEqual(received, profiler.records)
+        pitch = profiler.records[4]
+        self.assertEqual((pitch.input_length, pitch.output_length), (8000, 12000))
+        self.assertGreater(profiler.records[3].bytes_allocated, 0)
+        self.assertTrue(all(record.wall_time >= 0 and record.cpu_time >= 0 for record in profiler.records))
+
+    def test_disabled(self):
+        """
+        Without a profiler nothing is recorded
+        """
+
+        profiler = Profiler()
+        with profile(self.processor, profiler):
+            self.processor.random_gain()
+        self.processor.add_echo()
+        self.assertEqual([record.effect for record in profiler.records], ['random_gain'])
+
+    def test_exports(self):
+        with profile(self.processor) as profiler:
+            self.processor.random_gain()
+            self.processor.random_gain()
+        exported = json.loads(profiler.to_json())
+        self.assertEqual(exported['summary']['random_gain']['calls'], 2)
+        self.assertEqual(len(exported['records']), 2)
+        text = profiler.to_prometheus()
+        self.assertIn('# TYPE audio_augmenter_effect_calls_total counter', text)
+        self.assertIn('audio_augmenter_effect_calls_total{effect="random_gain"} 2', text)
+        self.assertNotIn('allocated_bytes', text)
+
+    def test_directory_workers(self):
+        """
+        Records of the worker processes are collected, I/O included
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('a.wav', 'b.wav'):
+                sf.write(os.path.join(directory, name), np.random.rand(4000) - 0.5, 4000)
+            profiler = Profiler()
+            augment_directory(directory, os.path.join(directory, 'out'), workers=2, profiler=profiler)
+        summary = profiler.summary()
+        self.assertEqual(summary['read_audio']['calls'], 2)
+        self.assertEqual(summary['save_audio']['calls'], 2)
+        self.assertEqual(summary['vibrato']['calls'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
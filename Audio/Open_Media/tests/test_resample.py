@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+import scipy.signal
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.resample import (BACKENDS, StreamingResampler, polyphase_filter,
+                                      register_backend, resample)
+
+
+class TestResample(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A signal whose length is a prime number
+        """
+
+        self.signal = np.random.rand(10007, 1).astype(np.float32) - 0.5
+
+    def test_exact_output_length(self):
+        """
+        Every backend returns exactly the requested number of samples
+        """
+
+        for quality in ('fast', 'balanced', 'best'):
+            for backend in (None, 'stream'):
+                result = resample(self.signal, 15011, quality=quality, backend=backend)
+                self.assertEqual(result.shape, (15011, 1), f"{quality}/{backend}")
+
+    def test_streaming_matches_resample_poly(self):
+        """
+        Block processing gives the same samples as scipy.signal.resample_poly
+        """
+
+        for up, down in ((3, 2), (2, 3), (160, 147)):
+            expected = scipy.signal.resample_poly(self.signal[:, 0].astype(np.float64), up, down,
+                                                  window=polyphase_filter(up, down))
+            resampler = StreamingResampler(up, down)
+            blocks = [resampler.process(self.signal[i:i + 999, 0].astype(np.float64))
+                      for i in range(0, len(self.signal), 999)]
+            result = np.concatenate(blocks + [resampler.flush()])
+            np.testing.assert_allclose(result, expected, atol=1e-9)
+
+    def test_backends_agree(self):
+        """
+        The polyphase backend stays close to the FFT one on a band-limited signal
+        """
+
+        t = np.arange(8000) / 8000
+        tone = np.sin(2 * np.pi * 200 * t)
+        exact = resample(tone, 12000, quality='best')
+        approximate = resample(tone, 12000, quality='balanced')
+        self.assertLess(np.max(np.abs(exact[200:-200] - approximate[200:-200])), 1e-2)
+
+    def test_register_backend(self):
+        """
+        Custom backends can be plugged in by name
+        """
+
+        register_backend('repeat', lambda x, num, axis=0, **options: np.resize(x, (num,) + x.shape[1:]))
+        try:
+            self.assertEqual(resample(self.signal, 20, backend='repeat').shape, (20, 1))
+        finally:
+            del BACKENDS['repeat']
+        with self.assertRaises(ValueError):
+            resample(self.signal, 20, backend='repeat')
+
+    def test_augmentor_quality(self):
+        """
+        The augmentor uses the selected preset for pitch and stretch
+        """
+
+        processor = AudioAugmentor(self.signal, 16000, resample_quality='fast')
+        processor.change_pitch()
+        processor.time_stretch()
+        self.assertEqual(len(processor.waveform), int(int(10007 * 1.5) * 1.2))
+
+
+if __name__ == '__main__':
+    unittest.main()
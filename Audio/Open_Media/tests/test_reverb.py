@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.batch import BatchAugmentor
+from audio_augmenter.chain import Effect, EffectChain
+from audio_augmenter.reverb import (OverlapAdd, SpectrumCache, default_cache, downmix_ir, fft_convolve, load_ir,
+                                    multitap_ir, room_ir)
+from audio_augmenter.streaming import StreamingAugmentor
+
+
+def direct_convolve(signal, ir):
+    """
+    np.convolve of every channel, truncated to the signal length
+    """
+
+    ir = ir.reshape(len(ir), -1)
+    return np.stack([np.convolve(signal[:, c], ir[:, c % ir.shape[1]])[:len(signal)]
+                     for c in range(signal.shape[1])], axis=1)
+
+
+class TestReverb(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.sample_rate = 8000
+        self.signal = rng.uniform(-0.5, 0.5, (20000, 2)).astype(np.float32)
+        self.ir = room_ir(self.sample_rate, 0.3, rng)
+
+    def test_matches_direct_convolution(self):
+        """
+        Overlap-add gives np.convolve, for a shared IR and for one IR per channel
+        """
+
+        for ir in (self.ir, np.stack([self.ir, self.ir[::-1]], axis=1)):
+            np.testing.assert_allclose(fft_convolve(self.signal, ir), direct_convolve(self.signal, ir), atol=1e-4)
+
+    def test_blocks_match_whole_signal(self):
+        """
+        Any block sizes give the convolution of the whole signal
+        """
+
+        expected = fft_convolve(self.signal, self.ir)
+        for blocksize in (1000, 4097, 30000):
+            convolution = OverlapAdd(self.ir)
+            blocks = [convolution.process(self.signal[i:i + blocksize])
+                      for i in range(0, len(self.signal), blocksize)]
+            np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-5)
+
+    def test_spectrum_cache(self):
+        """
+        The spectrum of an IR is computed once, also for an equal copy
+        """
+
+        cache = SpectrumCache(max_spectra=1)
+        fft_convolve(self.signal, self.ir, cache=cache)
+        fft_convolve(self.signal, self.ir.copy(), cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        fft_convolve(self.signal, multitap_ir(self.sample_rate), cache=cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_multitap_echo(self):
+        """
+        One tap is add_echo, more taps add decaying echoes
+        """
+
+        echo = AudioAugmentor(self.signal[:, 0], self.sample_rate, backend='numpy', seed=0)
+        multitap = AudioAugmentor(self.signal[:, 0], self.sample_rate, backend='numpy', seed=0)
+        echo.add_echo(delay=0.1, decay=0.2)
+        multitap.add_multitap_echo(delay=0.1, decay=0.2, num_taps=1)
+        np.testing.assert_allclose(multitap.waveform, echo.waveform, atol=1e-5)
+        np.testing.assert_array_equal(np.flatnonzero(multitap_ir(10, 0.2, 0.5, 3)), [0, 2, 4, 6])
+
+    def test_reverb_file_and_multichannel(self):
+        """
+        An IR file is resampled to the signal rate; independent channels get their own room
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ir.wav')
+            sf.write(path, np.r_[np.ones(1), np.zeros(1598), 0.5 * np.ones(1)], 16000, subtype='FLOAT')
+            ir = load_ir(path, self.sample_rate)
+            self.assertEqual(len(ir), 800)
+            self.assertAlmostEqual(float(np.sum(ir ** 2)), 1.0, places=5)
+            processor = AudioAugmentor(self.signal, self.sample_rate, backend='numpy', multichannel=True)
+            processor.add_reverb(ir=path, wet=0.5)
+            self.assertEqual(processor.waveform.shape, self.signal.shape)
+
+        identical = np.repeat(self.signal[:, :1], 2, axis=1)
+        processor = AudioAugmentor(identical, self.sample_rate, backend='numpy', multichannel=True,
+                                   channel_randomness='independent')
+        processor.add_reverb()
+        self.assertFalse(np.array_equal(processor.waveform[:, 0], processor.waveform[:, 1]))
+
+    def test_streaming_and_batch(self):
+        """
+        The streaming stage and the batch give the in-memory result of the same IR
+        """
+
+        expected = AudioAugmentor(self.signal[:, 0], self.sample_rate, backend='numpy')
+        expected.add_reverb(ir=self.ir)
+
+        augmentor = StreamingAugmentor(self.sample_rate, scale=1 / np.max(np.abs(self.signal[:, 0])),
+                                       effects=('reverb',), reverb_ir=self.ir)
+        blocks = [augmentor.process(self.signal[i:i + 3000, 0]) for i in range(0, len(self.signal), 3000)]
+        np.testing.assert_allclose(np.concatenate(blocks), expected.waveform[:, 0], atol=1e-5)
+
+        batch = BatchAugmentor(self.signal.T, self.sample_rate)
+        batch.add_reverb(ir=self.ir)
+        np.testing.assert_allclose(batch.waveforms[0].numpy(), expected.waveform[:, 0], atol=1e-5)
+        batch.add_multitap_echo(delay=(0.05, 0.1))
+        self.assertEqual(tuple(batch.waveforms.shape), (2, len(self.signal)))
+
+    def test_random_irs_are_not_cached(self):
+        """
+        Synthetic rooms bypass the shared spectrum cache, IR files use it
+        """
+
+        misses = default_cache.misses
+        AudioAugmentor(self.signal[:, 0], self.sample_rate, backend='numpy').add_reverb()
+        BatchAugmentor(self.signal.T, self.sample_rate).add_reverb(rt60=(0.1, 0.3))
+        self.assertEqual(default_cache.misses, misses)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stereo_ir.wav')
+            sf.write(path, np.stack([self.ir, self.ir[::-1]], axis=1), self.sample_rate, subtype='FLOAT')
+            batch = BatchAugmentor(self.signal.T, self.sample_rate)
+            batch.add_reverb(ir=path, wet=(0.2, 0.5))
+            batch.add_reverb(ir=path, wet=(0.2, 0.5))
+        self.assertEqual(default_cache.misses, misses + 1)
+        self.assertEqual(tuple(batch.waveforms.shape), (2, len(self.signal)))
+
+        mono = downmix_ir(np.stack([self.ir, self.ir], axis=1))
+        np.testing.assert_allclose(mono, self.ir, atol=1e-6)
+
+    def test_stereo_ir_file_on_mono(self):
+        """
+        A stereo IR file is downmixed for a mono signal, the same way by the augmentor, the stream and the batch
+        """
+
+        mono = self.signal[:, 0]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stereo_ir.wav')
+            sf.write(path, np.stack([self.ir, self.ir[::-1]], axis=1), self.sample_rate, subtype='FLOAT')
+
+            expected = AudioAugmentor(mono, self.sample_rate, backend='numpy')
+            expected.add_reverb(ir=path, wet=0.5)
+            self.assertEqual(expected.waveform.shape, (len(mono), 1))
+
+            augmentor = StreamingAugmentor(self.sample_rate, scale=1 / np.max(np.abs(mono)),
+                                           effects=('reverb',), reverb_ir=path, reverb_wet=0.5)
+            blocks = [augmentor.process(mono[i:i + 3000]) for i in range(0, len(mono), 3000)]
+            np.testing.assert_allclose(np.concatenate(blocks), expected.waveform[:, 0], atol=1e-5)
+
+            batch = BatchAugmentor(mono[np.newaxis], self.sample_rate)
+            batch.add_reverb(ir=path, wet=0.5)
+            np.testing.assert_allclose(batch.waveforms[0].numpy(), expected.waveform[:, 0], atol=1e-5)
+
+    def test_chain(self):
+        """
+        Reverb and multi-tap echo are chain effects, not part of the default chain
+        """
+
+        chain = EffectChain([Effect('multitap_echo', num_taps=(2, 4)), Effect('reverb', rt60=(0.1, 0.3))])
+        processor = AudioAugmentor(self.signal[:, 0], self.sample_rate, backend='numpy')
+        self.assertEqual([name for name, _ in chain.apply(processor)], ['multitap_echo', 'reverb'])
+        self.assertNotIn('reverb', [effect.name for effect in EffectChain.default().effects])
+
+
+if __name__ == '__main__':
+    unittest.main()
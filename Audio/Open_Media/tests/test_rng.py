@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.batch import BatchAugmentor
+from audio_augmenter.chain import Effect, EffectChain
+from audio_augmenter.rng import child, describe, make_rng, seed_sequence, spawn
+from audio_augmenter.shards import ShardReader, augment_clip, augment_to_shards
+
+
+class TestSeeds(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_rate = 8000
+        self.waveform = np.random.rand(self.sample_rate) - 0.5
+        self.chain = EffectChain([Effect('gain', gain=(-6, 6)), Effect('noise', noise_level=(0.001, 0.01)),
+                                  Effect('pitch', probability=0.5, pitch_factor=(0.9, 1.1))])
+
+    def augment(self, seed):
+        augmentor = AudioAugmentor(self.waveform, self.sample_rate, backend='numpy', headless=True, seed=seed)
+        applied = self.chain.apply(augmentor)
+        spectrogram = augmentor.augment_spectrogram(['TimeMasking', 'FrequencyMasking'])
+        return applied, augmentor.waveform.copy(), spectrogram
+
+    def test_same_seed_same_augmentation(self):
+        """
+        A seed reproduces the drawn parameters, the noise and the masks, without the global state
+        """
+
+        first = self.augment(5)
+        np.random.seed(0)
+        second = self.augment(5)
+        self.assertEqual(first[0], second[0])
+        np.testing.assert_array_equal(first[1], second[1])
+        np.testing.assert_array_equal(first[2], second[2])
+        self.assertFalse(np.array_equal(first[1], self.augment(6)[1]))
+
+        state = np.random.get_state()[1].copy()
+        self.augment(None)
+        BatchAugmentor(np.ones((2, 1000)), self.sample_rate, seed=1).augment_audio()
+        np.testing.assert_array_equal(np.random.get_state()[1], state)
+
+    def test_children(self):
+        """
+        Spawned children are independent, fixed children do not depend on the others
+        """
+
+        children = spawn(3, 4)
+        draws = {make_rng(seed).integers(1 << 62) for seed in children}
+        self.assertEqual(len(draws), 4)
+        self.assertEqual(describe(child(3, 2)), {'entropy': 3, 'spawn_key': [2]})
+        self.assertEqual(make_rng(children[2]).random(), make_rng(child(3, 2)).random())
+
+        generator = np.random.default_rng(0)
+        self.assertIs(make_rng(generator), generator)
+        augmentor = AudioAugmentor(self.waveform, self.sample_rate, seed=generator)
+        self.assertIsNone(augmentor.seed)
+        self.assertIs(augmentor.rng, generator)
+
+    def test_regenerate_from_description(self):
+        """
+        The described seed of an augmentation regenerates it
+        """
+
+        seed = child(None, 7)
+        expected = self.augment(seed)[1]
+        np.testing.assert_array_equal(self.augment(seed_sequence(describe(seed)))[1], expected)
+
+    def test_shards_do_not_depend_on_workers(self):
+        """
+        A seeded run gives the same samples with 1 or 2 workers, each regenerated from its metadata
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('a.wav', 'b.wav', 'c.wav'):
+                sf.write(os.path.join(directory, name), np.random.rand(4000) - 0.5, 4000)
+            readers = []
+            for workers in (1, 2):
+                output = os.path.join(directory, f'shards{workers}')
+                augment_to_shards(directory, output, workers=workers, variants=2, chain=self.chain, seed=11)
+                readers.append(ShardReader(output))
+            for (key, array, metadata), (_, other, _) in zip(*readers):
+                np.testing.assert_array_equal(array, other)
+                path = os.path.join(directory, metadata['source'])
+                samples, _ = augment_clip(path, [key], chain=self.chain.to_dict(), seeds=[metadata['seed']])
+                np.testing.assert_array_equal(samples[0][1], array)
+
+
+if __name__ == '__main__':
+    unittest.main()
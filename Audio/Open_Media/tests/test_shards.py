@@ -0,0 +1,100 @@
+import os
+import tarfile
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import soundfile as sf
+from audio_augmenter.chain import Effect, EffectChain
+from audio_augmenter.shards import ShardReader, ShardWriter, augment_to_shards, bounded_map, iter_shard
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'shards')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writer_and_reader(self):
+        """
+        Shards are cut at max_count, sequential and indexed reads agree
+        """
+
+        arrays = [np.random.rand(100 + k, 1).astype(np.float32) for k in range(5)]
+        with ShardWriter(self.directory, max_count=2) as writer:
+            for k, array in enumerate(arrays):
+                writer.write(f"clip{k}", array, {'variant': k})
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['index.jsonl', 'shard-000000.tar', 'shard-000001.tar', 'shard-000002.tar'])
+        # Plain tar files in the WebDataset layout
+        with tarfile.open(os.path.join(self.directory, 'shard-000000.tar')) as tar:
+            self.assertEqual(tar.getnames(), ['clip0.npy', 'clip0.json', 'clip1.npy', 'clip1.json'])
+
+        reader = ShardReader(self.directory)
+        self.assertEqual(len(reader), 5)
+        for k, (key, array, metadata) in enumerate(reader):
+            self.assertEqual((key, metadata), (f"clip{k}", {'variant': k}))
+            np.testing.assert_array_equal(array, arrays[k])
+            np.testing.assert_array_equal(reader[k][1], arrays[k])
+        self.assertIsInstance(reader[3][1], np.memmap)
+
+    def test_size_limit_and_keys(self):
+        with ShardWriter(self.directory, max_size=1000) as writer:
+            for k in range(3):
+                writer.write(f"clip{k}", np.zeros(1000, dtype=np.float32))
+            with self.assertRaises(ValueError):
+                writer.write('clip.wav', np.zeros(1))
+        self.assertEqual(len(ShardReader(self.directory).shards), 3)
+
+    def test_augment_to_shards(self):
+        """
+        Every variant of every input is written with the applied effects
+        """
+
+        inputs = os.path.join(self.tmp.name, 'inputs')
+        os.makedirs(inputs)
+        for name in ('a.wav', 'b.wav'):
+            sf.write(os.path.join(inputs, name), np.random.rand(8000) - 0.5, 8000)
+        chain = EffectChain([Effect('gain', gain=(-6, 6)), Effect('stretch', stretch_factor=2)])
+        summary = augment_to_shards(inputs, self.directory, workers=2, variants=2, chain=chain, max_count=3)
+        self.assertEqual((summary.processed, summary.written), (2, 4))
+
+        samples = list(ShardReader(self.directory))
+        self.assertEqual([key for key, _, _ in samples], ['a_aug0', 'a_aug1', 'b_aug0', 'b_aug1'])
+        key, array, metadata = samples[0]
+        self.assertEqual(array.shape, (16000, 1))
+        self.assertEqual(metadata['source'], 'a.wav')
+        self.assertEqual([name for name, _ in metadata['effects']], ['gain', 'stretch'])
+        self.assertTrue(-6 <= metadata['effects'][0][1]['gain'] <= 6)
+
+        spectrograms = os.path.join(self.tmp.name, 'spectrograms')
+        augment_to_shards(inputs, spectrograms, method='spectrogram', effects=['TimeMasking'])
+        key, array, metadata = next(iter_shard(os.path.join(spectrograms, 'shard-000000.tar')))
+        self.assertEqual(array.ndim, 3)
+        self.assertEqual(metadata['effects'], [['TimeMasking', {'num_masks': 8, 'mask_param': 5}]])
+
+
+    def test_bounded_map(self):
+        """
+        Results come in input order with at most window tasks in flight
+        """
+
+        pulled = []
+
+        def items():
+            for item in range(20):
+                pulled.append(item)
+                yield item
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for index, result in enumerate(bounded_map(executor, lambda item: item * 2, items(), window=4)):
+                self.assertEqual(result, index * 2)
+                # The window of submitted tasks, and the next item waiting for room
+                self.assertLessEqual(len(pulled), index + 4 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
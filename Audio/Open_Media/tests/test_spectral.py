@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+import numpy as np
+import scipy.signal
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.spectral import SpectrogramEngine
+
+
+class TestSpectrogramEngine(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A batch of 3 one-second clips
+        """
+
+        self.sample_rate = 16000
+        self.signal = np.random.rand(3, self.sample_rate).astype(np.float32)
+
+    def test_matches_scipy(self):
+        """
+        Same frequencies, times and values as scipy.signal.spectrogram
+        """
+
+        f, t, expected = scipy.signal.spectrogram(self.signal, fs=self.sample_rate)
+        engine = SpectrogramEngine.get(self.sample_rate)
+        result = engine.spectrogram(self.signal)
+        np.testing.assert_allclose(engine.frequencies, f)
+        np.testing.assert_allclose(engine.times(self.signal.shape[-1]), t)
+        np.testing.assert_allclose(result, expected, rtol=1e-4, atol=1e-6 * expected.max())
+
+    def test_engines_are_shared(self):
+        """
+        One engine per (sample_rate, nperseg, noverlap)
+        """
+
+        self.assertIs(SpectrogramEngine.get(self.sample_rate), SpectrogramEngine.get(self.sample_rate))
+        self.assertIsNot(SpectrogramEngine.get(self.sample_rate), SpectrogramEngine.get(self.sample_rate, 512))
+
+    def test_log_spectrogram_in_place(self):
+        """
+        The log-spectrogram is written into the given buffer
+        """
+
+        engine = SpectrogramEngine.get(self.sample_rate)
+        out = np.empty(engine.output_shape(self.signal.shape), dtype=np.float32)
+        result = engine.log_spectrogram(self.signal, out=out)
+        self.assertIs(result, out)
+        np.testing.assert_allclose(result, np.log(engine.spectrogram(self.signal) + 1e-10), atol=1e-4)
+
+    def test_buffers_are_bounded(self):
+        """
+        Clips of many lengths keep only the most recent buffers and time axes
+        """
+
+        engine = SpectrogramEngine(self.sample_rate)
+        for length in range(self.sample_rate, self.sample_rate + 40 * engine.step, engine.step):
+            engine.log_spectrogram(np.random.rand(length).astype(np.float32))
+            engine.times(length)
+        self.assertEqual(len(engine._buffers), engine.max_shapes)
+        self.assertEqual(len(engine._times), engine.max_shapes)
+
+    def test_augmentor_reuses_stft(self):
+        """
+        Repeated spectrogram views of a clip compute the STFT once,
+        an effect on the waveform invalidates it
+        """
+
+        processor = AudioAugmentor(self.signal[0], self.sample_rate)
+        with mock.patch.object(SpectrogramEngine, 'spectrogram', autospec=True,
+                               side_effect=SpectrogramEngine.spectrogram) as spectrogram:
+            first = processor.augment_spectrogram(['TimeMasking'])
+            second = processor.augment_spectrogram(['TimeMasking'])
+            self.assertEqual(spectrogram.call_count, 1)
+            self.assertEqual(first.shape, second.shape)
+            processor.random_gain()
+            processor.augment_spectrogram(['TimeMasking'])
+            self.assertEqual(spectrogram.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
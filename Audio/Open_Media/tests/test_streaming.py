@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from audio_augmenter.modulation import flanger, vibrato
+from audio_augmenter.streaming import StreamingAugmentor, augment_file_streaming
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Deterministic effects (no noise, 0 dB gain) on a 1.5 second signal
+        """
+
+        self.sample_rate = 4000
+        self.waveform = (np.random.rand(6000) - 0.5).astype(np.float32)
+        self.options = dict(effects=('gain', 'echo', 'flanger', 'vibrato'), gain_range=(0, 0),
+                            flanger_depth=0.05, vibrato_depth=0.01)
+
+    def expected(self):
+        """
+        The same chain applied to the whole signal at once
+        """
+
+        signal = self.waveform.copy()
+        delay = int(0.1 * self.sample_rate)
+        signal[delay:] += self.waveform[:-delay] * np.float32(0.2)
+        signal = flanger(signal, self.sample_rate, depth=0.05)
+        return vibrato(signal, self.sample_rate, depth=0.01)
+
+    def stream(self, blocksize):
+        augmentor = StreamingAugmentor(self.sample_rate, **self.options)
+        blocks = [augmentor.process(self.waveform[i:i + blocksize])
+                  for i in range(0, len(self.waveform), blocksize)]
+        return np.concatenate(blocks + [augmentor.flush()])
+
+    def test_matches_whole_signal(self):
+        """
+        The output does not depend on the block size
+        """
+
+        expected = self.expected()
+        for blocksize in (6000, 1000, 333, 17):
+            result = self.stream(blocksize)
+            self.assertEqual(result.shape, expected.shape)
+            np.testing.assert_allclose(result, expected, atol=1e-6, err_msg=f"blocksize={blocksize}")
+
+    def test_unknown_effect(self):
+        """
+        Unknown effect names are rejected
+        """
+
+        with self.assertRaises(ValueError):
+            StreamingAugmentor(self.sample_rate, effects=('reverse',))
+
+    def test_stretch_stage(self):
+        """
+        The resampling stage changes the length by the stretch factor
+        """
+
+        self.options.update(effects=('stretch',), stretch_factor=1.5)
+        self.assertEqual(len(self.stream(1000)), int(len(self.waveform) * 1.5))
+
+    def test_augment_file(self):
+        """
+        A stereo file is normalized from the first pass and written as mono
+        """
+
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, 'input.wav')
+            output_path = os.path.join(tmp, 'output.wav')
+            stereo = np.stack([self.waveform, self.waveform], axis=1) * 0.25
+            sf.write(input_path, stereo, self.sample_rate, subtype='FLOAT')
+            written = augment_file_streaming(input_path, output_path, blocksize=1000, effects=('gain',),
+                                             gain_range=(0, 0))
+            result, sr = sf.read(output_path)
+            self.assertEqual(written, len(self.waveform))
+            self.assertEqual(sr, self.sample_rate)
+            self.assertAlmostEqual(np.max(np.abs(result)), 1.0, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
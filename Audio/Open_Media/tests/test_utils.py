@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from audio_augmenter.augment import AudioAugmentor
+from audio_augmenter.utils import MappedAudio, read_audio, save_audio
+
+
+class TestAudioIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sample_rate = 8000
+        self.signal = (np.random.rand(self.sample_rate, 2) - 0.5).astype(np.float32)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, subtype, channels=2):
+        path = os.path.join(self.tmp.name, f"{subtype}_{channels}.wav")
+        sf.write(path, self.signal[:, :channels], self.sample_rate, subtype=subtype)
+        return path
+
+    def test_window(self):
+        """
+        Only the frames [start, stop) are returned
+        """
+
+        path = self.write('FLOAT')
+        window, sample_rate = read_audio(path, start=100, stop=300)
+        self.assertEqual(sample_rate, self.sample_rate)
+        np.testing.assert_array_equal(window, self.signal[100:300])
+
+    def test_memory_mapped_read(self):
+        """
+        The mapped view converts to the same values as a decoded read, for every mappable format
+        """
+
+        for subtype in ('PCM_U8', 'PCM_16', 'PCM_32', 'FLOAT', 'DOUBLE'):
+            for channels in (1, 2):
+                path = self.write(subtype, channels)
+                mapped, sample_rate = read_audio(path, start=10, stop=1000, mmap=True)
+                expected, _ = read_audio(path, start=10, stop=1000)
+                self.assertIsInstance(mapped, MappedAudio)
+                self.assertIsInstance(mapped.raw, np.memmap)
+                self.assertEqual(mapped.shape, expected.shape)
+                np.testing.assert_allclose(np.asarray(mapped), expected, atol=1e-7)
+                np.testing.assert_allclose(mapped[5:8], expected[5:8], atol=1e-7)
+
+    def test_memory_mapped_limits(self):
+        """
+        24-bit PCM and non-WAV files are rejected instead of being misread
+        """
+
+        with self.assertRaises(ValueError):
+            read_audio(self.write('PCM_24'), mmap=True)
+        path = os.path.join(self.tmp.name, 'clip.flac')
+        sf.write(path, self.signal, self.sample_rate)
+        with self.assertRaises(ValueError):
+            read_audio(path, mmap=True)
+
+    def test_augmentor_accepts_mapped_audio(self):
+        mapped, sample_rate = read_audio(self.write('PCM_16'), mmap=True)
+        processor = AudioAugmentor(mapped, sample_rate)
+        self.assertEqual(processor.waveform.shape, (self.sample_rate, 1))
+
+    def test_save_formats(self):
+        """
+        int16 WAV and FLAC outputs, clipped instead of wrapped around
+        """
+
+        loud = self.signal * 4
+        for name, subtype, expected in (('a.wav', 'PCM_16', 'PCM_16'), ('b.flac', None, 'PCM_16'),
+                                        ('c.wav', 'FLOAT', 'FLOAT')):
+            path = os.path.join(self.tmp.name, name)
+            save_audio(path, loud, self.sample_rate, subtype=subtype)
+            self.assertEqual(sf.info(path).subtype, expected)
+            written, _ = sf.read(path)
+            if expected == 'FLOAT':
+                np.testing.assert_allclose(written, loud)
+            else:
+                np.testing.assert_allclose(written, np.clip(loud, -1, 1), atol=1 / 2 ** 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
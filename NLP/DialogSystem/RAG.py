@@ -1,40 +1,40 @@
-import chromadb
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-from openai import OpenAI
 import os
 import json
+from knowledge_base import sync_documents
+from provider import get_provider
+from llm_client import get_llm_client
+from responder import KnowledgeResponder
 
-class SimpleDialogSystem:
-    def __init__(self, api_key):
+class SimpleDialogSystem(KnowledgeResponder):
+    def __init__(self, api_key, provider=None, llm=None):
         self.api_key = api_key
 
-        # Создаем  клиента Chroma
         self.base_directory = "./data"
         os.makedirs(self.base_directory, exist_ok=True)
 
-        self.chroma_client = chromadb.PersistentClient(path=os.path.join(self.base_directory, "chroma"))
-        self.collection_name = "thermostat_collection"
-
-        # Удаляем коллекцию, если она существует
-        existing_names = self.chroma_client.list_collections()
-        if self.collection_name in existing_names:
-            self.chroma_client.delete_collection(name=self.collection_name)
-
-        # Создаем коллекцию с указанием модели по созданию  эмбеддингов
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L12-v2"
-        )
-        self.collection = self.chroma_client.create_collection(
-            name=self.collection_name,
-            embedding_function=self.embedding_fn
-        )
-
-        # Инициализация базы знаний
-        self.setup_knowledge_base()
+        # Клиент Chroma, модель эмбеддингов (загружается при первом запросе) и поиск
+        # с объединением одновременных запросов в батчи общие для всех сессий процесса.
+        # Коллекция открывается (или создается): сохраненные документы не пересчитываются при каждом запуске.
+        # У системы своя коллекция: корпус DialogSystem другой, и синхронизация с prune удаляла бы его документы
+        self.provider = provider or get_provider(path=os.path.join(self.base_directory, "chroma"),
+                                                 collection_name="simple_thermostat_collection")
+        self.chroma_client = self.provider.client
+        self.collection_name = self.provider.collection_name
+        self.embedding_fn = self.provider.embedding_fn
+        self.collection = self.provider.collection
+        self.retrieval = self.provider.retrieval
+        # Кеш ответов LLM и долгоживущий клиент LLM с пулом соединений, общие для всех сессий
+        # (llm задает другой сервер, например mock_llm_server.py в тестах)
+        self.llm = llm or get_llm_client(api_key, model="google/gemini-2.0-flash-exp:free")
+        self.model = self.llm.model
+        self.response_cache = self.provider.response_cache
+
+        # Инициализация базы знаний (один раз на процесс)
+        self.provider.sync_once(type(self).__name__, self.setup_knowledge_base)
 
     def setup_knowledge_base(self):
-        """Заполнение базы знаний термостатами"""
+        """Синхронизация базы знаний о термостатах: эмбеддинги считаются только для новых и измененных документов"""
         documents = [
             "Термостаты обычно поддерживают температуру в диапазоне 5-30°C.",
             "Если термостат не поддерживает нужную температуру, проверьте батарейки и соединение с системой.",
@@ -45,45 +45,8 @@ class SimpleDialogSystem:
         metadatas = [{"source": "manual", "type": "fact"} for _ in range(len(documents))]
         ids = [f"doc_{i}" for i in range(len(documents))]
 
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        return sync_documents(self.collection, zip(ids, documents, metadatas), prune=True)
                
-    def get_relevant_knowledge(self, query, n_results=1):
-        """Извлечение релевантных документов из базы данных Chroma"""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            include=["documents", "distances"]
-        )
-
-        knowledge_parts = []
-        for doc, dist in zip(results['documents'][0], results['distances'][0]):
-            knowledge_parts.append(f"{doc} (релевантность: {1-dist:.2f})")
-
-        return "\n".join(knowledge_parts)
-
-    def generate_response(self, instruction):
-        """Генерация ответа с использованием OpenRouter"""
-        knowledge = self.get_relevant_knowledge(instruction)
-        full_prompt = f"""Контекстная информация о термостатах:
-{knowledge}
-
-На основе этой информации выполни следующую задачу: {instruction}"""
-
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=self.api_key,
-        )
-        model = "google/gemini-2.0-flash-exp:free"
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "system", "content": full_prompt}]
-        )
-        return completion.choices[0].message.content
-
     def chat_mode(self):
         """Режим общения с пользователем"""
         print("Вы можете задать дополнительные вопросы. Введите 'exit' для выхода.")
@@ -92,8 +55,12 @@ class SimpleDialogSystem:
             if user_input.lower() == 'exit':
                 print("Диалог завершен.")
                 break
-            response = self.generate_response(user_input)
-            print(f"Система: {response}")
+            # Ответ печатается по мере генерации; вопросы пользователя ищутся в кеше только
+            # по точному совпадению: близкий по смыслу вопрос может требовать другого ответа
+            print("Система: ", end="", flush=True)
+            for token in self.stream_response(user_input):
+                print(token, end="", flush=True)
+            print()
 
 if __name__ == "__main__":
     api_key = ""
@@ -0,0 +1,111 @@
+"""
+Задержка узлов DialogSystem с LLM-заглушкой (mock_llm_server.py): запросы
+узла по очереди, параллельно и параллельно с готовыми подписями вариантов.
+
+    python benchmark_dialog.py --latency 0.3 --repeat 3
+    python benchmark_dialog.py --retrieval    # с настоящим поиском в Chroma
+
+Без --retrieval поиск по базе знаний заменен мгновенной заглушкой, чтобы
+задержка узла состояла только из запросов к LLM. Кеш ответов отключен.
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+
+from llm_client import LLMClient
+from mock_llm_server import MockLLMServer
+from multilevel_dialogue import DialogSystem
+from retrieval import RetrievalService
+
+# Ответы пользователя сценария из multilevel_dialogue.py
+RESPONSES = ['temp', '22', '24', 'день', '1.5', 'yes', 'ok']
+
+MODES = {
+    'по очереди': dict(max_concurrency=1),
+    'параллельно': dict(max_concurrency=4),
+    'готовые подписи': dict(max_concurrency=4, static_labels=True),
+}
+
+
+class StubCollection:
+    """Коллекция, мгновенно возвращающая один и тот же документ"""
+
+    def query(self, query_embeddings, n_results, include):
+        return {'documents': [["Термостаты обычно поддерживают температуру в диапазоне 5-30°C."] * n_results
+                              for _ in query_embeddings],
+                'distances': [[0.0] * n_results for _ in query_embeddings]}
+
+
+class StubProvider:
+    """Заглушка KnowledgeProvider без модели эмбеддингов и Chroma"""
+
+    def __init__(self):
+        self.client = None
+        self.collection_name = "stub"
+        self.embedding_fn = lambda texts: texts
+        self.collection = StubCollection()
+        self.retrieval = RetrievalService(self.collection, self.embedding_fn)
+        self.response_cache = None
+
+    def sync_once(self, key, setup):
+        return None
+
+
+def run_dialog(provider, llm, **kwargs):
+    """Сценарий диалога; возвращает задержки его узлов"""
+    with DialogSystem("test", provider=provider, llm=llm, **kwargs) as system, \
+            contextlib.redirect_stdout(io.StringIO()):
+        system.response_cache = None
+        system.start()
+        for response in RESPONSES:
+            system.user_response(response)
+    return system.timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="Задержка ответа заглушки LLM в секундах")
+    parser.add_argument("--repeat", type=int, default=3, help="Число прогонов сценария в каждом режиме")
+    parser.add_argument("--retrieval", action="store_true", help="Настоящий поиск (Chroma и модель эмбеддингов)")
+    args = parser.parse_args()
+
+    if args.retrieval:
+        from provider import KnowledgeProvider
+        provider = KnowledgeProvider(path=tempfile.mkdtemp())
+        # Модель загружается до замеров
+        provider.embedding_fn(["прогрев"])
+    else:
+        provider = StubProvider()
+
+    results = {}
+    with MockLLMServer(latency=args.latency) as server:
+        llm = LLMClient("test", base_url=server.url)
+        for mode, kwargs in MODES.items():
+            requests = server.requests
+            timings = [timing for _ in range(args.repeat) for timing in run_dialog(provider, llm, **kwargs)]
+            results[mode] = (timings, (server.requests - requests) / args.repeat)
+        llm.close()
+
+    nodes = list(dict.fromkeys(timing['node'] for timing in results['по очереди'][0]))
+    print(f"Задержка LLM: {args.latency:.2f} с, среднее время узла в мс")
+    print(f"{'узел':>18s}" + "".join(f"{mode:>17s}" for mode in MODES))
+    for node in nodes:
+        row = [statistics.mean(t['total'] for t in results[mode][0] if t['node'] == node) * 1000 for mode in MODES]
+        print(f"{node:>18s}" + "".join(f"{value:17.0f}" for value in row))
+    print(f"{'в среднем':>18s}" + "".join(f"{statistics.mean(t['total'] for t in results[mode][0]) * 1000:17.0f}"
+                                         for mode in MODES))
+    print(f"{'запросов к LLM':>18s}" + "".join(f"{results[mode][1]:17.0f}" for mode in MODES))
+
+    print("\nРазбивка параллельного режима (мс): инструкция и подписи вариантов")
+    for node in nodes:
+        timing = next(t for t in results['параллельно'][0] if t['node'] == node)
+        options = ", ".join(f"{key} {seconds * 1000:.0f}" for key, seconds in timing['options'].items())
+        print(f"{node:>18s}  всего {timing['total'] * 1000:.0f}, инструкция {timing['prompt'] * 1000:.0f}"
+              + (f", {options}" if options else ""))
+
+
+if __name__ == "__main__":
+    main()
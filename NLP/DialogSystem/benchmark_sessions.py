@@ -0,0 +1,96 @@
+"""
+Память на сессию и задержка первого запроса: своя модель эмбеддингов в
+каждой сессии (как раньше) против общей модели процесса (provider.py).
+
+    python benchmark_sessions.py --sessions 8
+    python benchmark_sessions.py --sessions 8 --backend onnx --num-threads 4
+
+Каждый режим запускается в отдельном процессе, чтобы его память не
+смешивалась с памятью другого.
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+QUERY = "Термостат не поддерживает нужную температуру"
+
+
+def rss_mb() -> float:
+    """Текущая резидентная память процесса в МБ"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Без /proc - пиковая память (в КБ на Linux, в байтах на macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(mode: str, sessions: int, model_name: str, backend: str, num_threads) -> dict:
+    """Создание sessions сессий и первый запрос каждой в одном режиме"""
+    import chromadb.utils.embedding_functions as embedding_functions
+    import provider
+
+    baseline = rss_mb()
+    create_times, first_query_times = [], []
+    functions = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        if mode == "per-session":
+            function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+        else:
+            function = provider.get_provider(model_name=model_name, backend=backend,
+                                             num_threads=num_threads).embedding_fn
+        create_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        function([QUERY])
+        first_query_times.append(time.perf_counter() - start)
+        functions.append(function)
+
+    return {
+        "mode": mode,
+        "backend": backend if mode == "shared" else "torch",
+        "sessions": sessions,
+        "memory_per_session_mb": (rss_mb() - baseline) / sessions,
+        "first_session_ready_s": create_times[0] + first_query_times[0],
+        "first_query_s": first_query_times[0],
+        "later_session_ready_s": sum(create_times[1:]) / max(sessions - 1, 1) +
+                                 sum(first_query_times[1:]) / max(sessions - 1, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--backend", default="torch", help="Бэкенд общей модели: torch, onnx или quantized")
+    parser.add_argument("--num-threads", type=int, default=None)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.sessions, args.model, args.backend, args.num_threads)))
+        return
+
+    print(f"{'режим':>12s} {'бэкенд':>10s} {'МБ/сессия':>10s} {'1-я сессия, с':>14s} "
+          f"{'1-й запрос, с':>14s} {'след. сессия, с':>16s}")
+    for mode in ("per-session", "shared"):
+        command = [sys.executable, __file__, "--child", mode, "--sessions", str(args.sessions),
+                   "--model", args.model, "--backend", args.backend]
+        if args.num_threads:
+            command += ["--num-threads", str(args.num_threads)]
+        result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+        print(f"{result['mode']:>12s} {result['backend']:>10s} {result['memory_per_session_mb']:10.1f} "
+              f"{result['first_session_ready_s']:14.3f} {result['first_query_s']:14.3f} "
+              f"{result['later_session_ready_s']:16.3f}")
+
+
+if __name__ == "__main__":
+    main()
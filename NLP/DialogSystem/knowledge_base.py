@@ -0,0 +1,130 @@
+"""
+Идемпотентная синхронизация базы знаний с коллекцией Chroma.
+
+Вместо удаления коллекции и повторного вычисления эмбеддингов всех
+документов при каждом запуске в метаданных каждого документа хранится хеш
+его содержимого. При синхронизации добавляются (upsert) только новые и
+измененные документы, поэтому запуск с неизменным корпусом не вызывает
+модель вовсе, а несколько реплик могут синхронизировать одну базу
+одновременно без гонок.
+
+Загрузка больших корпусов из файлов (.txt, .jsonl, .json) идет батчами:
+
+    python knowledge_base.py docs/*.jsonl --collection thermostat_collection
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Ключ метаданных с хешем содержимого документа
+HASH_KEY = "content_hash"
+
+Document = Tuple[str, str, Dict]
+
+
+def content_hash(text: str, metadata: Optional[Dict] = None) -> str:
+    """Хеш текста и метаданных документа"""
+    data = json.dumps({"text": text, "metadata": metadata or {}}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Разбиение последовательности на списки по batch_size элементов"""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_documents(path: str) -> Iterator[Document]:
+    """
+    Документы (id, текст, метаданные) файла:
+        .jsonl - по объекту {"id", "text", "metadata"} в строке
+        .json - список таких объектов
+        иначе - текст, по документу в каждой непустой строке
+    Без id документ получает id "<имя файла>:<номер>".
+    """
+    name = os.path.basename(path)
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8") as f:
+        if extension == ".json":
+            records = json.load(f)
+        elif extension == ".jsonl":
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = ({"text": line.strip()} for line in f if line.strip())
+        for number, record in enumerate(records):
+            metadata = dict(record.get("metadata") or {"source": name})
+            yield str(record.get("id", f"{name}:{number}")), record["text"], metadata
+
+
+def sync_documents(collection, documents: Iterable[Document], batch_size: int = 256,
+                   prune: bool = False) -> Dict[str, int]:
+    """
+    Синхронизация коллекции с документами (id, текст, метаданные).
+    Эмбеддинги вычисляются только для новых и измененных документов;
+    с prune удаляются документы коллекции, которых нет среди documents.
+    Возвращает число добавленных, обновленных, неизмененных и удаленных документов.
+    """
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    seen = set()
+    for batch in batched(documents, batch_size):
+        ids = [doc_id for doc_id, _, _ in batch]
+        existing = collection.get(ids=ids, include=["metadatas"])
+        stored = {doc_id: (metadata or {}).get(HASH_KEY)
+                  for doc_id, metadata in zip(existing["ids"], existing["metadatas"])}
+
+        changed_ids, changed_texts, changed_metadatas = [], [], []
+        for doc_id, text, metadata in batch:
+            seen.add(doc_id)
+            digest = content_hash(text, metadata)
+            if stored.get(doc_id) == digest:
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if doc_id in stored else "added"] += 1
+            changed_ids.append(doc_id)
+            changed_texts.append(text)
+            changed_metadatas.append({**metadata, HASH_KEY: digest})
+
+        if changed_ids:
+            collection.upsert(ids=changed_ids, documents=changed_texts, metadatas=changed_metadatas)
+
+    if prune:
+        obsolete = [doc_id for doc_id in collection.get(include=[])["ids"] if doc_id not in seen]
+        for batch in batched(obsolete, batch_size):
+            collection.delete(ids=batch)
+        stats["deleted"] = len(obsolete)
+    return stats
+
+
+def sync_files(collection, paths: Iterable[str], batch_size: int = 256, prune: bool = False) -> Dict[str, int]:
+    """Синхронизация коллекции с документами файлов, читаемых и загружаемых батчами"""
+    documents = itertools.chain.from_iterable(read_documents(path) for path in paths)
+    return sync_documents(collection, documents, batch_size=batch_size, prune=prune)
+
+
+if __name__ == "__main__":
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+    parser = argparse.ArgumentParser(description="Загрузка документов в базу знаний Chroma")
+    parser.add_argument("paths", nargs="+", help="Файлы .txt, .jsonl или .json")
+    parser.add_argument("--path", default=os.path.join("./data", "chroma"), help="Каталог PersistentClient")
+    parser.add_argument("--collection", default="thermostat_collection")
+    parser.add_argument("--model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--prune", action="store_true", help="Удалить документы, которых нет в файлах")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.path)
+    collection = client.get_or_create_collection(
+        name=args.collection,
+        embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name=args.model)
+    )
+    print(sync_files(collection, args.paths, batch_size=args.batch_size, prune=args.prune))
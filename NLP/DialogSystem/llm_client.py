@@ -0,0 +1,175 @@
+"""
+Долгоживущий клиент LLM для диалоговых систем.
+
+generate_response раньше создавал новый клиент OpenAI, а с ним и новый пул
+HTTP-соединений, на каждый вызов и ждал ответ целиком. LLMClient создается
+один раз на процесс (get_llm_client) и переиспользует соединения. Он
+отдает ответ по частям, по мере генерации (stream), ограничивает время
+запросов, повторяет неудачные запросы с экспоненциальной задержкой и
+имеет асинхронные варианты методов.
+
+    client = get_llm_client(api_key)
+    for token in client.stream([{"role": "user", "content": "Привет"}]):
+        print(token, end="", flush=True)
+
+Для тестов без сети клиент направляется на локальный сервер из
+mock_llm_server.py: LLMClient("test", base_url=server.url).
+"""
+
+import asyncio
+import functools
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List
+
+import openai
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "google/gemini-2.0-flash-exp:free"
+
+# Ошибки, после которых запрос имеет смысл повторить
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError,
+                    openai.InternalServerError)
+
+Messages = List[Dict[str, str]]
+
+
+class LLMClient:
+    """
+    Клиент OpenAI-совместимого API с пулом соединений, потоковой выдачей и повторами.
+
+        api_key, base_url, model: сервер и модель
+        timeout: ограничение времени запроса в секундах
+        max_retries: число повторов после ошибки соединения, таймаута, 429 или 5xx
+        backoff: задержка перед первым повтором в секундах, удваивается с каждым повтором
+
+    Соединения переиспользуются пулом HTTP-клиента SDK, пока жив LLMClient.
+    """
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, model: str = DEFAULT_MODEL,
+                 timeout: float = 60.0, max_retries: int = 3, backoff: float = 0.5):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retries = 0
+        self._client = None
+        self._async_client = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> openai.OpenAI:
+        with self._lock:
+            if self._client is None:
+                # Повторы выполняет LLMClient, а не SDK, чтобы не повторять дважды
+                self._client = openai.OpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout,
+                                             max_retries=0)
+            return self._client
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Асинхронный клиент и его соединения привязаны к циклу событий: при новом цикле
+            # (например, следующем asyncio.run) клиент создается заново
+            if self._async_client is None or self._async_loop is not loop:
+                self._async_client = openai.AsyncOpenAI(base_url=self.base_url, api_key=self.api_key,
+                                                        timeout=self.timeout, max_retries=0)
+                self._async_loop = loop
+            return self._async_client
+
+    def _delay(self, attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором со случайной добавкой"""
+        return self.backoff * 2 ** attempt * (1 + random.random() / 2)
+
+    def complete(self, messages: Messages, **kwargs) -> str:
+        """Ответ модели целиком"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                completion = self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+                return completion.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(self._delay(attempt))
+
+    def stream(self, messages: Messages, **kwargs) -> Iterator[str]:
+        """
+        Части ответа по мере генерации. Запрос повторяется только до первой
+        полученной части: иначе пользователь увидел бы начало ответа дважды.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                response = self.client.chat.completions.create(model=self.model, messages=messages, stream=True,
+                                                               **kwargs)
+                with response:
+                    for chunk in response:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            yield chunk.choices[0].delta.content
+                return
+            except RETRYABLE_ERRORS:
+                if started or attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(self._delay(attempt))
+
+    async def acomplete(self, messages: Messages, **kwargs) -> str:
+        """Асинхронный вариант complete"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                completion = await self.async_client.chat.completions.create(model=self.model, messages=messages,
+                                                                             **kwargs)
+                return completion.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._delay(attempt))
+
+    async def astream(self, messages: Messages, **kwargs) -> AsyncIterator[str]:
+        """Асинхронный вариант stream"""
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                response = await self.async_client.chat.completions.create(model=self.model, messages=messages,
+                                                                           stream=True, **kwargs)
+                async with response:
+                    async for chunk in response:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            yield chunk.choices[0].delta.content
+                return
+            except RETRYABLE_ERRORS:
+                if started or attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._delay(attempt))
+
+    def close(self):
+        """Закрытие пула соединений синхронного клиента"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        """Закрытие пула соединений асинхронного клиента текущего цикла событий"""
+        with self._lock:
+            client = self._async_client if self._async_loop is asyncio.get_running_loop() else None
+            self._async_client = None
+            self._async_loop = None
+        if client is not None:
+            await client.close()
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm_client(api_key: str, base_url: str = DEFAULT_BASE_URL, model: str = DEFAULT_MODEL) -> LLMClient:
+    """Общий клиент процесса для данных сервера, ключа и модели"""
+    return LLMClient(api_key, base_url=base_url, model=model)
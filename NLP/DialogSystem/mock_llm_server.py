@@ -0,0 +1,155 @@
+"""
+Локальный OpenAI-совместимый сервер для тестов и бенчмарков без сети и ключа.
+
+Отвечает на POST /v1/chat/completions, целиком или потоком (SSE, stream=True),
+с настраиваемой задержкой до первой части ответа и между частями. Первые
+fail_first запросов завершаются ошибкой 500 - для проверки повторов.
+
+    with MockLLMServer(latency=0.2) as server:
+        client = LLMClient("test", base_url=server.url)
+        print(client.complete([{"role": "user", "content": "Привет"}]))
+
+    python mock_llm_server.py --port 8000 --latency 0.5
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+
+def echo_reply(messages: List[Dict]) -> str:
+    """Ответ по умолчанию: начало последнего сообщения"""
+    return f"Ответ на: {messages[-1]['content'][:60]}" if messages else "Ответ"
+
+
+class MockLLMServer:
+    """
+    Сервер в фоновом потоке.
+
+        port: порт (0 - любой свободный)
+        latency: задержка до ответа или его первой части в секундах
+        token_delay: задержка между частями потокового ответа
+        fail_first: число первых запросов, завершающихся ошибкой 500
+        reply: функция сообщений -> текст ответа
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, token_delay: float = 0.0,
+                 fail_first: int = 0, reply: Optional[Callable[[List[Dict]], str]] = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_first = fail_first
+        self.reply = reply or echo_reply
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, data):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                with server._lock:
+                    server.requests += 1
+                    request_number = server.requests
+                    failing = request_number <= server.fail_first
+                time.sleep(server.latency)
+                if failing:
+                    self.send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+                    return
+
+                text = server.reply(request.get("messages", []))
+                base = {"id": f"chatcmpl-mock-{request_number}", "created": int(time.time()),
+                        "model": request.get("model", "mock")}
+                if not request.get("stream"):
+                    self.send_json(200, {**base, "object": "chat.completion", "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": 0}})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                tokens = [word + " " for word in text.split(" ")]
+                tokens[-1] = tokens[-1].rstrip()
+                for number, token in enumerate(tokens):
+                    if number:
+                        time.sleep(server.token_delay)
+                    self.send_event({**base, "object": "chat.completion.chunk", "choices": [
+                        {"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                self.send_event({**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def send_event(self, data):
+                self.wfile.write(b"data: " + json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Работа в текущем потоке до Ctrl+C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный OpenAI-совместимый сервер")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.latency, args.token_delay, args.fail_first)
+    print(f"Сервер запущен: {server.url}")
+    server.serve_forever()
@@ -1,9 +1,12 @@
-import chromadb
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-from openai import OpenAI
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from knowledge_base import sync_documents
+from provider import KnowledgeProvider, get_provider
+from llm_client import LLMClient, get_llm_client
+from responder import KnowledgeResponder
 from typing import List, Dict, Optional
 
 class DialogMessage:
@@ -54,43 +57,52 @@ class DialogHistory:
         return history
 
 class DialogNode:
-    def __init__(self, prompt_instruction, options=None, variable=None):
+    def __init__(self, prompt_instruction, options=None, variable=None, labels=None):
         self.prompt_instruction = prompt_instruction
         self.options = options or {}
         self.variable = variable
+        # Готовые подписи вариантов: с static_labels они выводятся без запроса к LLM
+        self.labels = labels or {}
+        self.name = None
 
-class DialogSystem:
-    def __init__(self, api_key):
+class DialogSystem(KnowledgeResponder):
+    def __init__(self, api_key, provider: Optional[KnowledgeProvider] = None, llm: Optional[LLMClient] = None,
+                 static_labels: bool = False, max_concurrency: int = 4):
         self.api_key = api_key
         self.current_node = None
         self.context = {}
         self.history = DialogHistory()
+        # Инструкция узла и подписи вариантов генерируются параллельно (max_concurrency=1 - по очереди),
+        # с static_labels подписи, заданные в узле, не запрашиваются у LLM.
+        # Потоки пула освобождает close() (или выход из with DialogSystem(...) as system)
+        self.static_labels = static_labels
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        # Задержки узлов: имя узла, общее время, время инструкции и каждой подписи
+        self.timings: List[Dict] = []
 
         self.base_directory = "./data"
         os.makedirs(self.base_directory, exist_ok=True)
 
-        # Создаем клиента с указанием пути
-        self.chroma_client = chromadb.PersistentClient(path=os.path.join(self.base_directory, "chroma"))
-        self.collection_name = "thermostat_collection"
-
-        # Удаляем коллекцию, если уже существует
-        existing_names = self.chroma_client.list_collections()
-
-        if self.collection_name in existing_names:
-            self.chroma_client.delete_collection(name=self.collection_name)
-
-
-        # Создаем коллекцию с функцией для эмбеддингов
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L12-v2"
-        )
-        self.collection = self.chroma_client.create_collection(
-            name=self.collection_name,
-            embedding_function=self.embedding_fn
-        )
-
-        # Заполняем базу знаний
-        self.setup_knowledge_base()
+        # Клиент Chroma, модель эмбеддингов (загружается при первом запросе) и поиск
+        # с объединением одновременных запросов в батчи общие для всех сессий процесса.
+        # Коллекция открывается (или создается): сохраненные документы не пересчитываются при каждом запуске.
+        # У SimpleDialogSystem (RAG.py) своя коллекция с другим корпусом
+        self.provider = provider or get_provider(path=os.path.join(self.base_directory, "chroma"),
+                                                 collection_name="thermostat_collection")
+        self.chroma_client = self.provider.client
+        self.collection_name = self.provider.collection_name
+        self.embedding_fn = self.provider.embedding_fn
+        self.collection = self.provider.collection
+        self.retrieval = self.provider.retrieval
+        # Долгоживущий клиент LLM: пул соединений общий для всех сессий
+        # (llm задает другой сервер, например mock_llm_server.py в тестах)
+        self.llm = llm or get_llm_client(api_key, model="google/gemini-2.0-flash-exp:free")
+        self.model = self.llm.model
+        # Кеш ответов LLM, общий для всех сессий: инструкции узлов одинаковы во всех диалогах
+        self.response_cache = self.provider.response_cache
+
+        # Синхронизируем базу знаний (один раз на процесс)
+        self.provider.sync_once(type(self).__name__, self.setup_knowledge_base)
         # Указываем основную логику "хождения" по узлам
         self.nodes = {
             'start': DialogNode(
@@ -98,7 +110,8 @@ class DialogSystem:
                 {
                     'temp': ("Скажи: 'Термостат не поддерживает нужную температуру'", 'ask_current_temp'),
                     'other': ("Скажи: 'Другая проблема'", 'end')
-                }
+                },
+                labels={'temp': "Термостат не поддерживает нужную температуру", 'other': "Другая проблема"}
             ),
             'ask_current_temp': DialogNode("Спроси кратко и четко - какая температура сейчас в комнате", variable='current_temp'),
             'ask_desired_temp': DialogNode("Спроси кратко и четко - какая температура должна быть в комнате", variable='desired_temp'),
@@ -111,14 +124,16 @@ class DialogSystem:
             'offer_ticket': DialogNode("Спроси кратко и четко - хочет ли пользователь создать заявку в техподдержку?", options={
                 'yes': ("Скажи: 'Да'", 'create_ticket'),
                 'no': ("Скажи: 'Нет'", 'end')
-            }),
-            'create_ticket': DialogNode("Спроси кратко и четко - что заявка создана, укажи данные , которые ввел пользователь- текущую температуру, желаемую температуру и время суток.", options={'ok': ("Скажи: 'ОК'", 'end')}),
-            'wait_advice': DialogNode("Скажи пользователю, что нужно подождать 1 час и обратиться снова, если проблема останется.", options={'ok': ("Скажи: 'ОК'", 'end')}),
+            }, labels={'yes': "Да", 'no': "Нет"}),
+            'create_ticket': DialogNode("Спроси кратко и четко - что заявка создана, укажи данные , которые ввел пользователь- текущую температуру, желаемую температуру и время суток.", options={'ok': ("Скажи: 'ОК'", 'end')}, labels={'ok': "ОК"}),
+            'wait_advice': DialogNode("Скажи пользователю, что нужно подождать 1 час и обратиться снова, если проблема останется.", options={'ok': ("Скажи: 'ОК'", 'end')}, labels={'ok': "ОК"}),
             'end': DialogNode("Скажи, что диагностика завершена. Теперь вы можете задать свои вопросы."),
         }
+        for name, node in self.nodes.items():
+            node.name = name
     # Функция для заполнения базы данных
     def setup_knowledge_base(self):
-        """Инициализирует базу знаний с информацией о термостатах"""
+        """Синхронизирует базу знаний с информацией о термостатах: эмбеддинги считаются только для новых и измененных документов"""
         documents = [
             "Термостаты обычно поддерживают температуру в диапазоне 5-30°C.",
             "Если термостат не поддерживает нужную температуру, проверьте батарейки и соединение с системой.",
@@ -138,43 +153,7 @@ class DialogSystem:
         metadatas = [{"source": "manual", "type": "fact"} for _ in range(len(documents))]
         ids = [f"doc_{i}" for i in range(len(documents))]
 
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-    # Генерация ответа с учетом данных извлеченных из БД
-    def generate_response(self, instruction):
-        knowledge = self.get_relevant_knowledge(instruction)
-        full_prompt = f"""Контекстная информация о термостатах:
-{knowledge}
-
-На основе этой информации выполни следующую задачу: {instruction}"""
-
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=self.api_key,
-        )
-        model = "google/gemini-2.0-flash-exp:free"
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "system", "content": full_prompt}]
-        )
-        return completion.choices[0].message.content
-
-    # Извлечение данных из БД
-    def get_relevant_knowledge(self, query, n_results=1):
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            include=["documents", "distances"]
-        )
-
-        knowledge_parts = []
-        for doc, dist in zip(results['documents'][0], results['distances'][0]):
-            knowledge_parts.append(f"{doc} (релевантность: {1-dist:.2f})")
-
-        return "\n".join(knowledge_parts)
+        return sync_documents(self.collection, zip(ids, documents, metadatas), prune=True)
 
     def start(self):
         self.current_node = self.nodes['start']
@@ -194,20 +173,54 @@ class DialogSystem:
         if node == self.nodes['create_ticket']:
             temp = self.context.get('current_temp', 'неизвестно')
             desired = self.context.get('desired_temp', 'неизвестно')
-            time = self.context.get('time_of_day', 'неизвестно')
-            instruction = f"Заявка создана. Текущая температура: {temp}°C, желаемая: {desired}°C, время суток: {time}."
+            time_of_day = self.context.get('time_of_day', 'неизвестно')
+            instruction = f"Заявка создана. Текущая температура: {temp}°C, желаемая: {desired}°C, время суток: {time_of_day}."
         else:
             instruction = node.prompt_instruction
 
-        prompt = self.generate_response(instruction)
+        # Инструкция узла и подписи вариантов независимы: запросы к LLM выполняются параллельно,
+        # и узел ждет примерно один запрос вместо нескольких. Варианты с готовой подписью
+        # при static_labels к LLM не обращаются. Инструкция заявки содержит ответы пользователя:
+        # ее ответ не кешируется
+        start = time.perf_counter()
+        prompt_future = self.executor.submit(self._timed_response, instruction,
+                                             node != self.nodes['create_ticket'])
+        option_futures = {key: self.executor.submit(self._timed_response, option_text)
+                          for key, (option_text, _) in node.options.items()
+                          if not (self.static_labels and key in node.labels)}
+        prompt, prompt_seconds = prompt_future.result()
+        options = {key: future.result() for key, future in option_futures.items()}
+        self.timings.append({
+            'node': node.name,
+            'total': time.perf_counter() - start,
+            'prompt': prompt_seconds,
+            'options': {key: seconds for key, (_, seconds) in options.items()},
+        })
+
         self.history.add_message('system', prompt)
         print(f"Система: {prompt}")
 
         if node.options:
-            for key, (option_text, _) in node.options.items():
-                option_text = self.generate_response(option_text)
+            for key in node.options:
+                option_text = options[key][0] if key in options else node.labels[key]
                 print(f"  {key}: {option_text}")
 
+    # Ответ LLM и его длительность в секундах
+    def _timed_response(self, instruction, use_cache=True):
+        start = time.perf_counter()
+        response = self.generate_response(instruction, use_cache=use_cache)
+        return response, time.perf_counter() - start
+
+    # Остановка пула потоков запросов к LLM; общие модель, клиент Chroma и клиент LLM остаются
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self) -> 'DialogSystem':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     # Обработка ответа пользователя
     def user_response(self, response):
         if not self.current_node:
@@ -251,9 +264,15 @@ class DialogSystem:
             if user_input.lower() == 'exit':
                 print("Диалог завершен.")
                 break
-            response = self.generate_response(user_input)
-            self.history.add_message('system', response)
-            print(f"Система: {response}")
+            # Ответ печатается по мере генерации; вопросы пользователя ищутся в кеше только
+            # по точному совпадению: близкий по смыслу вопрос может требовать другого ответа
+            print("Система: ", end="", flush=True)
+            parts = []
+            for token in self.stream_response(user_input):
+                parts.append(token)
+                print(token, end="", flush=True)
+            print()
+            self.history.add_message('system', "".join(parts))
 
     #Сохранение истории
     def save_history(self, filename: str):
@@ -267,16 +286,18 @@ class DialogSystem:
 
 if __name__ == "__main__":
     api_key = ""
-    system = DialogSystem(api_key)
-    system.start()
+    with DialogSystem(api_key) as system:
+        system.start()
 
-    responses = ['temp', '22', '24', 'день', '1.5', 'yes']
-    for response in responses:
-        print(f"Пользователь: {response}")
-        system.user_response(response)
+        responses = ['temp', '22', '24', 'день', '1.5', 'yes']
+        for response in responses:
+            print(f"Пользователь: {response}")
+            system.user_response(response)
 
-    # Сохраняем историю
-    system.save_history("dialog_history.json")
+        # Сохраняем историю
+        system.save_history("dialog_history.json")
+        # Сколько вызовов LLM сэкономил кеш ответов
+        print(system.response_cache.stats())
 
-    # Продолжаем диалог
-    system.chat_mode()
+        # Продолжаем диалог
+        system.chat_mode()
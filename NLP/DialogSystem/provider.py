@@ -0,0 +1,189 @@
+"""
+Общие для всех сессий процесса модель эмбеддингов, клиент Chroma и сервис поиска.
+
+Каждая сессия DialogSystem раньше загружала свою копию модели
+all-MiniLM-L12-v2 и создавала свой клиент Chroma: память росла с числом
+сессий, а каждая новая сессия ждала загрузки модели несколько секунд.
+Теперь модель загружается один раз на процесс, при первом запросе, и
+вычисляет эмбеддинги в настраиваемом пуле потоков. Для CPU доступны
+ONNX и int8-квантованный бэкенды. Кеш ответов LLM тоже общий: фиксированные
+инструкции узлов одинаковы во всех диалогах.
+
+    provider = get_provider(backend="onnx", num_threads=4)
+    system = DialogSystem(api_key, provider=provider)
+"""
+
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from chromadb.api.types import EmbeddingFunction
+from retrieval import RetrievalService
+from response_cache import ResponseCache
+
+DEFAULT_MODEL = "all-MiniLM-L12-v2"
+# torch - как SentenceTransformerEmbeddingFunction; onnx - ONNX Runtime на CPU;
+# quantized - динамическая int8-квантизация линейных слоев на CPU
+BACKENDS = ("torch", "onnx", "quantized")
+
+
+def load_model(model_name: str = DEFAULT_MODEL, backend: str = "torch", num_threads: Optional[int] = None):
+    """Загрузка модели SentenceTransformer с выбранным бэкендом"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд {backend!r}, доступны: {', '.join(BACKENDS)}")
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+    if backend == "quantized":
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return SentenceTransformer(model_name)
+
+
+class SharedEmbeddingFunction(EmbeddingFunction):
+    """
+    Функция эмбеддингов для Chroma, загружающая модель при первом вызове.
+    Один экземпляр используется всеми сессиями и коллекциями процесса.
+
+    Для Chroma она совместима с SentenceTransformerEmbeddingFunction (то же
+    имя и конфигурация): коллекции, созданные с ней, открываются без
+    конфликта функций эмбеддингов, и наоборот.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, backend: str = "torch", num_threads: Optional[int] = None,
+                 batch_size: int = 32):
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд {backend!r}, доступны: {', '.join(BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            # Несколько сессий могут прийти одновременно: модель загружается один раз
+            with self._lock:
+                if self._model is None:
+                    self._model = load_model(self.model_name, self.backend, self.num_threads)
+        return self._model
+
+    def __call__(self, input):
+        embeddings = self.model.encode(list(input), batch_size=self.batch_size, convert_to_numpy=True)
+        return embeddings.tolist()
+
+    @staticmethod
+    def name() -> str:
+        return "sentence_transformer"
+
+    def default_space(self) -> str:
+        return "cosine"
+
+    def supported_spaces(self) -> List[str]:
+        return ["cosine", "l2", "ip"]
+
+    def get_config(self) -> Dict[str, Any]:
+        # Ключи конфигурации SentenceTransformerEmbeddingFunction; бэкенд не меняет модель и не сохраняется
+        return {"model_name": self.model_name, "device": "cpu", "normalize_embeddings": False, "kwargs": {}}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "SharedEmbeddingFunction":
+        return get_embedding_function(config.get("model_name") or DEFAULT_MODEL)
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_function(model_name: str = DEFAULT_MODEL, backend: str = "torch",
+                           num_threads: Optional[int] = None) -> SharedEmbeddingFunction:
+    """Общая функция эмбеддингов процесса: одна модель для всех хранилищ и коллекций"""
+    return SharedEmbeddingFunction(model_name, backend, num_threads)
+
+
+class KnowledgeProvider:
+    """
+    Клиент Chroma, коллекция, модель эмбеддингов и сервис поиска одного
+    хранилища, создаваемые при первом обращении.
+
+        path: каталог PersistentClient
+        collection_name: имя коллекции
+        model_name, backend, num_threads: модель эмбеддингов (см. load_model)
+        max_workers: число потоков, в которых вычисляются эмбеддинги и идет поиск
+        response_cache_path: файл SQLite кеша ответов (None - кеш только в памяти)
+    """
+
+    def __init__(self, path: str = os.path.join("./data", "chroma"), collection_name: str = "thermostat_collection",
+                 model_name: str = DEFAULT_MODEL, backend: str = "torch", num_threads: Optional[int] = None,
+                 max_workers: int = 1, response_cache_path: Optional[str] = None):
+        self.path = path
+        self.collection_name = collection_name
+        self.response_cache_path = response_cache_path
+        self.embedding_fn = get_embedding_function(model_name, backend, num_threads)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+        self._lock = threading.RLock()
+        self._client = None
+        self._collection = None
+        self._retrieval = None
+        self._response_cache = None
+        self._synced = set()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import chromadb
+                os.makedirs(self.path, exist_ok=True)
+                self._client = chromadb.PersistentClient(path=self.path)
+            return self._client
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                self._collection = self.client.get_or_create_collection(
+                    name=self.collection_name,
+                    embedding_function=self.embedding_fn
+                )
+            return self._collection
+
+    @property
+    def retrieval(self) -> RetrievalService:
+        with self._lock:
+            if self._retrieval is None:
+                self._retrieval = RetrievalService(self.collection, self.embedding_fn, executor=self.executor)
+            return self._retrieval
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        with self._lock:
+            if self._response_cache is None:
+                self._response_cache = ResponseCache(self.embedding_fn, path=self.response_cache_path)
+            return self._response_cache
+
+    def sync_once(self, key: str, setup: Callable):
+        """Вызов setup() один раз на процесс для каждого key (например, синхронизация базы знаний)"""
+        with self._lock:
+            if key in self._synced:
+                return None
+            result = setup()
+            self._synced.add(key)
+            return result
+
+
+@functools.lru_cache(maxsize=None)
+def get_provider(path: str = os.path.join("./data", "chroma"), collection_name: str = "thermostat_collection",
+                 model_name: str = DEFAULT_MODEL, backend: str = "torch", num_threads: Optional[int] = None,
+                 max_workers: int = 1, response_cache_path: Optional[str] = None) -> KnowledgeProvider:
+    """Общий KnowledgeProvider процесса для данных параметров"""
+    return KnowledgeProvider(path, collection_name, model_name, backend, num_threads, max_workers,
+                             response_cache_path)
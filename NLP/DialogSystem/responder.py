@@ -0,0 +1,88 @@
+"""
+Генерация ответов с контекстом из базы знаний, общая для диалоговых систем.
+
+KnowledgeResponder - примесь (mixin) для SimpleDialogSystem и DialogSystem.
+Она ищет в базе знаний документы, относящиеся к инструкции, строит промпт и
+получает ответ LLM: целиком, по частям или асинхронно, с кешем ответов.
+Класс-наследник задает атрибуты:
+
+    retrieval: RetrievalService коллекции системы
+    llm: LLMClient
+    model: пространство имен кеша (модель LLM)
+    response_cache: ResponseCache или None
+"""
+
+import asyncio
+import time
+
+from retrieval import format_knowledge
+
+
+class KnowledgeResponder:
+    """Поиск контекста и генерация ответов LLM с кешем ответов"""
+
+    def get_relevant_knowledge(self, query, n_results=1):
+        """Извлечение релевантных документов из базы данных Chroma"""
+        documents, distances = self.retrieval.query_batch([(query, n_results)])[0]
+        return format_knowledge(documents, distances)
+
+    async def aget_relevant_knowledge(self, query, n_results=1):
+        """Асинхронное извлечение: одновременные запросы диалогов ищутся одним батчем"""
+        documents, distances = await self.retrieval.query(query, n_results)
+        return format_knowledge(documents, distances)
+
+    def generate_response(self, instruction, use_cache=True, semantic=False):
+        """
+        Генерация ответа: повторные инструкции отвечаются из кеша без вызова LLM.
+        Поиск по смыслу (semantic) только по желанию: инструкции узлов и подписи вариантов,
+        отличающиеся одним словом, требуют разных ответов
+        """
+        if use_cache and self.response_cache is not None:
+            return self.response_cache.get_or_compute(
+                instruction, lambda: self._generate_response(instruction), namespace=self.model, semantic=semantic)
+        return self._generate_response(instruction)
+
+    def _generate_response(self, instruction):
+        """Генерация ответа с учетом данных, извлеченных из БД"""
+        knowledge = self.get_relevant_knowledge(instruction)
+        return self.llm.complete(self.build_messages(instruction, knowledge))
+
+    def build_messages(self, instruction, knowledge):
+        """Промпт с контекстной информацией из базы знаний"""
+        full_prompt = f"""Контекстная информация о термостатах:
+{knowledge}
+
+На основе этой информации выполни следующую задачу: {instruction}"""
+        return [{"role": "system", "content": full_prompt}]
+
+    def stream_response(self, instruction, use_cache=True):
+        """Потоковая генерация: части ответа выдаются по мере их получения от LLM (кеш - только точное совпадение)"""
+        cache = self.response_cache if use_cache else None
+        if cache is not None:
+            response = cache.get(instruction, namespace=self.model)
+            if response is not None:
+                yield response
+                return
+        start = time.perf_counter()
+        knowledge = self.get_relevant_knowledge(instruction)
+        parts = []
+        for token in self.llm.stream(self.build_messages(instruction, knowledge)):
+            parts.append(token)
+            yield token
+        if cache is not None:
+            cache.put(instruction, "".join(parts), namespace=self.model, latency=time.perf_counter() - start)
+
+    async def agenerate_response(self, instruction, use_cache=True):
+        """Асинхронная генерация: поиск батчами вместе с другими диалогами, запрос через общий пул соединений"""
+        cache = self.response_cache if use_cache else None
+        if cache is not None:
+            # Кеш может обращаться к SQLite: в потоке, чтобы не блокировать цикл событий
+            response = await asyncio.to_thread(cache.get, instruction, self.model)
+            if response is not None:
+                return response
+        start = time.perf_counter()
+        knowledge = await self.aget_relevant_knowledge(instruction)
+        response = await self.llm.acomplete(self.build_messages(instruction, knowledge))
+        if cache is not None:
+            await asyncio.to_thread(cache.put, instruction, response, self.model, time.perf_counter() - start)
+        return response
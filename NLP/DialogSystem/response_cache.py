@@ -0,0 +1,181 @@
+"""
+Кеш ответов LLM перед generate_response.
+
+Узлы диалога отправляют в LLM одни и те же фиксированные инструкции
+(приветствие узла start, подписи вариантов вроде "Скажи: 'Да'"), и каждый
+раз это полный запрос к удаленной модели ради почти одинакового ответа.
+Кеш находит ответ по точному совпадению инструкции. Поиск по косинусной
+близости к уже заданной инструкции включается явно (semantic=True) и
+только для инструкций, чьи близкие варианты допускают один ответ: у
+"Скажи: 'Да'" и "Скажи: 'Нет'" близость выше порога, а ответы разные. Записи
+живут ttl секунд, их число ограничено (вытесняются давно не
+использованные), а с path они сохраняются в SQLite и переживают перезапуск.
+
+    cache = ResponseCache(embedding_fn, path="./data/responses.sqlite")
+    answer = cache.get_or_compute(instruction, lambda: llm(instruction))
+    answer = cache.get_or_compute(faq_question, lambda: llm(faq_question), semantic=True)
+    print(cache.stats())    # попадания, промахи, сэкономленные вызовы и секунды
+"""
+
+import collections
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+Entry = collections.namedtuple("Entry", ["namespace", "prompt", "response", "embedding", "created", "latency"])
+
+
+class ResponseCache:
+    """
+    Кеш ответов с поиском по точному совпадению и по смыслу.
+
+        embedding_fn: функция эмбеддингов (список текстов -> список векторов) для
+            поиска по смыслу; None - только точное совпадение
+        similarity_threshold: минимальная косинусная близость для попадания по смыслу
+        ttl: время жизни записи в секундах (None - без ограничения)
+        max_entries: максимум записей, сверх него вытесняются давно не использованные
+        path: файл SQLite для хранения записей между запусками (None - только в памяти)
+    """
+
+    def __init__(self, embedding_fn=None, similarity_threshold: float = 0.95, ttl: Optional[float] = 24 * 3600,
+                 max_entries: int = 1024, path: Optional[str] = None):
+        self.embedding_fn = embedding_fn
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (namespace TEXT, prompt TEXT, response TEXT, "
+                             "embedding BLOB, created REAL, latency REAL, PRIMARY KEY (namespace, prompt))")
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        """Загрузка последних неустаревших записей из SQLite"""
+        rows = self._db.execute("SELECT namespace, prompt, response, embedding, created, latency FROM responses "
+                                "ORDER BY created DESC LIMIT ?", (self.max_entries,)).fetchall()
+        for namespace, prompt, response, embedding, created, latency in reversed(rows):
+            if self._expired(created):
+                continue
+            embedding = None if embedding is None else np.frombuffer(embedding, dtype=np.float32)
+            self._entries[(namespace, prompt)] = Entry(namespace, prompt, response, embedding, created, latency)
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        """Нормированный эмбеддинг: скалярное произведение равно косинусной близости"""
+        embedding = np.asarray(self.embedding_fn([prompt])[0], dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _hit(self, key, entry: Entry) -> str:
+        self._entries.move_to_end(key)
+        self.saved_seconds += entry.latency
+        return entry.response
+
+    def get(self, prompt: str, namespace: str = "", semantic: bool = False) -> Optional[str]:
+        """Ответ на prompt из кеша или None; с semantic ищется и самая близкая по смыслу инструкция"""
+        return self._lookup(prompt, namespace, semantic)[0]
+
+    def _lookup(self, prompt: str, namespace: str, semantic: bool):
+        """(ответ или None, эмбеддинг prompt, если он был вычислен для поиска по смыслу)"""
+        key = (namespace, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry.created):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self.hits += 1
+                return self._hit(key, entry), None
+            semantic = semantic and self.embedding_fn is not None
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if entry.namespace == namespace and entry.embedding is not None
+                          and not self._expired(entry.created)] if semantic else []
+
+        embedding = self._embed(prompt) if semantic else None
+        if candidates:
+            similarities = np.stack([entry.embedding for _, entry in candidates]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                best_key, entry = candidates[best]
+                with self._lock:
+                    if best_key in self._entries:
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return self._hit(best_key, entry), embedding
+
+        with self._lock:
+            self.misses += 1
+        return None, embedding
+
+    def put(self, prompt: str, response: str, namespace: str = "", latency: float = 0.0, semantic: bool = False,
+            embedding: Optional[np.ndarray] = None):
+        """
+        Сохранение ответа; latency - длительность вызова LLM, которую сэкономит каждое попадание.
+        С semantic запись находится и по смыслу; embedding - уже вычисленный эмбеддинг prompt.
+        """
+        if semantic and embedding is None and self.embedding_fn is not None:
+            embedding = self._embed(prompt)
+        entry = Entry(namespace, prompt, response, embedding, time.time(), latency)
+        with self._lock:
+            self._entries[(namespace, prompt)] = entry
+            self._entries.move_to_end((namespace, prompt))
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                 (namespace, prompt, response, None if embedding is None else embedding.tobytes(),
+                                  entry.created, latency))
+                self._db.executemany("DELETE FROM responses WHERE namespace = ? AND prompt = ?", evicted)
+                if self.ttl is not None:
+                    self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+                self._db.commit()
+
+    def get_or_compute(self, prompt: str, compute: Callable[[], str], namespace: str = "",
+                       semantic: bool = False) -> str:
+        """Ответ из кеша, а при промахе - результат compute(), который сохраняется в кеш"""
+        response, embedding = self._lookup(prompt, namespace, semantic)
+        if response is None:
+            start = time.perf_counter()
+            response = compute()
+            # Эмбеддинг, вычисленный при поиске, не считается второй раз
+            self.put(prompt, response, namespace, latency=time.perf_counter() - start, semantic=semantic,
+                     embedding=embedding)
+        return response
+
+    def stats(self) -> Dict:
+        """Счетчики: попадания (в том числе по смыслу), промахи, сэкономленные вызовы LLM и секунды"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_llm_calls": self.hits,
+            "saved_seconds": self.saved_seconds,
+            "entries": len(self._entries),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
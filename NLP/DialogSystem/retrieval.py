@@ -0,0 +1,108 @@
+"""
+Сервис поиска по базе знаний, общий для многих одновременных диалогов.
+
+Запросы, пришедшие почти одновременно, объединяются в микро-батч: тексты
+кодируются одним проходом модели эмбеддингов, а поиск выполняется одним
+вызовом collection.query. Блокирующая работа идет в отдельном потоке,
+поэтому цикл событий asyncio не останавливается, пока модель считает.
+
+    service = RetrievalService(collection, embedding_fn)
+    documents, distances = await service.query("Термостат не греет", n_results=2)
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+
+def format_knowledge(documents: Sequence[str], distances: Sequence[float]) -> str:
+    """Форматирование найденных документов для промпта"""
+    return "\n".join(f"{doc} (релевантность: {1-dist:.2f})" for doc, dist in zip(documents, distances))
+
+
+class RetrievalService:
+    """
+    Поиск с микро-батчингом.
+
+        collection: коллекция Chroma
+        embedding_fn: функция эмбеддингов коллекции (список текстов -> список векторов)
+        max_batch_size: максимум запросов в одном батче
+        max_wait: сколько секунд первый запрос батча ждет остальных
+        executor: пул потоков для модели и Chroma (по умолчанию свой, на один поток)
+    """
+
+    def __init__(self, collection, embedding_fn, max_batch_size: int = 32, max_wait: float = 0.005,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.collection = collection
+        self.embedding_fn = embedding_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval")
+        # Статистика: число батчей и запросов в них
+        self.batches = 0
+        self.queries = 0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def query_batch(self, requests: Sequence[Tuple[str, int]]) -> List[Tuple[List[str], List[float]]]:
+        """Синхронный поиск для списка (запрос, n_results): один проход модели и один запрос к Chroma"""
+        # Одинаковые тексты кодируются один раз
+        texts = list(dict.fromkeys(text for text, _ in requests))
+        n_results = max(n for _, n in requests)
+        results = self.collection.query(
+            query_embeddings=self.embedding_fn(texts),
+            n_results=n_results,
+            include=["documents", "distances"]
+        )
+        found = dict(zip(texts, zip(results['documents'], results['distances'])))
+        self.batches += 1
+        self.queries += len(requests)
+        return [(list(found[text][0][:n]), list(found[text][1][:n])) for text, n in requests]
+
+    async def query(self, text: str, n_results: int = 1) -> Tuple[List[str], List[float]]:
+        """Асинхронный поиск: (документы, расстояния) для одного запроса"""
+        loop = asyncio.get_running_loop()
+        # Очередь привязана к циклу событий: при новом цикле создается заново
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((text, n_results, future))
+        return await future
+
+    async def _run(self):
+        """Сборка батчей из очереди и их выполнение в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    batch.append(queue.get_nowait() if timeout <= 0 else
+                                 await asyncio.wait_for(queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+
+            requests = [(text, n_results) for text, n_results, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.query_batch, requests)
+            except Exception as error:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def close(self):
+        """Остановка фоновой задачи и пула потоков"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+            self._loop = None
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sys
+import unittest
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from knowledge_base import HASH_KEY, sync_documents  # noqa: E402
+
+
+class CountingEmbedding(EmbeddingFunction):
+    """Эмбеддинги по хешу текста; запоминает тексты, для которых их вычисляли"""
+
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.texts.extend(input)
+        return [np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8)[:16].astype(np.float32)
+                for text in input]
+
+    @staticmethod
+    def name() -> str:
+        return "counting"
+
+
+class TestSyncDocuments(unittest.TestCase):
+
+    def setUp(self):
+        self.client = chromadb.EphemeralClient()
+        self.embedding_fn = CountingEmbedding()
+        # Клиенты EphemeralClient процесса делят одно хранилище: у каждого теста своя коллекция
+        name = f"test_{uuid.uuid4().hex}"
+        self.collection = self.client.create_collection(name=name, embedding_function=self.embedding_fn)
+        self.addCleanup(self.client.delete_collection, name)
+        self.documents = [(f"doc_{i}", f"Документ {i}", {"source": "test"}) for i in range(5)]
+
+    def test_second_sync_embeds_nothing(self):
+        stats = sync_documents(self.collection, self.documents, batch_size=2)
+        self.assertEqual(stats, {"added": 5, "updated": 0, "unchanged": 0, "deleted": 0})
+        self.assertEqual(len(self.embedding_fn.texts), 5)
+
+        self.embedding_fn.texts.clear()
+        stats = sync_documents(self.collection, self.documents, batch_size=2)
+        self.assertEqual(stats, {"added": 0, "updated": 0, "unchanged": 5, "deleted": 0})
+        self.assertEqual(self.embedding_fn.texts, [])
+
+    def test_changed_document_reembedded(self):
+        sync_documents(self.collection, self.documents)
+        self.embedding_fn.texts.clear()
+
+        self.documents[3] = ("doc_3", "Документ 3, исправленный", {"source": "test"})
+        stats = sync_documents(self.collection, self.documents)
+        self.assertEqual(stats, {"added": 0, "updated": 1, "unchanged": 4, "deleted": 0})
+        self.assertEqual(self.embedding_fn.texts, ["Документ 3, исправленный"])
+
+        stored = self.collection.get(ids=["doc_3"], include=["documents", "metadatas"])
+        self.assertEqual(stored["documents"], ["Документ 3, исправленный"])
+        self.assertIn(HASH_KEY, stored["metadatas"][0])
+
+    def test_prune(self):
+        sync_documents(self.collection, self.documents)
+        self.embedding_fn.texts.clear()
+
+        stats = sync_documents(self.collection, self.documents[:3], prune=True)
+        self.assertEqual(stats, {"added": 0, "updated": 0, "unchanged": 3, "deleted": 2})
+        self.assertEqual(self.embedding_fn.texts, [])
+        self.assertEqual(sorted(self.collection.get(include=[])["ids"]), ["doc_0", "doc_1", "doc_2"])
+
+        # Без prune лишние документы остаются
+        sync_documents(self.collection, self.documents[:1])
+        self.assertEqual(self.collection.count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import LLMClient  # noqa: E402
+from mock_llm_server import MockLLMServer  # noqa: E402
+
+
+class TestLLMClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockLLMServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = LLMClient("test", base_url=self.server.url, backoff=0.01)
+        self.messages = [{"role": "user", "content": "Привет"}]
+
+    def test_complete_and_stream(self):
+        self.assertEqual(self.client.complete(self.messages), "Ответ на: Привет")
+        self.assertEqual("".join(self.client.stream(self.messages)), "Ответ на: Привет")
+        self.client.close()
+
+    def test_retries(self):
+        """
+        Ошибка 500 первого запроса повторяется
+        """
+
+        self.server.fail_first = 1
+        self.assertEqual(self.client.complete(self.messages), "Ответ на: Привет")
+        self.assertEqual(self.client.retries, 1)
+
+    def test_event_loops_in_sequence(self):
+        """
+        Общий клиент работает в каждом следующем цикле событий, а не только в первом
+        """
+
+        async def ask():
+            parts = [part async for part in self.client.astream(self.messages)]
+            return await self.client.acomplete(self.messages), "".join(parts)
+
+        for _ in range(2):
+            self.assertEqual(asyncio.run(ask()), ("Ответ на: Привет", "Ответ на: Привет"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmark_dialog import StubProvider  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from mock_llm_server import MockLLMServer  # noqa: E402
+from multilevel_dialogue import DialogSystem  # noqa: E402
+
+LATENCY = 0.3
+
+
+class TestProcessNode(unittest.TestCase):
+
+    def setUp(self):
+        # DialogSystem создает каталог ./data: во временном каталоге, а не там, откуда запущены тесты
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+        self.server = MockLLMServer(latency=LATENCY).start()
+        self.addCleanup(self.server.stop)
+        self.llm = LLMClient("test", base_url=self.server.url)
+        self.addCleanup(self.llm.close)
+        self.provider = StubProvider()
+        self.addCleanup(self.provider.retrieval.close)
+
+    def start(self, **kwargs):
+        """Узел start (инструкция и два варианта); возвращает систему и вывод"""
+        output = io.StringIO()
+        with DialogSystem("test", provider=self.provider, llm=self.llm, **kwargs) as system, \
+                contextlib.redirect_stdout(output):
+            system.start()
+        return system, output.getvalue()
+
+    def test_parallel_requests(self):
+        """
+        Инструкция и подписи двух вариантов запрашиваются одновременно: узел ждет один запрос, а не три
+        """
+
+        system, output = self.start()
+
+        self.assertEqual(self.server.requests, 3)
+        timing, = system.timings
+        self.assertEqual(timing['node'], 'start')
+        self.assertEqual(set(timing['options']), {'temp', 'other'})
+        for seconds in [timing['prompt'], *timing['options'].values()]:
+            self.assertGreaterEqual(seconds, LATENCY)
+        self.assertLess(timing['total'], 2 * LATENCY)
+        self.assertIn("  temp: Ответ на:", output)
+
+    def test_sequential_requests(self):
+        system, _ = self.start(max_concurrency=1)
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertGreaterEqual(system.timings[0]['total'], 3 * LATENCY)
+
+    def test_static_labels(self):
+        """
+        С static_labels варианты с готовой подписью не запрашиваются у LLM
+        """
+
+        system, output = self.start(static_labels=True)
+
+        self.assertEqual(self.server.requests, 1)
+        node = system.nodes['start']
+        for key in node.options:
+            self.assertIn(f"  {key}: {node.labels[key]}\n", output)
+        timing, = system.timings
+        self.assertEqual(timing['node'], 'start')
+        self.assertEqual(timing['options'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+import chromadb
+import numpy as np
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import provider  # noqa: E402
+from provider import KnowledgeProvider  # noqa: E402
+
+
+class FakeModel:
+    """Детерминированные эмбеддинги по хешу текста вместо SentenceTransformer"""
+
+    def encode(self, texts, **kwargs):
+        return np.array([np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8)[:16]
+                         for text in texts], dtype=np.float32)
+
+
+def old_embedding_function():
+    """SentenceTransformerEmbeddingFunction, с которой создавались хранилища, без загрузки модели"""
+    embedding_fn = SentenceTransformerEmbeddingFunction.__new__(SentenceTransformerEmbeddingFunction)
+    embedding_fn.model_name = provider.DEFAULT_MODEL
+    embedding_fn.device = "cpu"
+    embedding_fn.normalize_embeddings = False
+    embedding_fn.kwargs = {}
+    embedding_fn._model = FakeModel()
+    return embedding_fn
+
+
+class TestKnowledgeProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(provider, "load_model", return_value=FakeModel())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        provider.get_embedding_function.cache_clear()
+        self.addCleanup(provider.get_embedding_function.cache_clear)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_opens_store_of_sentence_transformer_function(self):
+        """
+        Коллекция, сохраненная с SentenceTransformerEmbeddingFunction, открывается и ищется
+        """
+
+        documents = ["Термостаты поддерживают 5-30°C.", "Проверьте батарейки термостата."]
+        client = chromadb.PersistentClient(path=self.tmp.name)
+        client.get_or_create_collection(name="thermostat_collection", embedding_function=old_embedding_function()) \
+            .add(ids=["doc_0", "doc_1"], documents=documents)
+
+        knowledge = KnowledgeProvider(path=self.tmp.name)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            collection = knowledge.collection
+        self.assertEqual(collection.count(), 2)
+        found, _ = knowledge.retrieval.query_batch([(documents[1], 1)])[0]
+        self.assertEqual(found, [documents[1]])
+
+    def test_store_opens_with_sentence_transformer_function(self):
+        """
+        И наоборот: коллекция KnowledgeProvider открывается функцией Chroma (например, в knowledge_base.py)
+        """
+
+        KnowledgeProvider(path=self.tmp.name).collection.add(ids=["doc_0"], documents=["Термостат"])
+        client = chromadb.PersistentClient(path=self.tmp.name)
+        collection = client.get_collection(name="thermostat_collection", embedding_function=old_embedding_function())
+        self.assertEqual(collection.count(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
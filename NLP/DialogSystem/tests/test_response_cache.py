@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_cache import ResponseCache  # noqa: E402
+
+
+class CountingEmbedding:
+    """Эмбеддинг по набору букв: "Скажи: 'Да'" и "Скажи: 'Нет'" почти совпадают"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += len(texts)
+        return [[text.count(letter) for letter in "абвгдежзийклмнопрстуфхцчшщъыьэюя'"] + [1.0] * 8
+                for text in texts]
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.embedding_fn = CountingEmbedding()
+        self.cache = ResponseCache(self.embedding_fn, similarity_threshold=0.9)
+
+    def test_exact_match_by_default(self):
+        """
+        Близкая, но другая инструкция не получает чужой ответ и не вызывает модель эмбеддингов
+        """
+
+        self.assertEqual(self.cache.get_or_compute("Скажи: 'Да'", lambda: "Да"), "Да")
+        self.assertEqual(self.cache.get_or_compute("Скажи: 'Нет'", lambda: "Нет"), "Нет")
+        self.assertEqual(self.cache.get_or_compute("Скажи: 'Да'", lambda: "вызов LLM"), "Да")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+        self.assertEqual(self.embedding_fn.calls, 0)
+
+    def test_semantic_opt_in(self):
+        """
+        С semantic близкая инструкция отвечается из кеша; при промахе эмбеддинг считается один раз
+        """
+
+        self.cache.get_or_compute("Скажи: 'Да'", lambda: "Да", semantic=True)
+        self.assertEqual(self.embedding_fn.calls, 1)
+        self.assertEqual(self.cache.get("Скажи: 'Да!'", semantic=True), "Да")
+        self.assertEqual(self.cache.semantic_hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from retrieval import RetrievalService  # noqa: E402
+
+
+class StubCollection:
+    """Коллекция без Chroma: для "эмбеддинга" text возвращает документы text-0, text-1, ..."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def query(self, query_embeddings, n_results, include):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return {
+            'documents': [[f"{text}-{i}" for i in range(n_results)] for text in query_embeddings],
+            'distances': [[i / 10 for i in range(n_results)] for _ in query_embeddings],
+        }
+
+
+class CountingEmbedding:
+    """Функция эмбеддингов, запоминающая закодированные тексты; "эмбеддинг" - сам текст"""
+
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return list(texts)
+
+
+class TestRetrievalService(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = StubCollection()
+        self.embedding_fn = CountingEmbedding()
+        self.service = RetrievalService(self.collection, self.embedding_fn, max_wait=0.05)
+        self.addCleanup(self.service.close)
+
+    def gather(self, requests):
+        async def run():
+            queries = asyncio.gather(*(self.service.query(text, n) for text, n in requests),
+                                     return_exceptions=True)
+            # Запрос, оставшийся в очереди прошлого цикла событий, не ответится никогда
+            return await asyncio.wait_for(queries, timeout=5)
+        return asyncio.run(run())
+
+    def test_concurrent_queries_batched(self):
+        requests = [("а", 1), ("б", 3), ("а", 2), ("в", 1)]
+        results = self.gather(requests)
+
+        self.assertEqual(self.service.batches, 1)
+        self.assertEqual(self.service.queries, len(requests))
+        self.assertEqual(self.collection.calls, 1)
+        # Одинаковые тексты кодируются один раз
+        self.assertEqual(self.embedding_fn.texts, ["а", "б", "в"])
+        # Каждый запрос получает свои n_results
+        self.assertEqual(results, [
+            (["а-0"], [0.0]),
+            (["б-0", "б-1", "б-2"], [0.0, 0.1, 0.2]),
+            (["а-0", "а-1"], [0.0, 0.1]),
+            (["в-0"], [0.0]),
+        ])
+
+    def test_error_propagates_to_batch(self):
+        self.collection.error = RuntimeError("Chroma недоступна")
+        results = self.gather([("а", 1), ("б", 1), ("в", 2)])
+
+        self.assertEqual(self.collection.calls, 1)
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIs(result, self.collection.error)
+
+    def test_new_event_loop(self):
+        """
+        Очередь и фоновая задача создаются заново в каждом следующем цикле событий
+        """
+
+        first = self.gather([("а", 1), ("б", 1)])
+        queue = self.service._queue
+        second = self.gather([("а", 1), ("б", 1)])
+
+        self.assertEqual(first, second)
+        self.assertIsNot(self.service._queue, queue)
+        self.assertEqual(self.service.batches, 2)
+        self.assertEqual(self.service.queries, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()